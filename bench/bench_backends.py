@@ -0,0 +1,115 @@
+# bench_backends.py
+# Runs every available detector backend over a folder of recorded frames and reports
+# latency percentiles, throughput and peak RSS. Each backend runs in its own process so
+# peak RSS is not polluted by the others.
+#
+#   python3 bench/bench_backends.py --frames recordings/bowl --imgsz 320 \
+#       --model onnx=yolov8n_int8.onnx --model openvino=yolov8n_openvino_model
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'hardware'))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_frames(folder, limit=None):
+    import cv2
+    names = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if limit:
+        names = names[:limit]
+    return [cv2.imread(os.path.join(folder, name)) for name in names]
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_child(backend, model_path, frames_dir, imgsz, passes, warmup, limit):
+    from detector_backends import load_detector
+
+    frames = load_frames(frames_dir, limit)
+    if not frames:
+        raise SystemExit(f"no frames in {frames_dir}")
+
+    load_started = time.perf_counter()
+    detector = load_detector(backend, model_path, imgsz=imgsz)
+    load_time = time.perf_counter() - load_started
+
+    for frame in frames[:warmup]:
+        detector.detect(frame)
+
+    latencies = []
+    detections = 0
+    started = time.perf_counter()
+    for _ in range(passes):
+        for frame in frames:
+            t0 = time.perf_counter()
+            detections += len(detector.detect(frame))
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'backend': backend,
+        'model': model_path,
+        'imgsz': imgsz,
+        'frames': len(latencies),
+        'load_s': round(load_time, 3),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p90_ms': round(percentile(ordered, 0.90) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'fps': round(len(latencies) / elapsed, 2),
+        'detections': detections,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', required=True, help='folder of recorded frames')
+    parser.add_argument('--imgsz', type=int, default=320)
+    parser.add_argument('--passes', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--limit', type=int, help='use at most this many frames')
+    parser.add_argument('--model', action='append', default=[],
+                        help='backend=path override, e.g. onnx=yolov8n_int8.onnx')
+    parser.add_argument('--backends', help='comma separated subset (default: all installed)')
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    models = dict(item.split('=', 1) for item in args.model)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, models.get(args.child), args.frames, args.imgsz,
+                                   args.passes, args.warmup, args.limit)))
+        raise SystemExit(0)
+
+    from detector_backends import available_backends
+    backends = args.backends.split(',') if args.backends else available_backends()
+
+    report = []
+    for backend in backends:
+        cmd = [sys.executable, os.path.abspath(__file__), '--child', backend, '--frames', args.frames,
+               '--imgsz', str(args.imgsz), '--passes', str(args.passes), '--warmup', str(args.warmup)]
+        if args.limit:
+            cmd += ['--limit', str(args.limit)]
+        for item in args.model:
+            cmd += ['--model', item]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode == 0:
+            report.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        else:
+            report.append({'backend': backend, 'error': proc.stderr.strip().splitlines()[-1:]})
+        print(json.dumps(report[-1]))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
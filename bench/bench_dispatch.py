@@ -0,0 +1,83 @@
+# bench_dispatch.py
+# Cold vs warm latency of the feeding dispatch path, timing the same operation on both sides:
+# get the feeder ready and prove it works (one camera frame, one detector inference, one
+# load cell reading).
+#
+#   cold: spawn `python3 main.py --probe` (imports, YOLO load, camera, GPIO, tare, then the probe)
+#   warm: send {"op": "probe"} to an already running feeder_daemon.py (only the probe)
+#
+# Both sides must drive the same hardware: the daemon's answer says whether it runs on the
+# Pi or in simulation, and a mismatch with the cold side is reported instead of a speed-up.
+#
+# Run on the Pi with the daemon started:  python3 bench/bench_dispatch.py --cold 3 --warm 50
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+
+import feeder_client
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'n': len(samples),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+def bench_cold(runs):
+    main_py = os.path.join(ROOT, 'hardware', 'main.py')
+    samples = []
+    probe = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(['python3', main_py, '--probe'], cwd=os.path.dirname(main_py),
+                                check=True, capture_output=True, text=True)
+        samples.append(time.perf_counter() - started)
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return dict(summarize(samples), hardware=probe['hardware'], last_probe=probe)
+
+
+def bench_warm(runs):
+    samples = []
+    probe = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        probe = feeder_client.send_request({'op': 'probe'}, timeout=30)
+        samples.append(time.perf_counter() - started)
+        if not probe.get('ok'):
+            raise RuntimeError(probe.get('error', 'probe failed'))
+    return dict(summarize(samples), hardware=probe['hardware'], last_probe=probe)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cold', type=int, default=3, help='number of cold `main.py --probe` runs')
+    parser.add_argument('--warm', type=int, default=50, help='number of probe requests to the daemon')
+    args = parser.parse_args()
+
+    report = {}
+    if args.cold:
+        report['cold'] = bench_cold(args.cold)
+    if args.warm:
+        try:
+            report['warm'] = bench_warm(args.warm)
+        except (FileNotFoundError, ConnectionRefusedError):
+            report['warm'] = {'error': f'feeder daemon not running on {feeder_client.FEEDER_SOCKET}'}
+    cold, warm = report.get('cold', {}), report.get('warm', {})
+    if 'p50_ms' in cold and 'p50_ms' in warm:
+        if cold['hardware'] != warm['hardware']:
+            report['error'] = f"cold side ran on {cold['hardware']}, daemon on {warm['hardware']}: not comparable"
+        else:
+            report['speedup_p50'] = round(cold['p50_ms'] / max(warm['p50_ms'], 1e-6), 1)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,74 @@
+# bench_hx711.py
+# HX711 read cost on a simulated load cell: legacy busy-spin wait vs DOUT edge wait,
+# plus a HX711Sampler run (achieved rate, CPU per sample).
+#
+#   python3 bench/bench_hx711.py --samples 200 --rate 80
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'hardware'))
+
+from sim_gpio import SimGPIO, SimLoadCell
+from hx711 import HX711, HX711Sampler
+
+
+def make_hx(rate):
+    gpio = SimGPIO()
+    gpio.attach(SimLoadCell(5, 6, lambda t: 25.0, rate=rate, noise=0.2))
+    hx = HX711(5, 6, gpio=gpio)
+    hx.set_reference_unit(22)
+    return hx
+
+
+def spin_read(hx):
+    # what HX711.read() used to do
+    while hx.gpio.input(hx.dout) == 1:
+        pass
+    return hx.read()
+
+
+def measure(read_fn, hx, samples):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(samples):
+        read_fn(hx)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    return {
+        'samples': samples,
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'cpu_per_sample_us': round(cpu / samples * 1e6, 1),
+        'cpu_utilisation': round(cpu / wall, 3),
+    }
+
+
+def bench_sampler(hx, seconds):
+    sampler = HX711Sampler(hx, rate=0).start()
+    sampler.tare(samples=10)
+    cpu = time.process_time()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu
+    sampler.stop()
+    stats = sampler.stats()
+    stats['cpu_per_sample_us'] = round(cpu / max(1, stats['samples']) * 1e6, 1)
+    stats['weight'] = round(sampler.get_weight(), 2)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--rate', type=int, default=80, help='simulated chip rate (SPS)')
+    args = parser.parse_args()
+
+    report = {
+        'busy_spin': measure(spin_read, make_hx(args.rate), args.samples),
+        'edge_wait': measure(lambda hx: hx.read(), make_hx(args.rate), args.samples),
+        'sampler': bench_sampler(make_hx(args.rate), args.samples / args.rate),
+    }
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,131 @@
+# bench_server.py
+# Load test for the feeder server: N concurrent /video_feed clients plus API clients
+# hammering a JSON endpoint. Run it once against the dev server and once against
+# serve.py to compare how many streams and API requests/s each one sustains.
+#
+#   cd server && python3 flask_server_v2.py          # before
+#   cd server && python3 serve.py                     # after
+#   python3 bench/bench_server.py --url http://raspberrypi:5000 --streams 1,5,10,20 \
+#       --label uvicorn --output bench_server_uvicorn.json
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+
+BOUNDARY = b'--frame'
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+
+
+def stream_client(host, port, path, deadline, out):
+    frames, size, error = 0, 0, None
+    started = time.perf_counter()
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        conn.request('GET', path)
+        resp = conn.getresponse()
+        tail = b''
+        while time.perf_counter() < deadline:
+            chunk = resp.read1(65536) if hasattr(resp, 'read1') else resp.read(65536)
+            if not chunk:
+                break
+            size += len(chunk)
+            data = tail + chunk
+            frames += data.count(BOUNDARY)
+            tail = data[-len(BOUNDARY) + 1:]
+        conn.close()
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - started
+    out.append({'fps': frames / elapsed if elapsed else 0.0, 'bytes_per_s': size / elapsed if elapsed else 0.0,
+                'error': error})
+
+
+def api_client(host, port, path, deadline, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 500:
+                errors.append(resp.status)
+            else:
+                latencies.append(time.perf_counter() - t0)
+        except Exception as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.close()
+
+
+def run_level(host, port, streams, api_clients, duration, stream_path, api_path):
+    deadline = time.perf_counter() + duration
+    stream_results, latencies, errors = [], [], []
+    threads = [threading.Thread(target=stream_client, args=(host, port, stream_path, deadline, stream_results))
+               for _ in range(streams)]
+    threads += [threading.Thread(target=api_client, args=(host, port, api_path, deadline, latencies, errors))
+                for _ in range(api_clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(duration + 15)
+
+    fps = sorted(r['fps'] for r in stream_results if not r['error'])
+    ordered = sorted(latencies)
+    return {
+        'streams': streams,
+        'streams_ok': len(fps),
+        'stream_errors': sum(1 for r in stream_results if r['error']),
+        'stream_fps_mean': round(sum(fps) / len(fps), 2) if fps else 0.0,
+        'stream_fps_min': round(fps[0], 2) if fps else 0.0,
+        'stream_mbit_s': round(sum(r['bytes_per_s'] for r in stream_results) * 8 / 1e6, 2),
+        'api_clients': api_clients,
+        'api_rps': round(len(latencies) / duration, 1),
+        'api_p50_ms': round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        'api_p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+        'api_errors': len(errors),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--streams', default='0,1,5,10,20', help='comma separated stream client counts')
+    parser.add_argument('--api-clients', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--stream-path', default='/video_feed?width=320&quality=60')
+    parser.add_argument('--api-path', default='/health')
+    parser.add_argument('--min-fps', type=float, default=10.0,
+                        help='a level counts as sustained while every stream keeps this fps')
+    parser.add_argument('--label', help='name for this run, e.g. dev or uvicorn')
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    levels = []
+    for streams in [int(n) for n in args.streams.split(',')]:
+        level = run_level(url.hostname, url.port or 80, streams, args.api_clients, args.duration,
+                          args.stream_path, args.api_path)
+        levels.append(level)
+        print(json.dumps(level))
+
+    sustained = [l['streams'] for l in levels
+                 if l['stream_errors'] == 0 and l['streams_ok'] == l['streams']
+                 and (l['streams'] == 0 or l['stream_fps_min'] >= args.min_fps)]
+    report = {
+        'label': args.label,
+        'url': args.url,
+        'levels': levels,
+        'max_sustained_streams': max(sustained) if sustained else 0,
+        'peak_api_rps': max(l['api_rps'] for l in levels) if levels else 0.0,
+    }
+    print(json.dumps({k: v for k, v in report.items() if k != 'levels'}))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,104 @@
+# bench_startup.py
+# Measures how fast the server becomes usable after boot: module import time, time until
+# /health, /schedules and /past-schedules first answer, and (optionally) how long the
+# camera takes to become ready after the first frame request.
+#
+#   python3 bench/bench_startup.py                       # dev server (flask_server_v2.py)
+#   python3 bench/bench_startup.py --entry serve.py      # uvicorn entry point
+#   python3 bench/bench_startup.py --camera --runs 5 --output startup.json
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, 'server')
+ENDPOINTS = ['/health', '/schedules', '/past-schedules?limit=1']
+
+
+def measure_import():
+    code = ("import time; t = time.perf_counter(); import flask_server_v2; "
+            "print(time.perf_counter() - t)")
+    proc = subprocess.run([sys.executable, '-c', code], cwd=SERVER_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1:])
+    return round(float(proc.stdout.strip().splitlines()[-1]), 3)
+
+
+def get(url, timeout=1.0):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except OSError:
+        return None, None
+
+
+def wait_for(url, started, deadline):
+    while time.perf_counter() < deadline:
+        status, _ = get(url)
+        if status == 200:
+            return round(time.perf_counter() - started, 3)
+        time.sleep(0.02)
+    return None
+
+
+def measure_boot(entry, port, camera, timeout):
+    base = f'http://127.0.0.1:{port}'
+    cmd = [sys.executable, entry]
+    if entry == 'serve.py':
+        cmd += ['--port', str(port)]
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = started + timeout
+    try:
+        result = {path: wait_for(base + path, started, deadline) for path in ENDPOINTS}
+        if camera:
+            get(base + '/snapshot.jpg', timeout=timeout)
+            while time.perf_counter() < deadline:
+                _, body = get(base + '/camera-status')
+                state = json.loads(body).get('state') if body else None
+                if state in ('ready', 'unavailable'):
+                    result['camera_state'] = state
+                    result['camera_ready_s'] = round(time.perf_counter() - started, 3)
+                    break
+                time.sleep(0.05)
+        _, body = get(base + '/health')
+        if body:
+            result['startup'] = json.loads(body).get('startup')
+        return result
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entry', default='flask_server_v2.py', help='flask_server_v2.py or serve.py')
+    parser.add_argument('--port', type=int, default=5000, help='port the entry point listens on')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--camera', action='store_true', help='also time camera readiness')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    report = {'entry': args.entry, 'import_s': [], 'boots': []}
+    for _ in range(args.runs):
+        report['import_s'].append(measure_import())
+        report['boots'].append(measure_boot(args.entry, args.port, args.camera, args.timeout))
+        print(json.dumps(report['boots'][-1]))
+
+    for path in ENDPOINTS:
+        times = sorted(b[path] for b in report['boots'] if b.get(path) is not None)
+        report[f'{path.split("?")[0]}_median_s'] = times[len(times) // 2] if times else None
+    report['import_median_s'] = sorted(report['import_s'])[len(report['import_s']) // 2]
+    print(json.dumps({k: v for k, v in report.items() if k != 'boots'}))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
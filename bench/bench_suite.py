@@ -0,0 +1,493 @@
+# bench_suite.py
+# Regression benchmarks for the hot paths, runnable on any Linux box: the camera,
+# GPIO and detector are replaced by in-process stand-ins, so only our own code
+# (JPEG encode / fan-out, SQLite history, scheduler, HX711 decode, detection loop)
+# is measured.
+#
+#   frames     FrameBroadcaster.stream (what generate_frames returns) per client count
+#   history    save_feeding_history (append) and /past-schedules (query + JSON) latency
+#   scheduler  dispatch lag with many jobs due at once
+#   hx711      per-sample read cost on a simulated load cell
+#   detect     detect_person per-frame cost on recorded (or synthetic) frames
+#   identity   dog match latency as enrolled photos grow (must stay under 1 ms), crop embed cost
+#
+#   python3 bench/bench_suite.py                                  # everything, ~1 min
+#   python3 bench/bench_suite.py --only history,hx711 --sizes 100,10000
+#   python3 bench/bench_suite.py --frames-dir recorded/ --detector onnx --model yolov8n.onnx
+#   python3 bench/bench_suite.py --compare bench/results/<earlier>.json
+#
+# Results go to bench/results/<timestamp>.json (or --output) so runs can be diffed.
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+sys.path.insert(0, os.path.join(ROOT, 'hardware'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from detector_backends import Detector, Detections
+
+SECTIONS = ('frames', 'history', 'scheduler', 'hx711', 'detect', 'identity')
+DOGS = ('초코', '보리', '콩이')
+STATUSES = ('completed', 'completed', 'completed', 'no_dog', 'timeout', 'scheduled')
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'n': 0}
+    return {
+        'n': len(samples),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+        'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+def synthetic_frames(count=30, size=(640, 480), seed=1):
+    """Noisy background with a block that moves for the first half of the clip and then stays put:
+    compresses like a camera frame and gives the motion gate both cases."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    base = rng.integers(40, 200, (h, w, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        x = min(i, count // 2) * (w - 120) // count
+        frame[h // 3:h // 3 + 160, x:x + 120] = (20, 20, 20)
+        frame ^= rng.integers(0, 8, (h, w, 3), dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(frames_dir, limit=300):
+    import cv2
+    names = sorted(f for f in os.listdir(frames_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png')))[:limit]
+    frames = [cv2.imread(os.path.join(frames_dir, name)) for name in names]
+    return [f for f in frames if f is not None]
+
+
+class FakeCamera:
+    """capture_array() stand-in that cycles through frames in memory without pacing."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = -1
+
+    def capture_array(self):
+        self.index = (self.index + 1) % len(self.frames)
+        return self.frames[self.index]
+
+
+# === frames ===
+def _stream_client(broadcaster, deadline, width, out):
+    frames, size = 0, 0
+    gen = broadcaster.stream(width=width)
+    try:
+        for chunk in gen:
+            frames += 1
+            size += len(chunk)
+            if time.perf_counter() >= deadline:
+                break
+    finally:
+        gen.close()
+    out.append((frames, size))
+
+
+def bench_frames(frames, clients_levels, duration, fps, width):
+    from frame_broadcaster import FrameBroadcaster
+
+    report = []
+    for clients in clients_levels:
+        camera = FakeCamera(frames)
+        broadcaster = FrameBroadcaster(camera.capture_array, fps=fps, idle_timeout=0.0)
+        results = []
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=_stream_client, args=(broadcaster, deadline, width, results))
+                   for _ in range(clients)]
+        cpu = time.process_time()
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(duration + 10)
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu
+
+        per_client = sorted(n / elapsed for n, _ in results)
+        report.append({
+            'clients': clients,
+            'published_fps': round(broadcaster.seq / elapsed, 1),
+            'client_fps_min': round(per_client[0], 1) if per_client else 0.0,
+            'client_fps_mean': round(sum(per_client) / len(per_client), 1) if per_client else 0.0,
+            'total_mb_per_s': round(sum(s for _, s in results) / elapsed / 1e6, 2),
+            'cpu_utilisation': round(cpu / elapsed, 3),
+        })
+        # 다음 단계 전에 캡처 스레드가 멈추도록
+        time.sleep(0.1)
+    return {'fps_cap': fps, 'width': width, 'frame_size': list(frames[0].shape[1::-1]), 'levels': report}
+
+
+# === history ===
+def make_records(count, seed=2):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 7, 0)
+    records = []
+    for i in range(count):
+        when = start + timedelta(minutes=i * 7 + rng.randint(0, 5))
+        records.append({
+            'dog': rng.choice(DOGS),
+            'time': when.strftime('%H:%M'),
+            'voice': 'voice_a.mp3',
+            'amount': rng.choice((10, 20, 30)),
+            'status': rng.choice(STATUSES),
+            'datetime': when.strftime('%Y-%m-%d %H:%M:%S'),
+            'weight': round(rng.uniform(5, 30), 1),
+            'duration': round(rng.uniform(10, 60), 1),
+        })
+    return records
+
+
+def seed_store(directory, count):
+    from history_store import HistoryStore
+
+    db_path = os.path.join(directory, f'history_{count}.db')
+    json_path = os.path.join(directory, f'history_{count}.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(make_records(count), f, ensure_ascii=False)
+    started = time.perf_counter()
+    store = HistoryStore(db_path, legacy_json=json_path)
+    return store, time.perf_counter() - started
+
+
+def time_query(store, repeats, **kwargs):
+    samples = []
+    rows = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        records, _ = store.query(**kwargs)
+        # /past-schedules 는 jsonify(records) 까지 한다
+        json.dumps(records, ensure_ascii=False)
+        samples.append(time.perf_counter() - started)
+        rows = len(records)
+    result = summarize(samples)
+    result['rows'] = rows
+    return result
+
+
+def time_deep_page(store, pages, repeats, limit=100):
+    samples = []
+    for _ in range(repeats):
+        _, cursor = store.query(limit=limit)
+        for _ in range(pages - 2):
+            if cursor is None:
+                break
+            _, cursor = store.query(limit=limit, cursor=cursor)
+        started = time.perf_counter()
+        records, _ = store.query(limit=limit, cursor=cursor)
+        json.dumps(records, ensure_ascii=False)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def bench_history(sizes, saves, repeats):
+    report = []
+    with tempfile.TemporaryDirectory(prefix='bench_history_') as directory:
+        for size in sizes:
+            store, seed_seconds = seed_store(directory, size)
+            day = datetime(2024, 1, 1) + timedelta(minutes=size * 7 // 2)
+            day_start = day.strftime('%Y-%m-%d 00:00:00')
+            day_end = day.strftime('%Y-%m-%d 23:59:59')
+            try:
+                save_samples = []
+                for record in make_records(saves, seed=3):
+                    record['datetime'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    started = time.perf_counter()
+                    store.append(record)
+                    save_samples.append(time.perf_counter() - started)
+
+                report.append({
+                    'records': size,
+                    'seed_s': round(seed_seconds, 3),
+                    'save': summarize(save_samples),
+                    'query_latest': time_query(store, repeats),
+                    'query_dog': time_query(store, repeats, dog=DOGS[0]),
+                    'query_status': time_query(store, repeats, status='timeout'),
+                    'query_day': time_query(store, repeats, start=day_start, end=day_end),
+                    'query_page_10': time_deep_page(store, 10, max(1, repeats // 10)),
+                })
+            finally:
+                store.close()
+    return report
+
+
+# === scheduler ===
+def bench_scheduler(job_counts, spread, workers):
+    from feed_scheduler import FeedScheduler
+
+    report = []
+    for count in job_counts:
+        scheduler = FeedScheduler(max_workers=workers)
+        scheduler.start()
+        lags = []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def job(due):
+            lag = time.time() - due
+            with lock:
+                lags.append(lag)
+                if len(lags) == count:
+                    done.set()
+
+        first = time.time() + 0.5
+        for i in range(count):
+            due = first + spread * i / count
+            scheduler.add_once(due, lambda due=due: job(due), name=f'bench-{i}')
+        done.wait(spread + 30)
+        scheduler.stop(wait=True)
+
+        result = summarize(lags)
+        result.update({'jobs': count, 'spread_s': spread, 'workers': workers, 'ran': len(lags)})
+        report.append(result)
+    return report
+
+
+# === hx711 ===
+def bench_hx711_decode(samples, rate):
+    from bench_hx711 import make_hx, measure
+    from hx711 import HX711_READ_SECONDS
+
+    series = HX711_READ_SECONDS._default
+    count, total = series.count, series.sum
+    result = measure(lambda hx: hx.read(), make_hx(rate), samples)
+    shifted = series.count - count
+    if shifted:
+        # 24+gain 클럭 비트 쉬프트 + 디코드만 (DOUT 대기 제외)
+        result['decode_us'] = round((series.sum - total) / shifted * 1e6, 1)
+    result['rate'] = rate
+    return result
+
+
+# === detect ===
+class NullDetector(Detector):
+    """Detector stand-in: no model cost, so the loop overhead itself is measured."""
+
+    name = 'null'
+
+    def detect(self, frame, classes=None):
+        return Detections([], [], [])
+
+
+def bench_detect(frames, seconds, detector_backend, model_path, imgsz):
+    from yolov8_detect import detect_person, DetectionConfig
+    from motion_gate import MotionGate
+    from clip_recorder import ClipRecorder
+
+    if detector_backend == 'null':
+        detector = NullDetector()
+    else:
+        from detector_backends import load_detector
+        detector = load_detector(detector_backend, model_path, imgsz=imgsz)
+
+    configs = {
+        'every_frame': lambda: DetectionConfig(infer_every=1, imgsz=imgsz, show=False, dwell_seconds=1e9),
+        'stride2_motion_gate': lambda: DetectionConfig(infer_every=2, imgsz=imgsz, show=False, dwell_seconds=1e9,
+                                                       motion_gate=MotionGate()),
+    }
+    report = {'detector': getattr(detector, 'name', detector_backend), 'frames_available': len(frames)}
+    with tempfile.TemporaryDirectory(prefix='bench_detect_') as clip_dir:
+        # pre-roll ring as main.py runs it (no clip is triggered, so nothing is encoded)
+        configs['stride2_motion_gate_clip_ring'] = lambda: DetectionConfig(
+            infer_every=2, imgsz=imgsz, show=False, dwell_seconds=1e9, motion_gate=MotionGate(),
+            recorder=ClipRecorder(clip_dir))
+        for label, make_config in configs.items():
+            stats = {}
+            config = make_config()
+            detect_person(detector, FakeCamera(frames), config=config, timeout=seconds, stats=stats)
+            if config.recorder is not None:
+                config.recorder.close()
+            frames_run = max(1, stats['frames'])
+            stats['per_frame_ms'] = round(stats['seconds'] * 1000 / frames_run, 3)
+            report[label] = stats
+    return report
+
+
+# === identity ===
+def bench_identity(image_counts, dogs, repeats, crops=3, seed=4):
+    """Match latency for `crops` crops against `dogs` dogs with N enrolled photos each."""
+    import dog_identity
+
+    embedder = dog_identity.HistogramEmbedder()
+    rng = np.random.default_rng(seed)
+    crop_images = [rng.integers(0, 255, (160, 128, 3), dtype=np.uint8) for _ in range(crops)]
+    embed_times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        query = embedder.embed(crop_images)
+        embed_times.append(time.perf_counter() - started)
+
+    levels = []
+    for count in image_counts:
+        index = dog_identity.EmbeddingIndex(embedder=embedder.name)
+        for d in range(dogs):
+            index.add(f'dog{d}', rng.normal(size=(count, embedder.dim)))
+        times = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            index.match(query)
+            times.append(time.perf_counter() - started)
+        match = summarize(times)
+        levels.append({
+            'images': count,
+            'prototypes': sum(entry['prototypes'] for entry in index.stats().values()),
+            'match': match,
+            'sub_ms': match['p99_ms'] < 1.0,
+        })
+        if not levels[-1]['sub_ms']:
+            print(f"  ⚠️ identity match p99 {match['p99_ms']} ms with {count} photos per dog", file=sys.stderr)
+    return {'dogs': dogs, 'crops': crops, 'embed': summarize(embed_times), 'levels': levels}
+
+
+# === compare ===
+def flatten(value, prefix=''):
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        # 리스트 항목은 단계 이름(clients/records/jobs)으로 구분
+        items = ((str(item.get('clients', item.get('records', item.get('jobs', item.get('images', i)))))
+                  if isinstance(item, dict) else str(i), item) for i, item in enumerate(value))
+    else:
+        return {prefix: value}
+    flat = {}
+    for key, item in items:
+        flat.update(flatten(item, f'{prefix}.{key}' if prefix else str(key)))
+    return flat
+
+
+def compare(old_report, new_report, threshold=0.1):
+    old = flatten(old_report.get('results', {}))
+    new = flatten(new_report.get('results', {}))
+    rows = []
+    for key, value in new.items():
+        before = old.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before:
+            continue
+        change = (value - before) / abs(before)
+        if abs(change) >= threshold:
+            rows.append((key, before, value, change))
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_ints(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', default=','.join(SECTIONS), help=f'comma list of {", ".join(SECTIONS)}')
+    parser.add_argument('--clients', default='1,5,10,20', help='stream client counts')
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per stream level')
+    parser.add_argument('--fps', type=float, default=30, help='broadcaster capture rate')
+    parser.add_argument('--width', type=int, default=None, help='stream width (None = full size)')
+    parser.add_argument('--sizes', default='100,10000,100000', help='history sizes')
+    parser.add_argument('--saves', type=int, default=200, help='appends timed per history size')
+    parser.add_argument('--repeats', type=int, default=50, help='queries timed per history size')
+    parser.add_argument('--jobs', default='100,1000,5000', help='scheduler job counts')
+    parser.add_argument('--spread', type=float, default=2.0, help='seconds the scheduler jobs are spread over')
+    parser.add_argument('--workers', type=int, default=4, help='scheduler worker threads')
+    parser.add_argument('--hx-samples', type=int, default=200)
+    parser.add_argument('--hx-rate', type=int, default=80, help='simulated HX711 rate (SPS)')
+    parser.add_argument('--frames-dir', default=None, help='recorded frames (jpg/png); synthetic when omitted')
+    parser.add_argument('--detect-seconds', type=float, default=3.0)
+    parser.add_argument('--detector', default='null', help='null (loop only) or a detector_backends backend')
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--imgsz', type=int, default=320)
+    parser.add_argument('--identity-images', default='10,100,1000,10000', help='enrolled photos per dog')
+    parser.add_argument('--identity-dogs', type=int, default=5)
+    parser.add_argument('--label', default=None, help='free-form tag stored with the results')
+    parser.add_argument('--output', default=None, help='result file (default bench/results/<timestamp>.json)')
+    parser.add_argument('--compare', default=None, help='earlier result file to diff against')
+    args = parser.parse_args()
+
+    only = [s.strip() for s in args.only.split(',') if s.strip()]
+    unknown = set(only) - set(SECTIONS)
+    if unknown:
+        parser.error(f'unknown section(s): {", ".join(sorted(unknown))}')
+
+    frames = None
+    if 'frames' in only or 'detect' in only:
+        frames = load_frames(args.frames_dir) if args.frames_dir else synthetic_frames()
+        if not frames:
+            parser.error(f'no frames in {args.frames_dir}')
+
+    results = {}
+    for section in only:
+        print(f'▶ {section}', file=sys.stderr)
+        started = time.perf_counter()
+        if section == 'frames':
+            results['frames'] = bench_frames(frames, parse_ints(args.clients), args.duration, args.fps, args.width)
+        elif section == 'history':
+            results['history'] = bench_history(parse_ints(args.sizes), args.saves, args.repeats)
+        elif section == 'scheduler':
+            results['scheduler'] = bench_scheduler(parse_ints(args.jobs), args.spread, args.workers)
+        elif section == 'hx711':
+            results['hx711'] = bench_hx711_decode(args.hx_samples, args.hx_rate)
+        elif section == 'detect':
+            results['detect'] = bench_detect(frames, args.detect_seconds, args.detector, args.model, args.imgsz)
+        elif section == 'identity':
+            results['identity'] = bench_identity(parse_ints(args.identity_images), args.identity_dogs, args.repeats)
+        print(f'  {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'label': args.label,
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'frames_source': args.frames_dir or 'synthetic',
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(ROOT, 'bench', 'results',
+                                         datetime.now().strftime('%Y%m%d_%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f'💾 {output}', file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        rows = compare(previous, report)
+        print(f'\nChanges ≥10% vs {args.compare} ({previous.get("meta", {}).get("commit")}):', file=sys.stderr)
+        for key, before, after, change in rows:
+            print(f'  {key:60s} {before:>12} → {after:<12} {change:+.0%}', file=sys.stderr)
+        if not rows:
+            print('  none', file=sys.stderr)
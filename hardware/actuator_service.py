@@ -0,0 +1,176 @@
+# actuator_service.py
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import servo_control
+import tracing
+
+SECONDS_PER_DEGREE = 0.12 / 60  # SG90 at 5V: ~0.12 s per 60 degrees
+MIN_SETTLE = 0.05
+
+
+class ActuatorCommand:
+    def __init__(self, kind, angle=None, seconds=None):
+        self.kind = kind
+        self.angle = angle
+        self.seconds = seconds
+        self.future = Future()
+        self.submitted_at = None
+
+
+class ActuatorStopped(RuntimeError):
+    pass
+
+
+class ActuatorService:
+    """Runs servo commands on its own thread so sensor loops keep sampling while it moves.
+
+    Commands (each returns a concurrent.futures.Future):
+      move(angle)             travel to angle (and release the PWM after it if auto_release)
+      pulse(angle, ms)        open to angle for ms milliseconds, then back to the previous angle
+      hold(seconds)           keep the servo where it is (delays the following commands)
+      release()               duty 0: stop pulses, the servo holds by friction
+    Consecutive queued moves are coalesced: only the last target is driven.
+    stats() covers the commands since the last reset_stats() (the feeder resets per feeding).
+    After stop(), queued and new commands fail with ActuatorStopped.
+    """
+
+    def __init__(self, servo=servo_control, clock=time, auto_release=False,
+                 seconds_per_degree=SECONDS_PER_DEGREE):
+        self.servo = servo
+        self.clock = clock
+        self.auto_release = auto_release
+        self.seconds_per_degree = seconds_per_degree
+        self.angle = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stats = {}
+        self._running = True
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name='actuator')
+        self._thread.start()
+
+    # === public API ===
+    def move(self, angle):
+        return self._submit(ActuatorCommand('move', angle=angle))
+
+    def pulse(self, angle, ms):
+        return self._submit(ActuatorCommand('pulse', angle=angle, seconds=ms / 1000.0))
+
+    def hold(self, seconds):
+        return self._submit(ActuatorCommand('hold', seconds=seconds))
+
+    def release(self):
+        return self._submit(ActuatorCommand('release'))
+
+    def idle(self, timeout=None):
+        """Wait until every queued command has finished."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout=timeout)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            pending, self._queue = list(self._queue), deque()
+            self._cond.notify_all()
+        # nobody may wait forever on a command that will never run
+        for command in pending:
+            command.future.set_exception(ActuatorStopped(f'actuator stopped before {command.kind}'))
+        self._thread.join(timeout=2)
+
+    def reset_stats(self):
+        with self._cond:
+            self._stats = {}
+
+    def stats(self):
+        with self._cond:
+            return {
+                kind: {
+                    'count': s['count'],
+                    'coalesced': s['coalesced'],
+                    'mean_wait_ms': round(s['wait'] / max(1, s['count']) * 1000, 2),
+                    'mean_run_ms': round(s['run'] / max(1, s['count']) * 1000, 2),
+                    'max_run_ms': round(s['max_run'] * 1000, 2),
+                }
+                for kind, s in self._stats.items()
+            }
+
+    # === worker ===
+    def _submit(self, command):
+        command.submitted_at = self.clock.time()
+        with self._cond:
+            if self._running:
+                self._queue.append(command)
+                self._cond.notify_all()
+                return command.future
+        command.future.set_exception(ActuatorStopped(f'actuator stopped, {command.kind} not run'))
+        return command.future
+
+    def _record(self, kind, wait=0.0, run=0.0, coalesced=False):
+        s = self._stats.setdefault(kind, {'count': 0, 'coalesced': 0, 'wait': 0.0, 'run': 0.0, 'max_run': 0.0})
+        if coalesced:
+            s['coalesced'] += 1
+            return
+        s['count'] += 1
+        s['wait'] += wait
+        s['run'] += run
+        s['max_run'] = max(s['max_run'], run)
+
+    def _next(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or not self._running)
+            if not self._running:
+                return None
+            command = self._queue.popleft()
+            # Coalesce back-to-back moves: drive straight to the last target
+            while command.kind == 'move' and self._queue and self._queue[0].kind == 'move':
+                self._record('move', coalesced=True)
+                command.future.set_result({'coalesced': True, 'angle': command.angle})
+                command = self._queue.popleft()
+            self._busy = True
+            return command
+
+    def _travel(self, angle):
+        seconds = max(MIN_SETTLE, abs(angle - self.angle) * self.seconds_per_degree)
+        self.servo.move(angle)
+        self.angle = angle
+        self.clock.sleep(seconds)
+
+    def _execute(self, command):
+        if command.kind == 'move':
+            self._travel(command.angle)
+            if self.auto_release:
+                self.servo.release()
+        elif command.kind == 'pulse':
+            back = self.angle
+            self.servo.move(command.angle)
+            self.angle = command.angle
+            self.clock.sleep(command.seconds)
+            self._travel(back)
+            if self.auto_release:
+                self.servo.release()
+        elif command.kind == 'hold':
+            self.clock.sleep(command.seconds)
+        elif command.kind == 'release':
+            self.servo.release()
+
+    def _run(self):
+        while True:
+            command = self._next()
+            if command is None:
+                break
+            started = self.clock.time()
+            try:
+                with tracing.span(f'servo.{command.kind}', cat='servo', angle=command.angle):
+                    self._execute(command)
+                finished = self.clock.time()
+                command.future.set_result({'angle': self.angle, 'run_s': round(finished - started, 4)})
+            except Exception as e:
+                finished = self.clock.time()
+                command.future.set_exception(e)
+            with self._cond:
+                self._record(command.kind, wait=started - command.submitted_at, run=finished - started)
+                self._busy = False
+                self._cond.notify_all()
@@ -0,0 +1,281 @@
+# clip_recorder.py
+# Short event clips (pre-roll + post-roll) from a bounded in-memory frame ring.
+#
+#   recorder = ClipRecorder(CLIP_DIR, pre_roll=3, post_roll=5)
+#   recorder.add(frame, t)                    # every frame the detection loop sees (resize + deque)
+#   future = recorder.trigger('detected', t)  # future.name is the file name; the result says
+#                                             # {'status': 'written' | 'failed' | 'dropped', ...}
+#   recorder.follow(camera, clock)            # keep filling the post-roll after the loop stopped
+#
+# Frames are downscaled to `width` and thinned to `fps` on their way into the ring, which
+# only holds the last pre_roll seconds (a few MB). Nothing touches the SD card until an
+# event: the clip's frames are then handed to an encoder thread, and the clip directory
+# is kept under max_bytes by deleting the oldest clips first. A trigger that lands while
+# a clip is still collecting its post-roll extends that clip instead of starting another.
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import cv2
+
+import metrics
+
+CLIP_DIR = os.environ.get('FEEDER_CLIP_DIR', '/home/pi/auto_feeder/clips')
+CLIP_EXTENSION = '.mp4'
+CODECS = ('avc1', 'mp4v')  # H.264 when OpenCV's ffmpeg has an encoder for it, else MPEG-4 part 2
+
+CLIPS = metrics.counter('feeder_clips_total', 'Event clips by result (written, failed, dropped)', ['result'])
+CLIP_ENCODE_SECONDS = metrics.histogram('feeder_clip_encode_seconds', 'Background encode + write time per clip',
+                                        buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0))
+
+
+class _Clip:
+    def __init__(self, name, end, frames):
+        self.name = name
+        self.end = end
+        self.frames = frames  # [(t, frame)], oldest first
+        self.future = Future()
+        self.future.name = name
+
+    def finish(self, status, **fields):
+        self.future.set_result(dict(fields, name=self.name, status=status, frames=len(self.frames)))
+
+
+class ClipRecorder:
+    """Bounded frame ring + background clip encoder with a disk budget.
+
+    pre_roll / post_roll  seconds kept before / recorded after the first trigger
+    fps                   frames per second kept (extra camera frames are skipped)
+    width                 frames wider than this are downscaled before buffering
+    max_bytes             clip directory budget; oldest clips are deleted beyond it
+    """
+
+    def __init__(self, clip_dir=CLIP_DIR, pre_roll=3.0, post_roll=5.0, fps=10.0, width=320,
+                 max_bytes=200 * 1024 * 1024, max_queue=4):
+        self.clip_dir = clip_dir
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.fps = fps
+        self.width = width
+        self.max_bytes = max_bytes
+        self.ring = deque(maxlen=max(1, int(pre_roll * fps) + 1))
+        self.frames_seen = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.encode_time = 0.0
+        self._interval = 0.8 / fps  # tolerate camera jitter when thinning
+        self._last_kept = None
+        self._pending = []  # clips still collecting post-roll frames
+        self._seq = 0
+        self._codec = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._follow = None
+        self._follow_stop = threading.Event()
+        os.makedirs(clip_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True, name='clip-encoder')
+        self._thread.start()
+
+    # === detection loop side (must stay cheap) ===
+    def add(self, frame, t):
+        """Buffer one frame; returns False when it was skipped to keep the ring at `fps`."""
+        self.frames_seen += 1
+        if self._last_kept is not None and t - self._last_kept < self._interval:
+            return False
+        self._last_kept = t
+        h, w = frame.shape[:2]
+        if w > self.width:
+            small = cv2.resize(frame, (self.width, round(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        else:
+            small = frame.copy()  # the camera may reuse its buffer
+        with self._lock:
+            self.ring.append((t, small))
+            while self.ring[0][0] < t - self.pre_roll:
+                self.ring.popleft()
+            done = []
+            for clip in self._pending:
+                clip.frames.append((t, small))
+                if t >= clip.end:
+                    done.append(clip)
+            for clip in done:
+                self._pending.remove(clip)
+                self._submit(clip)
+        return True
+
+    def trigger(self, event, t):
+        """Start (or extend) a clip around t; returns the clip's Future (file name in .name).
+
+        The file only exists once the future's status is 'written' (and may later be evicted).
+        """
+        print(f"🎬 Clip event: {event}")
+        with self._lock:
+            if self._pending:
+                clip = self._pending[-1]
+                clip.end = max(clip.end, t + self.post_roll)
+                return clip.future
+            self._seq += 1
+            stamp = time.strftime('%Y%m%d_%H%M%S')
+            name = f"clip_{stamp}_{os.getpid()}_{self._seq}{CLIP_EXTENSION}"
+            frames = [(ft, frame) for ft, frame in self.ring if ft >= t - self.pre_roll]
+            clip = _Clip(name, t + self.post_roll, frames)
+            self._pending.append(clip)
+            return clip.future
+
+    def flush(self):
+        """Hand clips that are still collecting to the encoder with what they have."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            for clip in pending:
+                self._submit(clip)
+
+    # === post-roll after the detection loop returned ===
+    def follow(self, camera, clock=time):
+        """Keep capturing on a background thread until the pending clips are complete."""
+        self.stop_following()
+        if not self._pending:
+            return None
+        self._follow_stop.clear()
+        self._follow = threading.Thread(target=self._follow_run, args=(camera, clock),
+                                         daemon=True, name='clip-follow')
+        self._follow.start()
+        return self._follow
+
+    def _follow_run(self, camera, clock):
+        try:
+            while not self._follow_stop.is_set() and self._pending:
+                self.add(camera.capture_array(), clock.time())
+        except Exception as e:
+            print(f"⚠️ Clip post-roll capture stopped: {e}")
+        finally:
+            self.flush()  # stopped early or the camera failed: write what was collected
+
+    def stop_following(self):
+        """Release the camera for the caller (the clip keeps the frames it already has)."""
+        if self._follow is not None:
+            self._follow_stop.set()
+            self._follow.join()
+            self._follow = None
+
+    # === encoder thread ===
+    def _submit(self, clip):
+        try:
+            self._queue.put_nowait(clip)
+        except queue.Full:
+            self.dropped += 1
+            CLIPS.labels('dropped').inc()
+            clip.finish('dropped', error='encoder queue full')
+
+    def _run(self):
+        while True:
+            clip = self._queue.get()
+            if clip is None:
+                return
+            started = time.perf_counter()
+            try:
+                size = self._encode(clip)
+            except Exception as e:
+                self.failed += 1
+                CLIPS.labels('failed').inc()
+                print(f"⚠️ Clip {clip.name} not written: {e}")
+                clip.finish('failed', error=str(e))
+            else:
+                self.written += 1
+                CLIPS.labels('written').inc()
+                self._evict(keep=clip.name)
+                span = clip.frames[-1][0] - clip.frames[0][0]
+                clip.finish('written', bytes=size, seconds=round(span, 2))
+            elapsed = time.perf_counter() - started
+            self.encode_time += elapsed
+            CLIP_ENCODE_SECONDS.observe(elapsed)
+
+    def _open_writer(self, path, fps, size):
+        codecs = (self._codec,) if self._codec else CODECS
+        for codec in codecs:
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+            if writer.isOpened():
+                self._codec = codec
+                return writer
+            writer.release()
+        raise RuntimeError(f"no video encoder available (tried {', '.join(codecs)})")
+
+    def _encode(self, clip):
+        if not clip.frames:
+            raise ValueError('no frames')
+        first_t, first = clip.frames[0]
+        h, w = first.shape[:2]
+        span = clip.frames[-1][0] - first_t
+        # play back at the rate the frames were actually kept
+        fps = min(self.fps, max(1.0, (len(clip.frames) - 1) / span)) if span > 0 else self.fps
+        path = os.path.join(self.clip_dir, clip.name)
+        tmp_path = path[:-len(CLIP_EXTENSION)] + '.tmp' + CLIP_EXTENSION
+        writer = self._open_writer(tmp_path, fps, (w, h))
+        try:
+            for _, frame in clip.frames:
+                if frame.shape[:2] != (h, w):
+                    frame = cv2.resize(frame, (w, h))
+                writer.write(frame)
+        finally:
+            writer.release()
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def _evict(self, keep=None):
+        clips = list_clips(self.clip_dir)  # newest first
+        total = sum(clip['bytes'] for clip in clips)
+        for clip in reversed(clips):
+            if total <= self.max_bytes:
+                break
+            if clip['name'] == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.clip_dir, clip['name']))
+            except OSError:
+                continue
+            total -= clip['bytes']
+            self.evicted += 1
+
+    def stats(self):
+        return {
+            'buffered': len(self.ring),
+            'frames_seen': self.frames_seen,
+            'pending': len(self._pending),
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'evicted': self.evicted,
+            'codec': self._codec,
+            'encode_ms_background': round(self.encode_time * 1000, 1),
+        }
+
+    def close(self, timeout=30):
+        """Finish the pending clips and wait for the encoder."""
+        self.stop_following()
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+def list_clips(directory=None):
+    """Finished clips in directory, newest first: [{'name', 'bytes', 'mtime'}]."""
+    directory = directory or CLIP_DIR
+    clips = []
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return clips
+    for entry in entries:
+        if not entry.name.endswith(CLIP_EXTENSION) or entry.name.endswith('.tmp' + CLIP_EXTENSION):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        clips.append({'name': entry.name, 'bytes': stat.st_size, 'mtime': stat.st_mtime})
+    clips.sort(key=lambda clip: clip['mtime'], reverse=True)
+    return clips
@@ -0,0 +1,250 @@
+# detector_backends.py
+# CPU inference backends for the YOLOv8 detector. Every backend returns the same
+# Detections structure, so detect_person doesn't care which one is loaded.
+#
+#   ultralytics  yolov8n.pt through PyTorch (reference, slowest on a Pi)
+#   onnx         yolov8n.onnx through ONNX Runtime
+#   openvino     yolov8n_openvino_model/ through OpenVINO
+#   ncnn         yolov8n_ncnn_model/ through NCNN
+#
+# Export (once, on any machine with ultralytics installed):
+#   python3 detector_backends.py export --backend onnx --int8
+import os
+import argparse
+import importlib.util
+
+import cv2
+import numpy as np
+
+BACKEND_MODULES = {
+    'ultralytics': 'ultralytics',
+    'onnx': 'onnxruntime',
+    'openvino': 'openvino',
+    'ncnn': 'ncnn',
+}
+
+DEFAULT_MODELS = {
+    'ultralytics': 'yolov8n.pt',
+    'onnx': 'yolov8n.onnx',
+    'openvino': 'yolov8n_openvino_model',
+    'ncnn': 'yolov8n_ncnn_model',
+}
+
+
+def available_backends():
+    return [name for name, module in BACKEND_MODULES.items() if importlib.util.find_spec(module)]
+
+
+class Detections:
+    """boxes: (N, 4) xyxy in frame pixels, confidences: (N,), classes: (N,) int."""
+
+    def __init__(self, boxes, confidences, classes):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.classes = np.asarray(classes, dtype=np.int32).reshape(-1)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def class_list(self):
+        return self.classes.tolist()
+
+    def crop(self, frame, index, pad=0.05):
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = self.boxes[index]
+        px, py = (x2 - x1) * pad, (y2 - y1) * pad
+        x1, y1 = max(0, int(x1 - px)), max(0, int(y1 - py))
+        x2, y2 = min(w, int(x2 + px)), min(h, int(y2 + py))
+        return frame[y1:y2, x1:x2]
+
+    def plot(self, frame):
+        annotated = frame.copy()
+        for (x1, y1, x2, y2), conf, cls in zip(self.boxes, self.confidences, self.classes):
+            cv2.rectangle(annotated, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+            cv2.putText(annotated, f"{cls} {conf:.2f}", (int(x1), max(12, int(y1) - 4)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        return annotated
+
+
+class Detector:
+    name = 'base'
+
+    def __init__(self, imgsz=640, conf=0.25, iou=0.45):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+
+    def detect(self, frame, classes=None):
+        raise NotImplementedError
+
+
+class UltralyticsDetector(Detector):
+    name = 'ultralytics'
+
+    def __init__(self, model_path=None, model=None, **kwargs):
+        super().__init__(**kwargs)
+        if model is None:
+            from ultralytics import YOLO
+            model = YOLO(model_path or DEFAULT_MODELS['ultralytics'])
+        self.model = model
+
+    def detect(self, frame, classes=None):
+        kwargs = {'imgsz': self.imgsz, 'conf': self.conf, 'iou': self.iou, 'verbose': False}
+        if classes is not None:
+            kwargs['classes'] = list(classes)
+        boxes = self.model(frame, **kwargs)[0].boxes
+        return Detections(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+
+
+class RawYoloDetector(Detector):
+    """Shared letterbox pre-processing and YOLOv8 head decoding for exported models."""
+
+    def _forward(self, blob):
+        # blob: (1, 3, imgsz, imgsz) float32 RGB 0..1 -> (4 + num_classes, num_anchors)
+        raise NotImplementedError
+
+    def _letterbox(self, frame):
+        h, w = frame.shape[:2]
+        scale = min(self.imgsz / h, self.imgsz / w)
+        nh, nw = int(round(h * scale)), int(round(w * scale))
+        top, left = (self.imgsz - nh) // 2, (self.imgsz - nw) // 2
+        canvas = np.full((self.imgsz, self.imgsz, 3), 114, dtype=np.uint8)
+        canvas[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        blob = cv2.dnn.blobFromImage(canvas, 1 / 255.0, swapRB=True)
+        return blob, scale, left, top
+
+    def detect(self, frame, classes=None):
+        blob, scale, left, top = self._letterbox(frame)
+        output = np.squeeze(np.asarray(self._forward(blob)))
+        if output.shape[0] > output.shape[1]:
+            output = output.T
+        scores = output[4:]
+        class_ids = scores.argmax(axis=0)
+        confidences = scores[class_ids, np.arange(scores.shape[1])]
+
+        keep = confidences >= self.conf
+        if classes is not None:
+            keep &= np.isin(class_ids, list(classes))
+        if not keep.any():
+            return Detections(np.empty((0, 4)), [], [])
+
+        cx, cy, bw, bh = output[:4, keep]
+        class_ids, confidences = class_ids[keep], confidences[keep]
+        x1 = (cx - bw / 2 - left) / scale
+        y1 = (cy - bh / 2 - top) / scale
+        boxes = np.stack([x1, y1, x1 + bw / scale, y1 + bh / scale], axis=1)
+
+        # class-aware NMS: offset boxes per class so different classes never suppress each other
+        offset = class_ids[:, None] * 4096.0
+        xywh = np.concatenate([boxes[:, :2] + offset, boxes[:, 2:] - boxes[:, :2]], axis=1)
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), confidences.tolist(), self.conf, self.iou)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        return Detections(boxes[indices], confidences[indices], class_ids[indices])
+
+
+class OnnxDetector(RawYoloDetector):
+    name = 'onnx'
+
+    def __init__(self, model_path=None, threads=None, **kwargs):
+        super().__init__(**kwargs)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path or DEFAULT_MODELS['onnx'], options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _forward(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVINODetector(RawYoloDetector):
+    name = 'openvino'
+
+    def __init__(self, model_path=None, **kwargs):
+        super().__init__(**kwargs)
+        import openvino as ov
+        path = model_path or DEFAULT_MODELS['openvino']
+        if os.path.isdir(path):
+            path = next(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.xml'))
+        core = ov.Core()
+        self.compiled = core.compile_model(core.read_model(path), 'CPU')
+        self.output = self.compiled.output(0)
+
+    def _forward(self, blob):
+        return self.compiled([blob])[self.output]
+
+
+class NcnnDetector(RawYoloDetector):
+    name = 'ncnn'
+
+    def __init__(self, model_path=None, threads=None, **kwargs):
+        super().__init__(**kwargs)
+        import ncnn
+        path = model_path or DEFAULT_MODELS['ncnn']
+        self.ncnn = ncnn
+        self.net = ncnn.Net()
+        if threads:
+            self.net.opt.num_threads = threads
+        self.net.load_param(os.path.join(path, 'model.ncnn.param'))
+        self.net.load_model(os.path.join(path, 'model.ncnn.bin'))
+
+    def _forward(self, blob):
+        with self.net.create_extractor() as ex:
+            ex.input('in0', self.ncnn.Mat(blob[0]).clone())
+            _, out = ex.extract('out0')
+        return np.array(out)
+
+
+DETECTORS = {
+    'ultralytics': UltralyticsDetector,
+    'onnx': OnnxDetector,
+    'openvino': OpenVINODetector,
+    'ncnn': NcnnDetector,
+}
+
+
+def load_detector(backend='ultralytics', model_path=None, **kwargs):
+    if backend not in DETECTORS:
+        raise ValueError(f"unknown detector backend: {backend} (choose from {', '.join(DETECTORS)})")
+    return DETECTORS[backend](model_path=model_path, **kwargs)
+
+
+# A bare ultralytics YOLO object is still accepted wherever a Detector is expected
+def as_detector(model, imgsz=640):
+    if isinstance(model, Detector):
+        return model
+    return UltralyticsDetector(model=model, imgsz=imgsz)
+
+
+def export_model(weights='yolov8n.pt', backend='onnx', imgsz=320, int8=False):
+    from ultralytics import YOLO
+    if int8 and backend == 'ncnn':
+        raise ValueError("NCNN INT8 needs a calibration table (ncnn2table); export FP32 instead")
+    fmt = {'onnx': 'onnx', 'openvino': 'openvino', 'ncnn': 'ncnn'}[backend]
+    # ultralytics calibrates INT8 itself for OpenVINO; ONNX gets dynamic quantisation below
+    path = YOLO(weights).export(format=fmt, imgsz=imgsz, int8=int8 and backend == 'openvino')
+    if int8 and backend == 'onnx':
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized = path.replace('.onnx', '_int8.onnx')
+        quantize_dynamic(path, quantized, weight_type=QuantType.QUInt8)
+        path = quantized
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export')
+    export.add_argument('--weights', default='yolov8n.pt')
+    export.add_argument('--backend', choices=['onnx', 'openvino', 'ncnn'], default='onnx')
+    export.add_argument('--imgsz', type=int, default=320)
+    export.add_argument('--int8', action='store_true')
+    sub.add_parser('list')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(export_model(args.weights, args.backend, args.imgsz, args.int8))
+    else:
+        print(', '.join(available_backends()))
@@ -0,0 +1,203 @@
+# dispense_controller.py
+import os
+import json
+import time
+
+import tracing
+
+CALIBRATION_FILE = os.environ.get('FEEDER_CALIBRATION', '/home/pi/auto_feeder/dispense_calibration.json')
+
+
+def linear_slope(points):
+    """Least-squares slope of [(t, value), ...]; None with fewer than 3 points."""
+    if len(points) < 3:
+        return None
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if var == 0:
+        return None
+    return sum((t - mean_t) * (v - mean_v) for t, v in points) / var
+
+
+class DispenseController:
+    """Closes the feeder gate on *predicted* final weight instead of measured weight.
+
+    Food keeps falling after the gate starts closing, so the controller estimates the
+    live flow rate from the HX711 sampler and closes once
+
+        weight + flow * close_latency + learned_correction >= target - fine_grams
+
+    then tops up the last grams with short pulses at a partial-open angle. The
+    correction (grams still arriving that the flow model missed) and the grams per
+    pulse are learned per feeder and saved to calibration_path.
+
+    servo is anything with move(angle) / release(), e.g. the servo_control module or an
+    ActuatorService (whose pulse() then times the top-up pulses on the actuator thread).
+    """
+
+    def __init__(self, sampler, servo, clock=time, feeder_id='default', calibration_path=CALIBRATION_FILE,
+                 open_angle=90, trickle_angle=40, small_portion_grams=10, fine_grams=2.0,
+                 tolerance=0.5, close_latency=0.3, flow_window=1.0, pulse_seconds=0.15,
+                 max_pulses=10, settle_seconds=1.5, max_seconds=60, learning_rate=0.3):
+        self.sampler = sampler
+        self.servo = servo
+        self.clock = clock
+        self.feeder_id = feeder_id
+        self.calibration_path = calibration_path
+        self.open_angle = open_angle
+        self.trickle_angle = trickle_angle
+        self.small_portion_grams = small_portion_grams
+        self.fine_grams = fine_grams
+        self.tolerance = tolerance
+        self.close_latency = close_latency
+        self.flow_window = flow_window
+        self.pulse_seconds = pulse_seconds
+        self.max_pulses = max_pulses
+        self.settle_seconds = settle_seconds
+        self.max_seconds = max_seconds
+        self.learning_rate = learning_rate
+        self.calibration = self._load_calibration()
+
+    # === calibration ===
+    def _load_calibration(self):
+        calibration = {'correction': 0.0, 'pulse_grams': 1.0, 'runs': 0}
+        try:
+            with open(self.calibration_path, 'r', encoding='utf-8') as f:
+                calibration.update(json.load(f).get(self.feeder_id, {}))
+        except (OSError, ValueError):
+            pass
+        return calibration
+
+    def _save_calibration(self):
+        try:
+            with open(self.calibration_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[self.feeder_id] = self.calibration
+        directory = os.path.dirname(self.calibration_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.calibration_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.calibration_path)
+
+    def _learn(self, key, observed):
+        a = self.learning_rate
+        self.calibration[key] = round((1 - a) * self.calibration[key] + a * observed, 3)
+
+    # === measurements ===
+    def flow_rate(self):
+        now = self.clock.time()
+        points = [(t, w) for t, w in self.sampler.series() if t >= now - self.flow_window]
+        return linear_slope(points) or 0.0
+
+    # Filtered weight from a fresh sample; None when none arrived within 1 s (stale values don't count)
+    def _weight(self, window=3):
+        if not self.sampler.wait_for_samples(1, timeout=1.0):
+            return None
+        return self.sampler.get_weight(window=window)
+
+    @tracing.traced('dispense.settle')
+    def _settle(self):
+        # Wait until nothing is falling any more (or settle_seconds passed)
+        deadline = self.clock.time() + self.settle_seconds
+        self.clock.sleep(min(0.3, self.settle_seconds))
+        while self.clock.time() < deadline and abs(self.flow_rate()) > 0.3:
+            self.sampler.wait_for_samples(1, timeout=1.0)
+        return self._weight(window=5)
+
+    def _close(self):
+        self.servo.move(0)
+        self.clock.sleep(self.close_latency)
+        self.servo.release()
+
+    # === main entry ===
+    def dispense(self, target):
+        clock = self.clock
+        started = clock.time()
+        correction = self.calibration['correction']
+        report = {'target': target, 'status': 'completed', 'pulses': 0,
+                  'correction_used': correction}
+
+        weight = self._weight()
+        if weight is None:
+            # no HX711 sample (dead sampler, unplugged load cell): never open blind
+            report.update(status='no_weight', final=None, error=None, time_to_dispense=0.0)
+            return report
+        if weight >= target - self.tolerance:
+            report.update(final=round(weight, 1), error=round(weight - target, 1), time_to_dispense=0.0)
+            return report
+
+        # Small portions start partially open so the flow is slow enough to stop on time
+        angle = self.trickle_angle if target - weight <= self.small_portion_grams else self.open_angle
+        report['open_angle'] = angle
+        self.servo.move(angle)
+        tracing.instant('dispense.open', angle=angle)
+
+        flow = 0.0
+        last_weight = weight
+        while True:
+            if clock.time() - started > self.max_seconds:
+                report['status'] = 'timeout'
+                break
+            weight = self._weight()
+            if weight is None:
+                report['status'] = 'no_weight'
+                weight = last_weight
+                break
+            last_weight = weight
+            flow = max(0.0, self.flow_rate())
+            predicted = weight + flow * self.close_latency + correction
+            if predicted >= target - self.fine_grams:
+                break
+
+        weight_at_close = weight
+        tracing.instant('dispense.close', weight=round(weight, 1), flow=round(flow, 2))
+        self._close()
+        report['closed_at'] = round(clock.time() - started, 3)
+        report['flow_rate'] = round(flow, 2)
+        weight = self._settle()
+
+        if weight is None:
+            report['status'] = 'no_weight'
+        elif report['status'] == 'completed':
+            # Grams that arrived after the close command beyond what the flow model predicted
+            self._learn('correction', (weight - weight_at_close) - flow * self.close_latency)
+
+            # === pulse top-up for the final grams ===
+            while (weight < target - self.tolerance and report['pulses'] < self.max_pulses
+                   and clock.time() - started < self.max_seconds):
+                if target - weight < self.calibration['pulse_grams'] / 2:
+                    break  # one more pulse would overshoot more than it helps
+                before = weight
+                tracing.instant('dispense.pulse', weight=round(weight, 1))
+                if hasattr(self.servo, 'pulse'):
+                    self.servo.pulse(self.trickle_angle, self.pulse_seconds * 1000).result()
+                    self.servo.release()
+                else:
+                    self.servo.move(self.trickle_angle)
+                    clock.sleep(self.pulse_seconds)
+                    self._close()
+                weight = self._settle()
+                report['pulses'] += 1
+                if weight is None:
+                    report['status'] = 'no_weight'
+                    break
+                self._learn('pulse_grams', max(0.1, weight - before))
+
+            if weight is not None:
+                self.calibration['runs'] += 1
+                try:
+                    self._save_calibration()
+                except OSError as e:
+                    print(f"⚠️ Could not save dispense calibration: {e}")
+
+        if weight is None:
+            print("⚠️ Dispense: no HX711 weight, gate closed")
+        report['final'] = None if weight is None else round(weight, 1)
+        report['error'] = None if weight is None else round(weight - target, 1)
+        report['time_to_dispense'] = round(clock.time() - started, 3)
+        return report
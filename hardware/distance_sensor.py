@@ -1,17 +1,28 @@
 # distance_sensor.py
-import RPi.GPIO as GPIO
 import time
+import threading
+from collections import deque
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:  # off the Pi: pass gpio=sim_gpio.SimGPIO()
+    GPIO = None
 
 TRIG = 23
 ECHO = 24
 
+HALF_SPEED_OF_SOUND = 17150  # cm/s, round trip halved
+MAX_RANGE_CM = 400
+# longest echo we wait for (out and back at max range) plus sensor start-up margin
+ECHO_TIMEOUT = MAX_RANGE_CM / HALF_SPEED_OF_SOUND + 0.01
+
 # Initialize ultrasonic sensor
 def init_distance_sensor():
     GPIO.setup(TRIG, GPIO.OUT)
     GPIO.setup(ECHO, GPIO.IN)
 
-# Measure distance in cm
-def measure_distance():
+# Measure distance in cm (None when no echo arrives in time)
+def measure_distance(timeout=ECHO_TIMEOUT):
     GPIO.output(TRIG, False)
     time.sleep(0.05)
 
@@ -19,12 +30,169 @@ def measure_distance():
     time.sleep(0.00001)
     GPIO.output(TRIG, False)
 
+    deadline = time.time() + timeout
     start = time.time()
     while GPIO.input(ECHO) == 0:
         start = time.time()
+        if start > deadline:
+            return None
+    end = start
     while GPIO.input(ECHO) == 1:
         end = time.time()
+        if end > deadline + timeout:
+            return None
 
     duration = end - start
-    distance = duration * 17150
+    distance = duration * HALF_SPEED_OF_SOUND
     return round(distance, 2)
+
+
+class DistanceSampler:
+    """Background ultrasonic sampler driven by echo edge callbacks.
+
+    Publishes 'approach' when the filtered distance stays at or below
+    approach_cm for `confirm` samples, and 'leave' when it stays at or above
+    leave_cm; the gap between the two is the hysteresis band. Valid readings are
+    also appended to `telemetry` (a telemetry.TelemetryRing) when given.
+    """
+
+    def __init__(self, trig=TRIG, echo=ECHO, gpio=None, period=0.1, window=5,
+                 approach_cm=30, leave_cm=40, confirm=2, max_range_cm=MAX_RANGE_CM, telemetry=None):
+        self.gpio = gpio or GPIO
+        self.clock = getattr(self.gpio, 'clock', time)
+        self._event_time = getattr(self.gpio, 'event_time', None)
+        self.trig = trig
+        self.echo = echo
+        self.period = period
+        self.approach_cm = approach_cm
+        self.leave_cm = leave_cm
+        self.confirm = confirm
+        self.max_range_cm = max_range_cm
+        self.timeout = max_range_cm / HALF_SPEED_OF_SOUND + 0.01
+        self.telemetry = telemetry
+
+        self.readings = deque(maxlen=window)
+        self.distance = None  # filtered (median) distance in cm
+        self.near = False
+        self.samples = 0
+        self.misses = 0
+        self.outliers = 0
+
+        self._rise = None
+        self._fall = None
+        self._echo_done = threading.Event()
+        self._cond = threading.Condition()
+        self._listeners = {'approach': [], 'leave': []}
+        self._streak = 0
+        self._thread = None
+        self._running = False
+
+        self.gpio.setup(self.trig, self.gpio.OUT)
+        self.gpio.setup(self.echo, self.gpio.IN)
+
+    def on(self, event, callback):
+        self._listeners[event].append(callback)
+
+    def start(self):
+        if self._thread is None:
+            # forget readings from a previous run
+            self.readings.clear()
+            self.distance = None
+            self.near = False
+            self._streak = 0
+            self.gpio.add_event_detect(self.echo, self.gpio.BOTH, callback=self._on_edge)
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True, name='distance-sampler')
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+            self.gpio.remove_event_detect(self.echo)
+
+    # Runs on the GPIO edge thread: timestamp only. The first edge after a
+    # trigger is the echo rising, the second one is it falling.
+    def _on_edge(self, pin):
+        # RPi.GPIO runs callbacks within ~100us of the edge; SimGPIO knows the exact time
+        now = self._event_time(pin) if self._event_time else self.clock.time()
+        if self._rise is None:
+            self._rise = now
+        elif self._fall is None:
+            self._fall = now
+            self._echo_done.set()
+
+    def _ping(self):
+        self._rise = self._fall = None
+        self._echo_done.clear()
+        self.gpio.output(self.trig, True)
+        self.clock.sleep(0.00001)
+        self.gpio.output(self.trig, False)
+        if not self._echo_done.wait(self.timeout) or self._rise is None:
+            return None
+        return (self._fall - self._rise) * HALF_SPEED_OF_SOUND
+
+    def _run(self):
+        while self._running:
+            started = self.clock.time()
+            raw = self._ping()
+            self._record(raw)
+            remaining = self.period - (self.clock.time() - started)
+            if remaining > 0:
+                self.clock.sleep(remaining)
+
+    def _record(self, raw):
+        if raw is None:
+            self.misses += 1
+            return
+        if raw > self.max_range_cm or raw < 2:
+            self.outliers += 1
+            return
+        if self.telemetry is not None:
+            self.telemetry.append(self.clock.time(), raw)
+
+        with self._cond:
+            self.readings.append(raw)
+            ordered = sorted(self.readings)
+            self.distance = round(ordered[len(ordered) // 2], 2)
+            self.samples += 1
+
+            event = None
+            if not self.near:
+                self._streak = self._streak + 1 if self.distance <= self.approach_cm else 0
+                if self._streak >= self.confirm:
+                    self.near, self._streak, event = True, 0, 'approach'
+            else:
+                self._streak = self._streak + 1 if self.distance >= self.leave_cm else 0
+                if self._streak >= self.confirm:
+                    self.near, self._streak, event = False, 0, 'leave'
+            if event:
+                self._cond.notify_all()
+
+        if event:
+            for callback in self._listeners[event]:
+                callback(self.distance)
+
+    # Condition waits run on the wall clock; convert when the clock is sped up
+    def _wall_timeout(self, timeout):
+        return None if timeout is None else max(0.0, timeout) / getattr(self.clock, 'speed', 1.0)
+
+    # Block until something is in front of the bowl (True) or timeout (False)
+    def wait_for_approach(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.near, timeout=self._wall_timeout(timeout))
+
+    def wait_for_leave(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.near, timeout=self._wall_timeout(timeout))
+
+    def stats(self):
+        return {
+            'distance': self.distance,
+            'near': self.near,
+            'samples': self.samples,
+            'misses': self.misses,
+            'outliers': self.outliers,
+        }
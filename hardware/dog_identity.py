@@ -0,0 +1,314 @@
+# dog_identity.py
+# Which dog is at the bowl: crop embedding + cosine match against enrolled dogs.
+#
+#   embedders    histogram  HSV colour histogram + small HOG, OpenCV only (default)
+#                onnx       any image model exported to ONNX whose output is a feature
+#                           vector (e.g. a MobileNetV3 backbone), through ONNX Runtime
+#
+#   identifier = DogIdentifier(load_embedder('histogram'), EmbeddingIndex.load(path))
+#   identifier.enroll('초코', [crop1, crop2])      # incremental, saved by the caller
+#   identifier.identify([crop])                   # {'dog': '초코', 'score': 0.91, 'margin': 0.2, ...}
+#
+# Every dog keeps at most `max_prototypes` unit vectors: up to that many enrolled crops
+# are kept as they are, later ones are merged into their nearest prototype (running
+# mean). Matching is one (crops x prototypes) matrix product plus a per-dog max over
+# contiguous column groups, so its cost depends on the number of dogs, not on how
+# many photos were enrolled.
+import os
+import threading
+
+import cv2
+import numpy as np
+
+INDEX_FILE = os.environ.get('FEEDER_DOG_INDEX', '/home/pi/auto_feeder/dog_index.npz')
+
+
+def l2_normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class Embedder:
+    name = 'base'
+    dim = None
+
+    def embed(self, crops):
+        """(len(crops), dim) float32, rows L2-normalised."""
+        raise NotImplementedError
+
+
+class HistogramEmbedder(Embedder):
+    """Coat colour (HSV histogram) and coarse shape (HOG on a 32x32 thumbnail); no model file.
+
+    Good enough to tell apart dogs that look different; use an ONNX backbone for look-alikes.
+    """
+
+    name = 'histogram'
+    BINS = (16, 4, 4)
+
+    CELLS = 4  # 4x4 cells of 8x8 pixels
+    ORIENTATIONS = 9
+
+    def __init__(self, hog_weight=0.5):
+        self.hog_weight = hog_weight
+        self.dim = int(np.prod(self.BINS)) + self.CELLS * self.CELLS * self.ORIENTATIONS
+
+    def _hog(self, gray):
+        # unsigned gradient orientation histogram per cell, magnitude weighted
+        gray = gray.astype(np.float32)
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=1)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=1)
+        magnitude = np.hypot(gx, gy)
+        orientation = (np.arctan2(gy, gx) % np.pi) * (self.ORIENTATIONS / np.pi)
+        bins = np.minimum(orientation.astype(np.int64), self.ORIENTATIONS - 1)
+        size = gray.shape[0] // self.CELLS
+        cell = (np.arange(gray.shape[0]) // size)[:, None] * self.CELLS + (np.arange(gray.shape[1]) // size)[None, :]
+        hog = np.bincount((cell * self.ORIENTATIONS + bins).reshape(-1), weights=magnitude.reshape(-1),
+                          minlength=self.CELLS * self.CELLS * self.ORIENTATIONS)
+        return hog.astype(np.float32)
+
+    def _one(self, crop):
+        hsv = cv2.cvtColor(cv2.resize(crop, (64, 64), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2HSV)
+        hist = cv2.calcHist([hsv], [0, 1, 2], None, list(self.BINS), [0, 180, 0, 256, 0, 256]).reshape(-1)
+        hist = np.sqrt(hist / max(1.0, float(hist.sum())))  # Hellinger: cosine ~ Bhattacharyya
+        gray = cv2.cvtColor(cv2.resize(crop, (32, 32), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        hog = self._hog(gray)
+        hog = hog / max(1e-6, float(np.linalg.norm(hog)))
+        return np.concatenate([hist, hog * self.hog_weight])
+
+    def embed(self, crops):
+        if not len(crops):
+            return np.empty((0, self.dim), dtype=np.float32)
+        return l2_normalize([self._one(crop) for crop in crops])
+
+
+class OnnxEmbedder(Embedder):
+    """ImageNet-normalised RGB input, NCHW; the (pooled) first output is the embedding."""
+
+    name = 'onnx'
+    MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def __init__(self, model_path, threads=None, size=224):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = model_input.shape
+        self.size = shape[2] if len(shape) == 4 and isinstance(shape[2], int) else size
+        self.dim = None
+
+    def embed(self, crops):
+        if not len(crops):
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        batch = np.stack([
+            (cv2.cvtColor(cv2.resize(crop, (self.size, self.size)), cv2.COLOR_BGR2RGB) / 255.0 - self.MEAN) / self.STD
+            for crop in crops
+        ]).astype(np.float32).transpose(0, 3, 1, 2)
+        features = self.session.run(None, {self.input_name: batch})[0]
+        if features.ndim == 4:  # (N, C, H, W) feature map -> global average pool
+            features = features.mean(axis=(2, 3))
+        features = features.reshape(len(crops), -1)
+        self.dim = features.shape[1]
+        return l2_normalize(features)
+
+
+EMBEDDERS = {
+    'histogram': HistogramEmbedder,
+    'onnx': OnnxEmbedder,
+}
+
+
+def load_embedder(backend='histogram', model_path=None, **kwargs):
+    if backend not in EMBEDDERS:
+        raise ValueError(f"unknown embedder backend: {backend} (choose from {', '.join(EMBEDDERS)})")
+    if backend == 'histogram':
+        return HistogramEmbedder(**kwargs)
+    return EMBEDDERS[backend](model_path, **kwargs)
+
+
+class EmbeddingIndex:
+    """Per-dog prototype vectors in one matrix, grouped by dog for reduceat.
+
+    Writers (enroll / forget) rebuild the matrix under a lock and swap it in; match()
+    reads the current snapshot without locking.
+    """
+
+    def __init__(self, max_prototypes=32, embedder=None):
+        self.max_prototypes = max_prototypes
+        self.embedder = embedder  # name of the embedder the vectors came from
+        self.dogs = {}  # name -> {'vectors': (k, dim), 'weights': (k,), 'images': n}
+        self._lock = threading.Lock()
+        self._snapshot = (np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64), [])
+
+    def __contains__(self, dog):
+        return dog in self.dogs
+
+    def __len__(self):
+        return len(self.dogs)
+
+    def add(self, dog, embeddings):
+        embeddings = l2_normalize(np.atleast_2d(embeddings))
+        with self._lock:
+            entry = self.dogs.get(dog)
+            if entry is None:
+                entry = self.dogs[dog] = {'vectors': np.empty((0, embeddings.shape[1]), dtype=np.float32),
+                                          'weights': np.empty(0, dtype=np.float32), 'images': 0}
+            vectors, weights = entry['vectors'], entry['weights']
+            if vectors.shape[1] != embeddings.shape[1]:
+                raise ValueError(f"embedding size {embeddings.shape[1]} != enrolled size {vectors.shape[1]}")
+            for vector in embeddings:
+                if len(vectors) < self.max_prototypes:
+                    vectors = np.vstack([vectors, vector])
+                    weights = np.append(weights, np.float32(1.0))
+                else:
+                    # merge into the nearest prototype (running mean on the sphere)
+                    i = int(np.argmax(vectors @ vector))
+                    merged = vectors[i] * weights[i] + vector
+                    vectors[i] = merged / max(1e-12, float(np.linalg.norm(merged)))
+                    weights[i] += 1.0
+            entry['vectors'], entry['weights'] = vectors, weights
+            entry['images'] += len(embeddings)
+            self._rebuild()
+        return entry['images']
+
+    def remove(self, dog):
+        with self._lock:
+            removed = self.dogs.pop(dog, None) is not None
+            if removed:
+                self._rebuild()
+        return removed
+
+    def _rebuild(self):
+        names = list(self.dogs)
+        if not names:
+            self._snapshot = (np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64), [])
+            return
+        matrix = np.ascontiguousarray(np.vstack([self.dogs[name]['vectors'] for name in names]))
+        sizes = [len(self.dogs[name]['vectors']) for name in names]
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self._snapshot = (matrix, starts, names)
+
+    def scores(self, embeddings):
+        """(len(embeddings), dogs) best cosine similarity per dog, plus the dog names."""
+        matrix, starts, names = self._snapshot
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if not names or not len(embeddings):
+            return np.empty((len(embeddings), len(names)), dtype=np.float32), names
+        similarity = embeddings @ matrix.T
+        return np.maximum.reduceat(similarity, starts, axis=1), names
+
+    def match(self, embeddings):
+        """Best dog over all crops: (dog, score, margin over the next dog), or (None, 0, 0)."""
+        scores, names = self.scores(embeddings)
+        if not scores.size:
+            return None, 0.0, 0.0
+        per_dog = scores.max(axis=0)
+        order = np.argsort(per_dog)[::-1]
+        best = float(per_dog[order[0]])
+        margin = best - float(per_dog[order[1]]) if len(order) > 1 else best
+        return names[order[0]], best, margin
+
+    def stats(self):
+        return {name: {'images': entry['images'], 'prototypes': len(entry['vectors'])}
+                for name, entry in self.dogs.items()}
+
+    def save(self, path):
+        with self._lock:
+            names = list(self.dogs)
+            data = {
+                'names': np.array(names),
+                'images': np.array([self.dogs[n]['images'] for n in names], dtype=np.int64),
+                'max_prototypes': np.array(self.max_prototypes),
+                'embedder': np.array(self.embedder or ''),
+            }
+            for i, name in enumerate(names):
+                data[f'vectors_{i}'] = self.dogs[name]['vectors']
+                data[f'weights_{i}'] = self.dogs[name]['weights']
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **data)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path, max_prototypes=32, embedder=None):
+        """Saved index, or an empty one when the file is missing or was built by another embedder."""
+        index = cls(max_prototypes, embedder)
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            saved_embedder = str(data['embedder']) or None
+            if embedder and saved_embedder and saved_embedder != embedder:
+                print(f"⚠️ {path} was enrolled with '{saved_embedder}', not '{embedder}': starting empty")
+                return index
+            index.max_prototypes = int(data['max_prototypes'])
+            for i, name in enumerate(data['names'].tolist()):
+                index.dogs[name] = {'vectors': data[f'vectors_{i}'].astype(np.float32),
+                                    'weights': data[f'weights_{i}'].astype(np.float32),
+                                    'images': int(data['images'][i])}
+        index._rebuild()
+        return index
+
+
+class DogIdentifier:
+    """Embedder + index + decision thresholds, shared by detect_person and enrolment.
+
+    A crop set is identified as a dog when its best cosine score is at least `threshold`
+    and beats the next dog by `margin`; otherwise the dog is None (unknown).
+    """
+
+    def __init__(self, embedder, index=None, threshold=0.75, margin=0.03, index_path=None):
+        self.embedder = embedder
+        self.index = index if index is not None else EmbeddingIndex(embedder=embedder.name)
+        self.threshold = threshold
+        self.margin = margin
+        self.index_path = index_path
+
+    def knows(self, dog):
+        return dog in self.index
+
+    def identify(self, crops):
+        crops = [crop for crop in crops if crop is not None and crop.size]
+        if not crops:
+            return {'dog': None, 'best': None, 'score': 0.0, 'margin': 0.0}
+        best, score, margin = self.index.match(self.embedder.embed(crops))
+        accepted = best is not None and score >= self.threshold and margin >= self.margin
+        return {'dog': best if accepted else None, 'best': best, 'score': round(score, 3),
+                'margin': round(margin, 3)}
+
+    def enroll(self, dog, crops):
+        crops = [crop for crop in crops if crop is not None and crop.size]
+        if not crops:
+            raise ValueError('no usable image')
+        images = self.index.add(dog, self.embedder.embed(crops))
+        if self.index_path:
+            self.index.save(self.index_path)
+        return {'dog': dog, 'added': len(crops), 'images': images,
+                'prototypes': self.index.stats()[dog]['prototypes']}
+
+    def forget(self, dog):
+        removed = self.index.remove(dog)
+        if removed and self.index_path:
+            self.index.save(self.index_path)
+        return removed
+
+    def stats(self):
+        return {'embedder': self.embedder.name, 'threshold': self.threshold, 'dogs': self.index.stats()}
+
+
+def largest_crop(frame, detections, classes=None):
+    """Crop of the biggest detected box of `classes`, or None when nothing matches."""
+    best, best_area = None, 0.0
+    for i, cls in enumerate(detections.classes):
+        if classes is not None and int(cls) not in classes:
+            continue
+        x1, y1, x2, y2 = detections.boxes[i]
+        area = (x2 - x1) * (y2 - y1)
+        if area > best_area:
+            best, best_area = i, area
+    return None if best is None else detections.crop(frame, best)
@@ -0,0 +1,161 @@
+# feeder_daemon.py
+# Long-lived feeding worker: loads YOLO, camera, GPIO and HX711 once and
+# takes feeding jobs from the server over a local unix socket.
+#
+# Protocol: one JSON object per line.
+#   {"op": "feed", "dog": "초코", "voice": "a.mp3", "amount": 20, "trace": true}
+#   {"op": "ping"}
+#   {"op": "probe"}     -> one frame + one inference + one weight reading (main.py --probe, warm)
+#   {"op": "metrics"}   -> {"ok": true, "text": "<Prometheus text>"}
+#   {"op": "enroll", "dog": "초코", "images": ["<base64 jpeg>", ...]}
+#                       -> {"ok": true, "dog": "초코", "added": 3, "skipped": 1, "images": 12, "prototypes": 12}
+#   {"op": "dogs"}      -> {"ok": true, "embedder": "histogram", "threshold": 0.75, "dogs": {...}}
+#   {"op": "forget", "dog": "초코"}
+# Each request gets one JSON line back. A feed with "intake": true and/or "clip": true
+# whose first line says "follows": N gets N more lines, each as soon as it is known:
+#   {"op": "clip", "ok": true, "status": "written", "name": "clip_....mp4", ...}   (or failed / dropped)
+#   {"op": "intake", "ok": true, "outcome": "partial", "eaten_g": 12.1, "leftover_g": 7.9, ...}
+import os
+import json
+import base64
+import time
+import threading
+import socketserver
+from concurrent.futures import as_completed
+
+import cv2
+import numpy as np
+
+import metrics
+import tracing
+from dog_identity import largest_crop
+from yolov8_detect import IDENTIFY_CLASSES
+
+SOCKET_PATH = os.environ.get('FEEDER_SOCKET', '/tmp/auto_feeder.sock')
+
+feeder = None
+feed_lock = threading.Lock()  # 급식기는 하나뿐이므로 급식 작업은 순서대로 실행
+ENROLL_WAIT = 10  # seconds an enrolment waits for a running feeding (it shares the detector)
+
+
+# Decoded photos -> crops of the largest detected dog; photos without a dog are skipped
+def enrollment_crops(images):
+    crops = []
+    for encoded in images:
+        frame = cv2.imdecode(np.frombuffer(base64.b64decode(encoded), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            continue
+        detections = feeder.detector.detect(frame, classes=IDENTIFY_CLASSES)
+        crop = largest_crop(frame, detections, IDENTIFY_CLASSES)
+        if crop is not None:
+            crops.append(crop)
+    return crops
+
+
+# Returns (response, follow_ups): {Future: op}, each result is sent as one more line
+def handle_request(req):
+    op = req.get('op', 'feed')
+
+    if op == 'ping':
+        return {'ok': True, 'pid': os.getpid(), 'busy': feed_lock.locked()}, None
+
+    if op == 'probe':
+        with feed_lock:
+            return dict(feeder.probe(), ok=True), None
+
+    if op == 'metrics':
+        return {'ok': True, 'text': metrics.render()}, None
+
+    if op == 'feed':
+        queued = time.time()
+        with feed_lock:
+            result = feeder.feed(req['dog'], req['voice'], int(req['amount']),
+                                 timeout=req.get('timeout', 120), trace=req.get('trace'))
+            follow_ups = {}
+            if req.get('clip') and feeder.clip_future is not None:
+                follow_ups[feeder.clip_future] = 'clip'
+            if req.get('intake') and feeder.intake_future is not None:
+                follow_ups[feeder.intake_future] = 'intake'
+        result['queued'] = round(time.time() - queued - result.get('duration', 0), 3)
+        result['ok'] = True
+        if follow_ups:
+            result['follows'] = len(follow_ups)
+            return result, follow_ups
+        return result, None
+
+    if op in ('enroll', 'dogs', 'forget'):
+        if feeder.identifier is None:
+            return {'ok': False, 'error': 'dog identification is disabled'}, None
+        if op == 'dogs':
+            return dict(feeder.identifier.stats(), ok=True), None
+        if op == 'forget':
+            return {'ok': True, 'dog': req['dog'], 'removed': feeder.identifier.forget(req['dog'])}, None
+        if not feed_lock.acquire(timeout=ENROLL_WAIT):
+            return {'ok': False, 'error': 'feeder is busy, try again'}, None
+        images = req.get('images', [])
+        try:
+            crops = enrollment_crops(images)
+        finally:
+            feed_lock.release()
+        if not crops:
+            return {'ok': False, 'error': 'no dog found in the photos', 'skipped': len(images)}, None
+        return dict(feeder.identifier.enroll(req['dog'], crops), ok=True, skipped=len(images) - len(crops)), None
+
+    return {'ok': False, 'error': f'unknown op: {op}'}, None
+
+
+class FeederRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            follow_ups = None
+            try:
+                response, follow_ups = handle_request(json.loads(line))
+            except Exception as e:
+                print(f"❌ Job failed: {e}")
+                response = {'ok': False, 'status': 'error', 'error': str(e)}
+            self._send(response)
+            if follow_ups:
+                # clip encoding and the bowl watch run on their own threads; this connection just waits
+                try:
+                    for future in as_completed(follow_ups):
+                        self._send(dict(future.result(), op=follow_ups[future], ok=True))
+                except OSError:
+                    pass  # the server went away (restart); the outcomes are still in the metrics
+
+    def _send(self, response):
+        self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+
+class FeederServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=SOCKET_PATH):
+    global feeder
+    from main import Feeder, output_dir
+
+    started = time.time()
+    tracing.start_trace('daemon_init')
+    feeder = Feeder()
+    tracing.stop_trace(os.path.join(output_dir, 'traces', 'init.json'), process_name='feeder_daemon')
+    print(f"✅ Feeder ready in {time.time() - started:.1f}s")
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = FeederServer(socket_path, FeederRequestHandler)
+    print(f"🔌 Listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Feeder daemon stopped.")
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+        feeder.close()
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,260 @@
+# hal.py
+# Hardware abstraction layer: one bundle with the GPIO module, clock, camera and
+# (optionally) detector the feeding loop talks to.
+#
+#   create_hardware('pi')                         real RPi.GPIO + Picamera2
+#   create_hardware('sim', trace_dir, speed=20)   recorded traces, 20x faster than real time
+#
+# A trace directory contains:
+#   distance.csv   t,cm      ultrasonic reading, t in seconds from session start
+#   weight.csv     t,grams   bowl weight, t in seconds from the moment the servo opens
+#   bowl.json      optional {"flow_g_per_s": 5, "inflight_s": 0.4, "noise": 0.2}: simulate the
+#                  food flow from the servo angle instead of replaying weight.csv
+#                  "eating": [[t0, t1, grams], ...] and "removed": [[t0, t1], ...] (seconds after
+#                  the servo opens, optional in either mode) script the dog eating and the bowl
+#                  being lifted off the scale ("bowl_g", default 150)
+#   frames/        recorded camera frames, played back in name order
+#   labels.json    optional {"frame_0001.jpg": [0, 16], ..., "default": []}: replaces YOLO with
+#                  the recorded classes per frame (frames not listed use "default")
+import os
+import csv
+import json
+import time
+import bisect
+
+from sim_gpio import SimGPIO, SimDevice, SimLoadCell, SimUltrasonic
+from detector_backends import Detector, Detections
+
+SERVO_OPEN_DUTY = 3.0  # duty above this is treated as "servo open" by the simulated bowl
+
+
+class SimClock:
+    """Virtual time running `speed` times faster than the wall clock."""
+
+    def __init__(self, speed=1.0, start=0.0):
+        self.speed = speed
+        self._start = start
+        self._real_start = time.perf_counter()
+
+    def time(self):
+        return self._start + (time.perf_counter() - self._real_start) * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+class Trace:
+    """Step-hold time series loaded from a two column CSV (header row optional)."""
+
+    def __init__(self, times, values):
+        self.times = times
+        self.values = values
+
+    @classmethod
+    def load(cls, path):
+        times, values = [], []
+        with open(path, newline='') as f:
+            for row in csv.reader(f):
+                try:
+                    t, value = float(row[0]), row[1]
+                except (ValueError, IndexError):
+                    continue  # header / blank line
+                times.append(t)
+                values.append(float(value) if value not in ('', 'none', 'None') else None)
+        return cls(times, values)
+
+    def value_at(self, t):
+        i = bisect.bisect_right(self.times, t) - 1
+        return self.values[max(0, i)] if self.values else None
+
+
+class SimCamera:
+    """Plays back recorded frames at `fps` of virtual time (capture blocks like a real camera)."""
+
+    def __init__(self, clock, frames_dir=None, fps=10, size=(640, 480)):
+        import numpy as np
+        import cv2
+        self.clock = clock
+        self.period = 1.0 / fps
+        self.names = []
+        self.frames_dir = frames_dir
+        if frames_dir and os.path.isdir(frames_dir):
+            self.names = sorted(f for f in os.listdir(frames_dir)
+                                if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        self._cv2 = cv2
+        self._blank = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        self._cache = {}
+        self.index = -1
+        self.last_name = None
+        self._next = None
+
+    def start(self):
+        self._next = self.clock.time()
+
+    def stop(self):
+        pass
+
+    def capture_array(self):
+        now = self.clock.time()
+        if self._next is not None and now < self._next:
+            self.clock.sleep(self._next - now)
+        self._next = max(now, self._next or now) + self.period
+
+        if not self.names:
+            self.index += 1
+            self.last_name = f"frame_{self.index:04d}.jpg"
+            return self._blank.copy()
+        self.index = min(self.index + 1, len(self.names) - 1)
+        self.last_name = self.names[self.index]
+        if self.last_name not in self._cache:
+            self._cache[self.last_name] = self._cv2.imread(os.path.join(self.frames_dir, self.last_name))
+        return self._cache[self.last_name]
+
+
+class SimDetector(Detector):
+    """Returns the classes recorded in labels.json for the frame the SimCamera just served."""
+
+    name = 'sim'
+
+    def __init__(self, camera, labels):
+        super().__init__()
+        self.camera = camera
+        self.labels = labels
+
+    def detect(self, frame, classes=None):
+        h, w = frame.shape[:2]
+        recorded = self.labels.get(self.camera.last_name, self.labels.get('default', []))
+        found = [c for c in recorded if classes is None or c in classes]
+        return Detections([[0, 0, w, h]] * len(found), [1.0] * len(found), found)
+
+
+class SimBowl(SimDevice):
+    """Links the servo PWM to the bowl weight.
+
+    Trace mode: weight.csv starts playing when the servo first opens.
+    Flow mode (bowl.json present): food falls at flow_g_per_s x gate opening and lands
+    inflight_s later, so closing the gate early / partially actually changes the result.
+    eating bouts remove grams linearly over [t0, t1]; while removed the scale reads -bowl_g.
+    """
+
+    def __init__(self, clock, servo_pin, weight_trace=None, flow_g_per_s=None, inflight_s=0.4,
+                 eating=(), removed=(), bowl_g=150.0):
+        self.clock = clock
+        self.servo_pin = servo_pin
+        self.trace = weight_trace
+        self.flow_g_per_s = flow_g_per_s
+        self.inflight_s = inflight_s
+        self.eating = [tuple(bout) for bout in eating]
+        self.removed = [tuple(span) for span in removed]
+        self.bowl_g = bowl_g
+        self.opened_at = None
+        self.positions = [(float('-inf'), 0.0)]  # (time, gate opening 0..1)
+
+    def on_pwm(self, pin, duty):
+        if pin != self.servo_pin or duty == 0:
+            return  # duty 0 = no pulses, the servo holds its position
+        opening = min(1.0, max(0.0, (duty - 2.5) / 5.0))  # 0 deg closed, 90 deg fully open
+        self.positions.append((self.clock.time(), opening))
+        if duty > SERVO_OPEN_DUTY and self.opened_at is None:
+            self.opened_at = self.clock.time()
+
+    def _dispensed(self, until):
+        grams = 0.0
+        for (t0, opening), (t1, _) in zip(self.positions, self.positions[1:] + [(until, 0.0)]):
+            t0, t1 = max(t0, 0.0), min(t1, until)
+            if t1 > t0:
+                grams += opening * self.flow_g_per_s * (t1 - t0)
+        return grams
+
+    def _eaten(self, since_open):
+        grams = 0.0
+        for t0, t1, amount in self.eating:
+            if since_open >= t1:
+                grams += amount
+            elif since_open > t0:
+                grams += amount * (since_open - t0) / (t1 - t0)
+        return grams
+
+    def weight(self, t):
+        if self.opened_at is not None:
+            since_open = t - self.opened_at
+            if any(t0 <= since_open < t1 for t0, t1 in self.removed):
+                return -self.bowl_g
+        if self.flow_g_per_s is not None:
+            grams = self._dispensed(t - self.inflight_s)
+        elif self.opened_at is None:
+            return self.trace.values[0] if self.trace.values else 0.0
+        else:
+            grams = self.trace.value_at(t - self.opened_at)
+        if self.opened_at is not None and self.eating:
+            # the dog can't eat more than is in the bowl
+            grams = max(0.0, grams - self._eaten(t - self.opened_at))
+        return grams
+
+
+class Hardware:
+    def __init__(self, gpio, clock, camera, detector=None, simulated=False):
+        self.gpio = gpio
+        self.clock = clock
+        self.camera = camera
+        self.detector = detector
+        self.simulated = simulated
+
+
+def create_pi_hardware():
+    import RPi.GPIO as GPIO
+    from picamera2 import Picamera2
+
+    picam2 = Picamera2()
+    picam2.preview_configuration.main.size = (640, 480)
+    picam2.preview_configuration.main.format = "RGB888"
+    picam2.configure("preview")
+    picam2.start()
+    return Hardware(GPIO, time, picam2)
+
+
+def create_sim_hardware(trace_dir, speed=1.0, servo_pin=17, hx_pins=(5, 6), distance_pins=(23, 24),
+                        frames_fps=10):
+    clock = SimClock(speed)
+    gpio = SimGPIO(clock=clock)
+    session_start = clock.time()
+
+    distance = Trace.load(os.path.join(trace_dir, 'distance.csv'))
+    bowl_path = os.path.join(trace_dir, 'bowl.json')
+    params = {}
+    if os.path.exists(bowl_path):
+        with open(bowl_path, encoding='utf-8') as f:
+            params = json.load(f)
+    scripted = {'eating': params.get('eating', ()), 'removed': params.get('removed', ()),
+                'bowl_g': params.get('bowl_g', 150.0)}
+    if 'flow_g_per_s' in params:
+        bowl = SimBowl(clock, servo_pin, flow_g_per_s=params['flow_g_per_s'],
+                       inflight_s=params.get('inflight_s', 0.4), **scripted)
+    else:
+        bowl = SimBowl(clock, servo_pin, weight_trace=Trace.load(os.path.join(trace_dir, 'weight.csv')), **scripted)
+    noise = params.get('noise', 0.0)
+
+    gpio.attach(bowl)
+    gpio.attach(SimLoadCell(hx_pins[0], hx_pins[1], bowl.weight, rate=80, noise=noise))
+    gpio.attach(SimUltrasonic(distance_pins[0], distance_pins[1],
+                              lambda t: distance.value_at(t - session_start)))
+
+    camera = SimCamera(clock, os.path.join(trace_dir, 'frames'), fps=frames_fps)
+    camera.start()
+
+    detector = None
+    labels_path = os.path.join(trace_dir, 'labels.json')
+    if os.path.exists(labels_path):
+        with open(labels_path, encoding='utf-8') as f:
+            detector = SimDetector(camera, json.load(f))
+
+    return Hardware(gpio, clock, camera, detector=detector, simulated=True)
+
+
+def create_hardware(backend='pi', trace_dir=None, speed=1.0, **kwargs):
+    if backend == 'pi':
+        return create_pi_hardware()
+    if backend == 'sim':
+        return create_sim_hardware(trace_dir, speed=speed, **kwargs)
+    raise ValueError(f"unknown hardware backend: {backend}")
@@ -1,36 +1,240 @@
 # hx711.py
-import RPi.GPIO as GPIO
+import time
+import threading
+from collections import deque
+
+import metrics
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:  # off the Pi: pass gpio=sim_gpio.SimGPIO()
+    GPIO = None
+
+HX711_READ_SECONDS = metrics.histogram('feeder_hx711_read_seconds',
+                                       'HX711 24-bit shift-out time once DOUT is ready',
+                                       buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1))
+HX711_TIMEOUTS = metrics.counter('feeder_hx711_timeouts_total', 'HX711 reads that timed out waiting for DOUT')
+HX711_SAMPLER_ERRORS = metrics.counter('feeder_hx711_sampler_errors_total',
+                                       'Sampler thread errors it survived (read, threshold, listener, telemetry)',
+                                       ['source'])
+
 
 class HX711:
-    def __init__(self, dout, pd_sck):
+    def __init__(self, dout, pd_sck, gpio=None):
+        self.gpio = gpio or GPIO
         self.dout = dout
         self.pd_sck = pd_sck
         self.offset = 0
         self.reference_unit = 1
-        GPIO.setup(self.pd_sck, GPIO.OUT)
-        GPIO.setup(self.dout, GPIO.IN)
+        self.gpio.setup(self.pd_sck, self.gpio.OUT)
+        self.gpio.setup(self.dout, self.gpio.IN)
 
-    def read(self):
-        while GPIO.input(self.dout) == 1:
-            pass
+    def is_ready(self):
+        return self.gpio.input(self.dout) == 0
+
+    # Sleep until DOUT falls (data ready) instead of spinning on it
+    def wait_ready(self, timeout=1.0):
+        if self.is_ready():
+            return True
+        self.gpio.wait_for_edge(self.dout, self.gpio.FALLING, timeout=max(1, int(timeout * 1000)))
+        return self.is_ready()
+
+    def read(self, timeout=1.0):
+        if not self.wait_ready(timeout):
+            HX711_TIMEOUTS.inc()
+            raise TimeoutError(f"HX711 not ready after {timeout}s")
+        started = time.perf_counter()
+        gpio = self.gpio
         count = 0
         for _ in range(24):
-            GPIO.output(self.pd_sck, True)
+            gpio.output(self.pd_sck, True)
             count = count << 1
-            GPIO.output(self.pd_sck, False)
-            if GPIO.input(self.dout):
+            gpio.output(self.pd_sck, False)
+            if gpio.input(self.dout):
                 count += 1
-        GPIO.output(self.pd_sck, True)
-        GPIO.output(self.pd_sck, False)
+        gpio.output(self.pd_sck, True)
+        gpio.output(self.pd_sck, False)
         count ^= 0x800000
+        HX711_READ_SECONDS.observe(time.perf_counter() - started)
         return count
 
-    def get_weight(self):
-        raw = self.read()
+    def read_median(self, times=5):
+        values = sorted(self.read() for _ in range(times))
+        return values[len(values) // 2]
+
+    def get_weight(self, times=1):
+        raw = self.read() if times == 1 else self.read_median(times)
         return (raw - self.offset) / self.reference_unit
 
-    def tare(self):
-        self.offset = self.read()
+    def tare(self, times=15):
+        self.offset = self.read_median(times)
 
     def set_reference_unit(self, ref):
         self.reference_unit = ref
+
+
+class HX711Sampler:
+    """Background sampler: keeps a ring buffer of raw counts and serves filtered weights.
+
+    filter is 'median' or 'mean' over the last `window` samples. rate caps the
+    sample rate (the chip itself runs at 10 or 80 SPS). With a telemetry ring
+    (telemetry.TelemetryRing) the filtered weight is recorded every telemetry_period s.
+    Listeners get (timestamp, grams) for every raw sample on the sampler thread.
+    A failing read, listener, threshold callback or telemetry append is counted in
+    `errors` and logged; the thread keeps sampling.
+    """
+
+    def __init__(self, hx, rate=10, buffer_size=256, window=5, filter='median', telemetry=None,
+                 telemetry_period=0.1):
+        self.hx = hx
+        self.rate = rate
+        self.window = window
+        self.filter = filter
+        self.buffer = deque(maxlen=buffer_size)  # (timestamp, raw)
+        self.clock = getattr(hx.gpio, 'clock', time)
+        self.samples_read = 0
+        self.errors = 0
+        self.telemetry = telemetry
+        self.telemetry_period = telemetry_period
+        self._telemetry_last = None
+        self.tared = False  # weights before the first tare are meaningless, don't record them
+        self._cond = threading.Condition()
+        self._thresholds = []
+        self._listeners = []
+        self._logged = set()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True, name='hx711-sampler')
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self):
+        period = 1.0 / self.rate if self.rate else 0
+        while self._running:
+            started = self.clock.time()
+            try:
+                raw = self.hx.read(timeout=1.0)
+            except TimeoutError:
+                self.errors += 1
+                continue
+            except Exception as e:  # a flaky read must not end the sampler
+                self._error('read', e)
+                self.clock.sleep(period or 0.1)
+                continue
+            with self._cond:
+                self.buffer.append((started, raw))
+                self.samples_read += 1
+                self._cond.notify_all()
+            self._guard('threshold', self._check_thresholds)
+            for listener in list(self._listeners):
+                self._guard('listener', listener, started, self._to_grams(raw))
+            if self.telemetry is not None and self.tared and (self._telemetry_last is None
+                                               or started - self._telemetry_last >= self.telemetry_period):
+                self._telemetry_last = started
+                self._guard('telemetry', self.telemetry.append, started, self.get_weight())
+
+            remaining = period - (self.clock.time() - started)
+            if remaining > 0:
+                self.clock.sleep(remaining)
+
+    # Run one callback on the sampler thread; a failure is counted and logged, never fatal
+    def _guard(self, source, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            self._error(source, e)
+
+    def _error(self, source, error):
+        self.errors += 1
+        HX711_SAMPLER_ERRORS.labels(source).inc()
+        key = (source, type(error).__name__)
+        if key not in self._logged:  # once per kind, the loop runs at `rate` Hz
+            self._logged.add(key)
+            print(f"⚠️ HX711 sampler {source} error: {error!r}")
+
+    def _to_grams(self, raw):
+        return (raw - self.hx.offset) / self.hx.reference_unit
+
+    def _filtered_raw(self, window=None):
+        with self._cond:
+            values = [raw for _, raw in list(self.buffer)[-(window or self.window):]]
+        if not values:
+            return None
+        if self.filter == 'mean':
+            return sum(values) / len(values)
+        values.sort()
+        return values[len(values) // 2]
+
+    def wait_for_samples(self, n, timeout=5.0):
+        with self._cond:
+            target = self.samples_read + n
+            return self._cond.wait_for(lambda: self.samples_read >= target, timeout=timeout)
+
+    # Filtered weight in grams (None until the first sample arrives)
+    def get_weight(self, window=None):
+        raw = self._filtered_raw(window)
+        return None if raw is None else self._to_grams(raw)
+
+    def series(self, n=None):
+        with self._cond:
+            items = list(self.buffer)[-n:] if n else list(self.buffer)
+        return [(t, self._to_grams(raw)) for t, raw in items]
+
+    # Multi-sample tare from fresh samples
+    def tare(self, samples=15, timeout=10.0):
+        if not self.wait_for_samples(samples, timeout):
+            raise TimeoutError(f"HX711 tare: fewer than {samples} samples in {timeout}s")
+        self.hx.offset = self._filtered_raw(samples)
+        self.tared = True
+
+    # callback(weight) fires when the filtered weight crosses `grams`
+    def on_threshold(self, grams, callback, rising=True, once=True):
+        handle = {'grams': grams, 'callback': callback, 'rising': rising, 'once': once}
+        with self._cond:
+            self._thresholds.append(handle)
+        return handle
+
+    def remove_threshold(self, handle):
+        with self._cond:
+            if handle in self._thresholds:
+                self._thresholds.remove(handle)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _check_thresholds(self):
+        if not self._thresholds:
+            return
+        weight = self.get_weight()
+        with self._cond:
+            fired = [h for h in self._thresholds
+                     if (weight >= h['grams'] if h['rising'] else weight <= h['grams'])]
+            for handle in fired:
+                if handle['once']:
+                    self._thresholds.remove(handle)
+        for handle in fired:
+            handle['callback'](weight)
+
+    def stats(self):
+        with self._cond:
+            items = list(self.buffer)
+        elapsed = items[-1][0] - items[0][0] if len(items) > 1 else 0
+        return {
+            'samples': self.samples_read,
+            'errors': self.errors,
+            'rate': round((len(items) - 1) / elapsed, 2) if elapsed else None,
+        }
@@ -0,0 +1,250 @@
+# intake_analyzer.py
+# Decides after a feeding whether the dog ate, from the bowl weight alone.
+#
+#   analyzer = IntakeAnalyzer(start_grams=20, window=600)
+#   sampler.add_listener(analyzer.update)        # (t, grams) per HX711 sample
+#   ...
+#   if analyzer.finished: analyzer.result()      # {'outcome': 'partial', 'eaten_g': 12.3, ...}
+#
+# Each sample goes through a median of 3 (drops single spikes) and an EWMA. A plateau
+# is declared once the filtered weight stays inside `stable_band` for `stable_seconds`
+# (sliding min/max kept in monotonic deques); its level is then refined as the running
+# mean of the samples while it lasts. On a plateau a two-sided CUSUM on the
+# deviation from the plateau level marks the change point where a bout starts; the
+# next plateau ends it, and the drop between the two is what was eaten. A weight far
+# below zero means the bowl was lifted off the load cell (it is tared with the bowl on).
+# Memory is constant: a few scalars, deques bounded by the stability window and at
+# most `max_events` events.
+import math
+from collections import deque
+
+import metrics
+
+INTAKE_OUTCOMES = metrics.counter('feeder_intake_outcomes_total', 'Intake decisions after feedings', ['outcome'])
+INTAKE_EATEN = metrics.histogram('feeder_intake_eaten_grams', 'Grams eaten per feeding',
+                                 buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+
+OUTCOMES = ('eaten', 'partial', 'not_eaten', 'unknown')
+
+
+class IntakeAnalyzer:
+    """Online eaten / partial / not eaten decision over bowl weight samples.
+
+    start_grams     dispensed weight (used until the first plateau is measured)
+    window          seconds to watch before deciding (earlier once the bowl is empty)
+    stable_seconds  how long the weight must stay within stable_band to count as a plateau
+    tau             EWMA time constant in seconds
+    cusum_k/h       CUSUM slack and threshold in grams (k ~ half the smallest shift of interest)
+    removed_g       below -removed_g the bowl is off the scale
+    empty_g         leftover at or below this counts as an empty bowl (a start this low is 'unknown')
+    not_eaten_g     eaten less than this counts as not eaten
+    min_bout_g      plateau drops smaller than this are not reported as bouts
+    """
+
+    def __init__(self, start_grams=None, window=600.0, stable_seconds=5.0, stable_band=1.0, tau=0.5,
+                 cusum_k=0.5, cusum_h=4.0, removed_g=15.0, empty_g=2.0, not_eaten_g=2.0, min_bout_g=1.0,
+                 max_events=64):
+        self.start_hint = start_grams
+        self.window = window
+        self.stable_seconds = stable_seconds
+        self.stable_band = stable_band
+        self.tau = tau
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.removed_g = removed_g
+        self.empty_g = empty_g
+        self.not_eaten_g = not_eaten_g
+        self.min_bout_g = min_bout_g
+
+        self.state = 'settling'  # settling | plateau | changing | removed
+        self.level = None  # filtered weight
+        self.start_level = None  # first plateau after dispensing
+        self.plateau = None  # current / last plateau level
+        self.samples = 0
+        self.started_at = None
+        self.last_t = None
+        self.finished = False
+        self.finish_reason = None
+        self.first_change_at = None
+        self.removals = 0
+        self.events = deque(maxlen=max_events)
+        self.bouts = deque(maxlen=max_events)
+
+        self._median = deque(maxlen=3)
+        self._window_start = None
+        self._maxq = deque()  # (t, level), levels decreasing
+        self._minq = deque()  # (t, level), levels increasing
+        self._g_up = 0.0
+        self._g_down = 0.0
+        self._plateau_n = 0
+        self._bout = None  # (bout, level before it) while the plateau that ended it is refined
+        self._change_t = None
+
+    # === filtering ===
+    def _filter(self, t, grams):
+        self._median.append(grams)
+        x = sorted(self._median)[len(self._median) // 2]
+        if self.level is None:
+            self.level = x
+        else:
+            alpha = 1.0 - math.exp(-max(0.0, t - self.last_t) / self.tau) if self.tau else 1.0
+            self.level += alpha * (x - self.level)
+        return x
+
+    def _reset_window(self, t):
+        self._window_start = t
+        self._maxq.clear()
+        self._minq.clear()
+
+    def _stable(self, t):
+        level = self.level
+        while self._maxq and self._maxq[-1][1] <= level:
+            self._maxq.pop()
+        self._maxq.append((t, level))
+        while self._minq and self._minq[-1][1] >= level:
+            self._minq.pop()
+        self._minq.append((t, level))
+        horizon = t - self.stable_seconds
+        while self._maxq[0][0] < horizon:
+            self._maxq.popleft()
+        while self._minq[0][0] < horizon:
+            self._minq.popleft()
+        return (t - self._window_start >= self.stable_seconds
+                and self._maxq[0][1] - self._minq[0][1] <= self.stable_band)
+
+    def _event(self, t, kind, **fields):
+        event = {'t': round(t - self.started_at, 2), 'event': kind}
+        event.update(fields)
+        self.events.append(event)
+        return event
+
+    # === one sample ===
+    def update(self, t, grams):
+        """Feed one (timestamp, grams) sample; returns the event it caused, if any."""
+        if self.finished or grams is None:
+            return None
+        t, grams = float(t), float(grams)
+        if self.started_at is None:
+            self.started_at = t
+            self._reset_window(t)
+        x = self._filter(t, grams)
+        self.last_t = t
+        self.samples += 1
+        event = None
+
+        if self.level < -self.removed_g:
+            if self.state != 'removed':
+                self.state = 'removed'
+                self.removals += 1
+                event = self._event(t, 'bowl_removed')
+            self._check_finished(t)
+            return event
+        if self.state == 'removed':
+            self.state = 'changing'
+            self._change_t = t
+            self._reset_window(t)
+            event = self._event(t, 'bowl_returned')
+
+        stable = self._stable(t)
+        if self.state in ('settling', 'changing'):
+            if stable:
+                event = self._on_plateau(t, self.level)
+        elif self.state == 'plateau':
+            deviation = x - self.plateau
+            self._g_up = max(0.0, self._g_up + deviation - self.cusum_k)
+            self._g_down = max(0.0, self._g_down - deviation - self.cusum_k)
+            if self._g_up <= self.cusum_h and self._g_down <= self.cusum_h:
+                self._plateau_n += 1
+                self.plateau += deviation / self._plateau_n
+                if self.first_change_at is None:
+                    self.start_level = self.plateau
+                if self._bout is not None:
+                    self._bout[0]['grams'] = round(self._bout[1] - self.plateau, 2)
+            else:
+                self._bout = None
+                direction = 'down' if self._g_down > self.cusum_h else 'up'
+                self.state = 'changing'
+                self._change_t = t
+                self._reset_window(t)
+                if self.first_change_at is None:
+                    self.first_change_at = t
+                event = self._event(t, 'change', direction=direction)
+
+        self._check_finished(t)
+        return event
+
+    def _on_plateau(self, t, level):
+        previous = self.plateau
+        self.plateau = level
+        self.state = 'plateau'
+        self._plateau_n = 1
+        self._g_up = self._g_down = 0.0
+        if self.start_level is None:
+            self.start_level = level
+        elif previous is not None and previous - level >= self.min_bout_g:
+            bout = {
+                'start': round(self._change_t - self.started_at, 2),
+                'end': round(t - self.started_at, 2),
+                'grams': round(previous - level, 2),
+            }
+            self.bouts.append(bout)
+            self._bout = (bout, previous)
+        return self._event(t, 'plateau', grams=round(level, 2))
+
+    def _check_finished(self, t):
+        if t - self.started_at >= self.window:
+            self.finish('window')
+        elif (self.state == 'plateau' and self.plateau <= self.empty_g
+              and self.start_level is not None and self.start_level > self.empty_g):
+            self.finish('empty')
+
+    def finish(self, reason='stopped'):
+        """Stop watching (idempotent); result() then gives the decision."""
+        if not self.finished:
+            self.finished = True
+            self.finish_reason = reason
+            result = self.result()
+            INTAKE_OUTCOMES.labels(result['outcome']).inc()
+            if result['eaten_g'] is not None:
+                INTAKE_EATEN.observe(result['eaten_g'])
+
+    # === decision ===
+    def result(self):
+        start = self.start_level if self.start_level is not None else self.start_hint
+        settled = self.state == 'plateau'
+        if self.state == 'removed':
+            leftover = None
+        elif settled:
+            leftover = self.plateau
+        else:
+            # still moving (eating when the window ran out): best guess is the filtered weight
+            leftover = self.level
+
+        if start is None or leftover is None:
+            outcome, eaten = 'unknown', None
+        else:
+            leftover = max(0.0, leftover)
+            eaten = max(0.0, start - leftover)
+            if start <= self.empty_g:
+                outcome = 'unknown'  # nothing (measurable) was served, an empty bowl says nothing
+            elif leftover <= self.empty_g:
+                outcome = 'eaten'
+            elif eaten < self.not_eaten_g:
+                outcome = 'not_eaten'
+            else:
+                outcome = 'partial'
+
+        return {
+            'outcome': outcome,
+            'eaten_g': round(eaten, 1) if eaten is not None else None,
+            'leftover_g': round(leftover, 1) if leftover is not None else None,
+            'start_g': round(start, 1) if start is not None else None,
+            'settled': settled,
+            'reason': 'bowl_removed' if self.state == 'removed' else self.finish_reason,
+            'watched_s': round(self.last_t - self.started_at, 1) if self.samples else 0.0,
+            'first_change_after': (round(self.first_change_at - self.started_at, 1)
+                                   if self.first_change_at is not None else None),
+            'bouts': list(self.bouts),
+            'bowl_removed': self.removals,
+            'events': list(self.events),
+        }
@@ -3,98 +3,445 @@
 import time
 import cv2
 import os
+import json
 import argparse
-import subprocess
-import RPi.GPIO as GPIO
-from picamera2 import Picamera2
-from ultralytics import YOLO
-
-from servo_control import set_angle, init_servo
-from distance_sensor import measure_distance, init_distance_sensor
-from yolov8_detect import detect_person
-
-# === CLI 인자 처리 ===
-parser = argparse.ArgumentParser()
-parser.add_argument('--dog', required=True)
-parser.add_argument('--voice', required=True)
-parser.add_argument('--amount', type=int, required=True)
-args = parser.parse_args()
-
-dog = args.dog
-voice_file = args.voice
-target_weight = args.amount
+import copy
+import threading
+from concurrent.futures import Future
+
+from hal import create_hardware
+import servo_control
+from servo_control import init_servo
+from actuator_service import ActuatorService
+from dispense_controller import DispenseController
+from distance_sensor import DistanceSampler
+from yolov8_detect import detect_person, DetectionConfig
+from detector_backends import load_detector
+from motion_gate import MotionGate
+from voice_cache import VoicePlayer
+from intake_analyzer import IntakeAnalyzer
+import metrics
+import tracing
+import telemetry
+import dog_identity
+from clip_recorder import ClipRecorder, CLIP_DIR
+
+FEED_SECONDS = metrics.histogram('feeder_feed_seconds', 'Whole feeding duration (voice to servo closed)')
+FEED_OUTCOMES = metrics.counter('feeder_feed_outcomes_total', 'Feedings by outcome', ['status'])
+DISPENSE_ERROR = metrics.histogram('feeder_dispense_abs_error_grams', 'Absolute dispensed weight error',
+                                   buckets=(0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0))
+TIME_TO_TARGET = metrics.histogram('feeder_approach_to_target_seconds',
+                                   'Approach detected to target weight reached')
 
 # === Configuration ===
 SERVO = 17
 USE_WEIGHT_SENSOR = True
 HX_DT = 5
 HX_SCK = 6
+HX_RATE = 80  # HX711 sample rate cap (a board wired for 10 SPS simply delivers 10)
+FEEDER_ID = os.environ.get('FEEDER_ID', 'default')  # key for the learned dispense calibration
 output_dir = "/home/pi/auto_feeder/output"
 voice_dir = "/home/pi/auto_feeder/voices"
-os.makedirs(output_dir, exist_ok=True)
-
-# === Initialization ===
-GPIO.setmode(GPIO.BCM)
-init_servo(SERVO)
-init_distance_sensor()
-
-if USE_WEIGHT_SENSOR:
-    from hx711 import HX711
-    hx = HX711(HX_DT, HX_SCK)
-    hx.set_reference_unit(22)
-    hx.tare()
-
-# === 음성 재생 ===
-voice_path = os.path.join(voice_dir, voice_file)
-if os.path.exists(voice_path):
-    print(f"🔊 Playing voice: {voice_path}")
-    subprocess.run(['mpg123', voice_path])
-else:
-    print(f"⚠️ Voice file not found: {voice_path}")
-
-# === YOLO + 급식 루프 ===
-model = YOLO("yolov8n.pt")
-picam2 = Picamera2()
-picam2.preview_configuration.main.size = (640, 480)
-picam2.preview_configuration.main.format = "RGB888"
-picam2.configure("preview")
-picam2.start()
-
-try:
-    while True:
-        dist = measure_distance()
-        print(f"[Ultrasonic] Distance: {dist} cm")
-
-        if dist <= 30:
-            print("✅ Distance condition met. Starting YOLO detection.")
-            person_detected = detect_person(model, picam2, output_dir)
-
-            if person_detected:
-                print("✅ 'person' detected → opening servo.")
-                set_angle(90)
-                time.sleep(1)
-
-                if USE_WEIGHT_SENSOR:
-                    print(f"🎯 Target weight: {target_weight}g")
-                    while True:
-                        weight = hx.get_weight()
-                        print(f"[Weight Sensor] Current: {round(weight, 1)}g")
-                        if weight >= target_weight:
-                            print("✅ Target reached → closing servo.")
-                            set_angle(0)
-                            break
-                        time.sleep(0.5)
-                else:
-                    print("🕒 Simulating feeding for 5 seconds...")
-                    time.sleep(5)
-                    print("✅ Done feeding → closing servo.")
-                    set_angle(0)
-
-        time.sleep(1)
-
-except KeyboardInterrupt:
-    print("🛑 Program terminated by user.")
-
-finally:
-    GPIO.cleanup()
-    cv2.destroyAllWindows()
+calibration_file = "/home/pi/auto_feeder/dispense_calibration.json"
+telemetry_dir = telemetry.TELEMETRY_DIR  # weight / distance ring files (server reads them for charts)
+USE_TELEMETRY = True
+APPROACH_CM = 30  # 이 거리 안으로 들어오면 접근
+LEAVE_CM = 40  # 이 거리 밖으로 나가면 떠남 (히스테리시스)
+DISTANCE_PERIOD = 0.1  # 초음파 측정 주기 (초)
+FEED_TIMEOUT = 120  # 강아지가 오지 않으면 포기하는 시간 (초)
+INTAKE_WINDOW = 600  # 급식 후 그릇 무게를 지켜보고 섭취 여부를 판단하는 시간 (초, 0 = 끔)
+# Motion gate: skip YOLO while the scene is static, re-run at least every MOTION_MAX_AGE s
+USE_MOTION_GATE = True
+MOTION_MIN_CHANGED = 0.01  # fraction of (80x60) pixels that must change
+MOTION_MAX_AGE = 2.0
+# A person in view also counts for dogs that are not enrolled (the old person-only trigger)
+DETECT_PERSON = os.environ.get('FEEDER_DETECT_PERSON') == '1'
+# Detection pipeline: infer every 2nd frame at 320px, no drawing on the Pi
+DETECTION = DetectionConfig(
+    infer_every=2, imgsz=320, annotate=False, person_trigger=DETECT_PERSON,
+    motion_gate=MotionGate(min_changed=MOTION_MIN_CHANGED, max_age=MOTION_MAX_AGE) if USE_MOTION_GATE else None,
+)
+# Inference backend: ultralytics | onnx | openvino | ncnn (see detector_backends.py)
+DETECTOR_BACKEND = os.environ.get('FEEDER_DETECTOR', 'ultralytics')
+DETECTOR_MODEL = os.environ.get('FEEDER_MODEL')  # None = backend default (yolov8n.*)
+# Dog identification: a feeding for an enrolled dog only counts detections identified as that dog
+USE_DOG_ID = True
+EMBEDDER_BACKEND = os.environ.get('FEEDER_EMBEDDER', 'histogram')  # histogram | onnx (see dog_identity.py)
+EMBEDDER_MODEL = os.environ.get('FEEDER_EMBEDDER_MODEL')  # .onnx feature extractor for the onnx embedder
+DOG_ID_THRESHOLD = float(os.environ.get('FEEDER_DOG_THRESHOLD', '0.75'))  # min cosine score
+dog_index_file = dog_identity.INDEX_FILE
+# Event clips: frames stay in a RAM ring; only detection -> dispensing is written (mp4, oldest deleted first)
+USE_CLIPS = True
+CLIP_PRE_ROLL = 3.0  # seconds before detection
+CLIP_POST_ROLL = 8.0  # seconds after it (covers the dispense start)
+CLIP_MAX_MB = 200
+CLIP_WAIT = 60  # CLI: seconds to wait for the clip before printing the result
+clip_dir = CLIP_DIR
+
+
+class Feeder:
+    """Owns the camera, model, servo and load cell for the lifetime of the process."""
+
+    def __init__(self, hw=None):
+        os.makedirs(output_dir, exist_ok=True)
+
+        # === Initialization ===
+        self.hw = hw or create_hardware('pi')
+        self.gpio = self.hw.gpio
+        self.clock = self.hw.clock
+        self.gpio.setmode(self.gpio.BCM)
+        with tracing.span('init.servo', cat='init'):
+            init_servo(SERVO, gpio=self.gpio, clock_source=self.clock)
+        # Servo moves run on the actuator thread so sampling never stalls while it travels
+        self.actuator = ActuatorService(servo_control, clock=self.clock)
+        self.telemetry = self._open_telemetry() if USE_TELEMETRY else {}
+        self.distance = DistanceSampler(gpio=self.gpio, period=DISTANCE_PERIOD,
+                                        approach_cm=APPROACH_CM, leave_cm=LEAVE_CM,
+                                        telemetry=self.telemetry.get('distance'))
+
+        self.hx = None
+        if USE_WEIGHT_SENSOR:
+            from hx711 import HX711, HX711Sampler
+            self.hx = HX711(HX_DT, HX_SCK, gpio=self.gpio)
+            self.hx.set_reference_unit(22)
+            self.hx_sampler = HX711Sampler(self.hx, rate=HX_RATE, telemetry=self.telemetry.get('weight')).start()
+            with tracing.span('init.hx711_tare', cat='init'):
+                self.hx_sampler.tare()
+            self.dispenser = DispenseController(self.hx_sampler, self.actuator, clock=self.clock,
+                                                feeder_id=FEEDER_ID,
+                                                calibration_path=calibration_file)
+
+        with tracing.span('init.load_detector', cat='init', backend=DETECTOR_BACKEND):
+            self.detector = self.hw.detector or load_detector(DETECTOR_BACKEND, DETECTOR_MODEL,
+                                                              imgsz=DETECTION.imgsz or 640)
+        self.picam2 = self.hw.camera
+        self.identifier = self._load_identifier() if USE_DOG_ID else None
+        self.detection = copy.copy(DETECTION)
+        self.detection.identifier = self.identifier
+        self.clips = None
+        if USE_CLIPS:
+            self.clips = ClipRecorder(clip_dir, pre_roll=CLIP_PRE_ROLL, post_roll=CLIP_POST_ROLL,
+                                      max_bytes=CLIP_MAX_MB * 1024 * 1024)
+            self.detection.recorder = self.clips
+
+        # Audio output stays open; decoded clips are kept in memory (LRU)
+        self.voices = None if self.hw.simulated else VoicePlayer(voice_dir)
+
+        # Bowl watch after the last feeding: (analyzer, future, listener); see watch_intake
+        self._intake = None
+        self._intake_lock = threading.Lock()
+        self.intake_future = None
+        # Clip of the last feeding (clip_recorder Future): result['clip_status'] is 'pending' until it resolves
+        self.clip_future = None
+
+    # Sensor history is nice to have: a missing or foreign file must not stop feeding
+    def _open_telemetry(self):
+        directory, fresh = telemetry_dir, False
+        if self.hw.simulated:
+            # the sim clock starts at 0 every run: keep it out of the real history, one run per file
+            directory, fresh = os.path.join(output_dir, 'telemetry'), True
+        rings = {}
+        for name in telemetry.SERIES:
+            try:
+                rings[name] = telemetry.open_series(name, directory, fresh=fresh)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Telemetry '{name}' disabled: {e}")
+        return rings
+
+    # A broken embedder only turns identification off: feedings then open for any detection
+    def _load_identifier(self):
+        try:
+            with tracing.span('init.load_embedder', cat='init', backend=EMBEDDER_BACKEND):
+                embedder = dog_identity.load_embedder(EMBEDDER_BACKEND, EMBEDDER_MODEL)
+            index = dog_identity.EmbeddingIndex.load(dog_index_file, embedder=embedder.name)
+        except (ImportError, OSError, ValueError, RuntimeError) as e:
+            print(f"⚠️ Dog identification disabled: {e}")
+            return None
+        return dog_identity.DogIdentifier(embedder, index, threshold=DOG_ID_THRESHOLD, index_path=dog_index_file)
+
+    # === Dispatch readiness: one frame, one inference, one weight reading (bench_dispatch.py) ===
+    def probe(self):
+        t0 = time.perf_counter()
+        frame = self.picam2.capture_array()
+        t1 = time.perf_counter()
+        self.detector.detect(frame, classes=self.detection.classes)
+        t2 = time.perf_counter()
+        weight = self.hx_sampler.get_weight() if self.hx is not None else None
+        t3 = time.perf_counter()
+        return {
+            'hardware': 'sim' if self.hw.simulated else 'pi',
+            'weight': round(weight, 2) if weight is not None else None,
+            'capture_ms': round((t1 - t0) * 1000, 2),
+            'inference_ms': round((t2 - t1) * 1000, 2),
+            'weight_ms': round((t3 - t2) * 1000, 2),
+        }
+
+    # === 음성 재생 (백그라운드 - 접근 감지/카메라와 동시에 진행) ===
+    def play_voice(self, voice_file):
+        if self.voices is None:
+            return None
+        print(f"🔊 Playing voice: {voice_file}")
+        return self.voices.play(voice_file)
+
+    # === 섭취/잔반 판단 - 급식 후 HX711 샘플을 계속 받아서 판단 (feed 는 기다리지 않음) ===
+    # 판단 결과 (IntakeAnalyzer.result) 는 반환된 Future 로 전달됨
+    def watch_intake(self, start_grams, window=INTAKE_WINDOW):
+        self.finish_intake('next_feeding')
+        analyzer = IntakeAnalyzer(start_grams, window=window)
+        future = Future()
+        watch = None
+
+        def on_sample(t, grams):
+            analyzer.update(t, grams)
+            if analyzer.finished:
+                self._end_intake(watch)
+
+        watch = (analyzer, future, on_sample)
+        with self._intake_lock:
+            self._intake = watch
+        self.intake_future = future
+        self.hx_sampler.add_listener(on_sample)
+        return future
+
+    def _end_intake(self, watch, reason='stopped'):
+        with self._intake_lock:
+            if watch is None or self._intake is not watch:
+                return
+            self._intake = None
+        analyzer, future, listener = watch
+        self.hx_sampler.remove_listener(listener)
+        analyzer.finish(reason)
+        intake = analyzer.result()
+        print(f"🍽️ Intake: {intake['outcome']} (ate {intake['eaten_g']}g, left {intake['leftover_g']}g, "
+              f"{intake['reason']})")
+        future.set_result(intake)
+
+    # Decide now with what has been seen so far (next feeding, shutdown)
+    def finish_intake(self, reason='stopped'):
+        self._end_intake(self._intake, reason)
+
+    # === YOLO + 급식 루프 ===
+    # trace: True/False records a Chrome trace of this feeding (None: FEEDER_TRACE env)
+    # intake_window: seconds to keep watching the bowl afterwards (None: INTAKE_WINDOW, 0: don't)
+    def feed(self, dog, voice_file, target_weight, timeout=FEED_TIMEOUT, trace=None, intake_window=None):
+        clock = self.clock
+        intake_window = INTAKE_WINDOW if intake_window is None else intake_window
+        started = clock.time()
+        trace = tracing.start_trace('feed', enabled=trace, dog=dog, amount=target_weight)
+        # Event times in seconds from the start of the feeding
+        timeline = {}
+
+        def mark(name):
+            if name not in timeline:
+                timeline[name] = round(clock.time() - started, 3)
+                tracing.instant(name)
+            return timeline[name]
+        result = {
+            'dog': dog,
+            'voice': voice_file,
+            'amount': target_weight,
+            'status': 'no_dog',
+            'weight': None,
+        }
+
+        self.actuator.reset_stats()  # result['actuator'] covers this feeding only
+        with tracing.span('play_voice'):
+            self.play_voice(voice_file)
+        mark('voice_started')
+
+        self.intake_future = None
+        self.clip_future = None
+        if self.hx is not None:
+            # the previous bowl watch ends here: the tare below moves the zero
+            self.finish_intake('next_feeding')
+            with tracing.span('hx711.tare'):
+                self.hx_sampler.tare()
+
+        other_dogs = set()  # enrolled dogs that were seen instead of `dog`
+        if self.clips is not None:
+            self.clips.stop_following()  # the last clip's post-roll gives the camera back
+        self.distance.start()
+        try:
+            while clock.time() - started < timeout:
+                # Sleeps until the sampler publishes an approach event
+                with tracing.span('wait_for_approach'):
+                    approached = self.distance.wait_for_approach(timeout - (clock.time() - started))
+                if not approached:
+                    break
+                mark('approach')
+                print(f"[Ultrasonic] Distance: {self.distance.distance} cm")
+                print("✅ Distance condition met. Starting YOLO detection.")
+                detection_stats = {}
+                with tracing.span('detect_person'):
+                    person_detected = detect_person(self.detector, self.picam2, config=self.detection,
+                                                    timeout=timeout - (clock.time() - started),
+                                                    stats=detection_stats, clock=clock, dog=dog)
+                result['detection'] = detection_stats
+                identity = detection_stats.pop('identity', None)
+                if identity is not None:
+                    result['identity'] = identity
+                    other_dogs.update(name for name in identity['others'] if name != 'unknown')
+
+                if person_detected:
+                    result['detected_after'] = mark('detected')
+                    if self.clips is not None:
+                        # the file name goes into the result only once the encoder has written it
+                        self.clip_future = self.clips.trigger('detected', clock.time())
+                        result['clip_status'] = 'pending'
+                        self.clips.follow(self.picam2, clock)
+                    print(f"✅ '{dog}' detected → opening servo." if 'identity' in result
+                          else "✅ Dog detected → opening servo.")
+                    mark('servo_open')
+
+                    if self.hx is not None:
+                        print(f"🎯 Target weight: {target_weight}g")
+                        # Sampler fires as soon as the filtered weight crosses the target
+                        handle = self.hx_sampler.on_threshold(target_weight, lambda w: mark('target_reached'))
+                        with tracing.span('dispense', target=target_weight):
+                            report = self.dispenser.dispense(target_weight)
+                        self.hx_sampler.remove_threshold(handle)
+                        mark('dispensed')
+                        if report['final'] is None:
+                            print(f"⚠️ Dispense stopped: no weight from the HX711 ({report['status']})")
+                        else:
+                            print(f"✅ Dispensed {report['final']}g (error {report['error']:+}g, "
+                                  f"{report['pulses']} pulses, {report['time_to_dispense']}s)")
+                        result['dispense'] = report
+                        result['weight'] = report['final']
+                        # a short (timeout) or unweighed (no_weight) portion has no start level to watch
+                        if intake_window > 0 and report['status'] == 'completed':
+                            self.watch_intake(report['final'], window=intake_window)
+                            result['intake'] = {'status': 'watching', 'window': intake_window}
+                    else:
+                        with tracing.span('servo_timed_feed'):
+                            self.actuator.move(90)
+                            print("🕒 Simulating feeding for 5 seconds...")
+                            self.actuator.hold(5)
+                            self.actuator.move(0)
+                            self.actuator.release().result()
+                        print("✅ Done feeding → servo closed.")
+                    mark('servo_closed')
+
+                    result['status'] = 'completed'
+                    if result.get('dispense', {}).get('status') == 'no_weight':
+                        result['status'] = 'no_weight'  # load cell silent: the gate was kept / put shut
+                    break
+
+                clock.sleep(DISTANCE_PERIOD)
+        finally:
+            self.distance.stop()
+
+        if result['status'] == 'no_dog' and other_dogs:
+            result['status'] = 'wrong_dog'
+            print(f"🚫 Only {', '.join(sorted(other_dogs))} came, not {dog}: bowl stays closed.")
+        result['duration'] = round(clock.time() - started, 3)
+        result['timeline'] = timeline
+        FEED_SECONDS.observe(result['duration'])
+        FEED_OUTCOMES.labels(result['status']).inc()
+        if result.get('dispense', {}).get('error') is not None:
+            DISPENSE_ERROR.observe(abs(result['dispense']['error']))
+        result['actuator'] = self.actuator.stats()
+        if self.voices is not None:
+            result['voice_cache'] = self.voices.stats()
+        if trace is not None:
+            trace.args['status'] = result['status']
+            stamp = time.strftime('%Y%m%d_%H%M%S')
+            result['trace'] = os.path.abspath(os.path.join(output_dir, 'traces', f'feed_{stamp}_{os.getpid()}.json'))
+            tracing.stop_trace(result['trace'], process_name='feeder')
+            tracing.prune(os.path.dirname(result['trace']))
+        if 'approach' in timeline and 'servo_open' in timeline:
+            result['latency'] = {'approach_to_open': round(timeline['servo_open'] - timeline['approach'], 3)}
+            # within tolerance below target the threshold never fires; use the end of dispensing
+            done = timeline.get('target_reached', timeline.get('dispensed'))
+            if done is not None:
+                result['latency']['open_to_target'] = round(done - timeline['servo_open'], 3)
+                result['latency']['approach_to_target'] = round(done - timeline['approach'], 3)
+                TIME_TO_TARGET.observe(result['latency']['approach_to_target'])
+        return result
+
+    def close(self):
+        if self.hx is not None:
+            self.finish_intake('shutdown')
+        self.actuator.idle(timeout=5)
+        self.actuator.stop()
+        if self.voices is not None:
+            self.voices.close()
+        if self.clips is not None:
+            self.clips.close()
+        if self.hx is not None:
+            self.hx_sampler.stop()
+        for ring in self.telemetry.values():
+            ring.close()
+        try:
+            self.picam2.stop()
+        finally:
+            self.gpio.cleanup()
+            if self.detection.show:
+                cv2.destroyAllWindows()
+
+
+# History fields for a resolved clip future: the name only when the file was written
+def clip_fields(clip):
+    fields = {'clip_status': clip['status']}
+    if clip['status'] == 'written':
+        fields['clip'] = clip['name']
+    return fields
+
+
+if __name__ == '__main__':
+    # === CLI 인자 처리 ===
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dog')
+    parser.add_argument('--voice')
+    parser.add_argument('--amount', type=int)
+    parser.add_argument('--init-only', action='store_true',
+                        help='initialise hardware and model, then exit (cold start benchmark)')
+    parser.add_argument('--probe', action='store_true',
+                        help='initialise, capture one frame, run the detector once, read the scale, print '
+                             'the timings as JSON and exit (what the daemon\'s "probe" op does warm)')
+    parser.add_argument('--sim', metavar='TRACE_DIR',
+                        help='replay a recorded session from TRACE_DIR instead of using the Pi hardware')
+    parser.add_argument('--speed', type=float, default=10.0,
+                        help='replay speed-up factor for --sim')
+    parser.add_argument('--trace', action='store_true',
+                        help='write Chrome trace files (init + feeding) to OUTPUT/traces')
+    parser.add_argument('--intake', type=float, default=0, metavar='SECONDS',
+                        help='keep watching the bowl for SECONDS after feeding and print the intake '
+                             'decision as a second JSON line')
+    args = parser.parse_args()
+    trace_enabled = args.trace or tracing.ENABLED
+
+    args.init_only = args.init_only or args.probe
+    if not args.init_only and (args.dog is None or args.voice is None or args.amount is None):
+        parser.error('--dog, --voice and --amount are required')
+
+    if args.sim:
+        output_dir = os.path.join(args.sim, 'output')
+        calibration_file = os.path.join(output_dir, 'dispense_calibration.json')
+        dog_index_file = os.path.join(output_dir, 'dog_index.npz')
+        clip_dir = os.path.join(output_dir, 'clips')
+        hw = create_hardware('sim', trace_dir=args.sim, speed=args.speed)
+    else:
+        hw = create_hardware('pi')
+    tracing.start_trace('init', enabled=trace_enabled)
+    feeder = Feeder(hw)
+    tracing.stop_trace(os.path.join(output_dir, 'traces', 'init.json'), process_name='feeder')
+    try:
+        if args.probe:
+            print(json.dumps(feeder.probe()))
+        if not args.init_only:
+            result = feeder.feed(args.dog, args.voice, args.amount, trace=trace_enabled,
+                                 intake_window=args.intake)
+            if feeder.clip_future is not None:
+                # one-shot run: wait for the post-roll + encode so the result can link the file
+                result.update(clip_fields(feeder.clip_future.result(timeout=CLIP_WAIT)))
+            # 마지막 줄은 서버가 읽는 결과 (JSON) - --intake 면 그 다음 줄에 섭취 판단
+            print(json.dumps(result, ensure_ascii=False))
+            if feeder.intake_future is not None:
+                print(json.dumps(feeder.intake_future.result(), ensure_ascii=False))
+            if result['status'] != 'completed':
+                raise SystemExit(1)
+    except KeyboardInterrupt:
+        print("🛑 Program terminated by user.")
+    finally:
+        feeder.close()
@@ -0,0 +1,88 @@
+# motion_gate.py
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap pre-filter in front of the detector.
+
+    Compares a small blurred grayscale copy of each frame with the one from the
+    last inference. Inference is skipped while less than `min_changed` of the
+    pixels moved by more than `pixel_threshold`, until the cached result is older
+    than `max_age` seconds.
+
+    method 'diff' uses that frame difference, 'mog2' an OpenCV background subtractor.
+    """
+
+    def __init__(self, method='diff', size=(80, 60), pixel_threshold=18, min_changed=0.01,
+                 max_age=2.0):
+        self.method = method
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_age = max_age
+        self.reference = None
+        self.last_inference = None
+        self.checked = 0
+        self.skipped = 0
+        self.forced = 0
+        self.last_changed = 0.0
+        self._subtractor = None
+        if method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=25,
+                                                                  detectShadows=False)
+
+    def _small(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _changed_fraction(self, small):
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(small)
+            return np.count_nonzero(mask) / mask.size
+        if self.reference is None:
+            return 1.0
+        diff = cv2.absdiff(small, self.reference)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    # True when the detector should run on this frame
+    def should_infer(self, frame, now=None):
+        now = time.time() if now is None else now
+        self.checked += 1
+        small = self._small(frame)
+        self.last_changed = self._changed_fraction(small)
+
+        if self.last_inference is None or self.last_changed >= self.min_changed:
+            run = True
+        elif now - self.last_inference >= self.max_age:
+            self.forced += 1
+            run = True
+        else:
+            run = False
+
+        if run:
+            self.reference = small
+            self.last_inference = now
+        else:
+            self.skipped += 1
+        return run
+
+    # Start of a detection run: forget the reference and count this run's frames only
+    def reset(self):
+        self.reference = None
+        self.last_inference = None
+        self.checked = 0
+        self.skipped = 0
+        self.forced = 0
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'forced_by_age': self.forced,
+            'skip_ratio': round(self.skipped / self.checked, 3) if self.checked else 0.0,
+        }
@@ -1,21 +1,38 @@
 # servo_control.py
-import RPi.GPIO as GPIO
 import time
 
+try:
+    import RPi.GPIO as GPIO
+except ImportError:  # off the Pi: init_servo(pin, gpio=sim_gpio.SimGPIO())
+    GPIO = None
+
 servo_pwm = None
 servo_pin = None  # 추가
+clock = time
 
 # Initialize servo
-def init_servo(pin):
-    global servo_pwm, servo_pin
+def init_servo(pin, gpio=None, clock_source=None):
+    global servo_pwm, servo_pin, clock
+    gpio = gpio or GPIO
+    clock = clock_source or time
     servo_pin = pin
-    GPIO.setup(pin, GPIO.OUT)
-    servo_pwm = GPIO.PWM(pin, 50)
+    gpio.setup(pin, gpio.OUT)
+    servo_pwm = gpio.PWM(pin, 50)
     servo_pwm.start(0)
 
+def angle_to_duty(angle):
+    return 2.5 + (angle / 180.0) * 10
+
+# Start moving to angle and return immediately (the servo keeps travelling)
+def move(angle):
+    servo_pwm.ChangeDutyCycle(angle_to_duty(angle))
+
+# Stop sending pulses; the servo holds its last position without jitter
+def release():
+    servo_pwm.ChangeDutyCycle(0)
+
 # Set servo angle (0–180 degrees)
 def set_angle(angle):
-    duty = 2.5 + (angle / 180.0) * 10
-    servo_pwm.ChangeDutyCycle(duty)
-    time.sleep(1)
-    servo_pwm.ChangeDutyCycle(0)
+    move(angle)
+    clock.sleep(1)
+    release()
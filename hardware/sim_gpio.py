@@ -0,0 +1,270 @@
+# sim_gpio.py
+# Drop-in stand-in for RPi.GPIO so sensor code can run and be benchmarked off the Pi.
+# Simulated devices attach to pins and drive inputs / react to outputs.
+import time
+import threading
+
+BCM = 11
+BOARD = 10
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+RISING = 31
+FALLING = 32
+BOTH = 33
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+
+
+class SimPWM:
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty = 0
+        self.running = False
+        self.history = []  # (time, duty)
+
+    def start(self, duty):
+        self.running = True
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty):
+        self.duty = duty
+        self.history.append((self.gpio.clock.time(), duty))
+        self.gpio._notify_pwm(self.pin, duty)
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+
+
+class SimGPIO:
+    BCM = BCM
+    BOARD = BOARD
+    OUT = OUT
+    IN = IN
+    LOW = LOW
+    HIGH = HIGH
+    RISING = RISING
+    FALLING = FALLING
+    BOTH = BOTH
+    PUD_OFF = PUD_OFF
+    PUD_DOWN = PUD_DOWN
+    PUD_UP = PUD_UP
+
+    def __init__(self, clock=time):
+        # clock: anything with time() and sleep() (the time module by default)
+        self.clock = clock
+        self.mode = None
+        self.levels = {}
+        self.directions = {}
+        self.devices = []
+        self._callbacks = {}
+        self.edge_times = {}
+        self._cond = threading.Condition()
+
+    # --- RPi.GPIO API ---
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=LOW):
+        self.directions[pin] = direction
+        if pin not in self.levels:
+            self.levels[pin] = HIGH if pull_up_down == PUD_UP else initial
+
+    def output(self, pin, value):
+        value = HIGH if value else LOW
+        self.levels[pin] = value
+        for device in self.devices:
+            device.on_output(pin, value)
+
+    def input(self, pin):
+        for device in self.devices:
+            level = device.poll(pin)
+            if level is not None:
+                self.set_input(pin, level)
+        return self.levels.get(pin, LOW)
+
+    def wait_for_edge(self, pin, edge, timeout=None):
+        # timeout in milliseconds, like RPi.GPIO; returns pin or None
+        deadline = None if timeout is None else self.clock.time() + timeout / 1000.0
+        for device in self.devices:
+            when = device.next_edge(pin, edge)
+            if when is not None:
+                if deadline is not None and when > deadline:
+                    self.clock.sleep(max(0.0, deadline - self.clock.time()))
+                    return None
+                self.clock.sleep(max(0.0, when - self.clock.time()))
+                self.input(pin)
+                return pin
+
+        with self._cond:
+            start = self.levels.get(pin, LOW)
+            ok = self._cond.wait_for(lambda: self.levels.get(pin, LOW) != start and
+                                     self._matches(edge, self.levels.get(pin, LOW)),
+                                     timeout=None if timeout is None else timeout / 1000.0)
+        return pin if ok else None
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self._callbacks[pin] = (edge, [callback] if callback else [])
+
+    def add_event_callback(self, pin, callback):
+        self._callbacks[pin][1].append(callback)
+
+    def remove_event_detect(self, pin):
+        self._callbacks.pop(pin, None)
+
+    def PWM(self, pin, frequency):
+        return SimPWM(self, pin, frequency)
+
+    def cleanup(self, pins=None):
+        for device in self.devices:
+            device.close()
+        self._callbacks.clear()
+
+    # --- simulation side ---
+    def attach(self, device):
+        self.devices.append(device)
+        device.gpio = self
+        return device
+
+    @staticmethod
+    def _matches(edge, level):
+        return edge == BOTH or (edge == RISING and level == HIGH) or (edge == FALLING and level == LOW)
+
+    # Simulated edge timestamp. Thread hand-off jitter is magnified by a sped-up
+    # clock, so devices pass the exact virtual time of the edge via `at`.
+    def event_time(self, pin):
+        return self.edge_times.get(pin, self.clock.time())
+
+    def set_input(self, pin, level, at=None):
+        with self._cond:
+            previous = self.levels.get(pin, LOW)
+            self.levels[pin] = level
+            self.edge_times[pin] = self.clock.time() if at is None else at
+            if previous != level:
+                self._cond.notify_all()
+        if previous != level and pin in self._callbacks:
+            edge, callbacks = self._callbacks[pin]
+            if self._matches(edge, level):
+                for callback in callbacks:
+                    callback(pin)
+
+    def _notify_pwm(self, pin, duty):
+        for device in self.devices:
+            device.on_pwm(pin, duty)
+
+
+class SimDevice:
+    gpio = None
+
+    def on_output(self, pin, value):
+        pass
+
+    def on_pwm(self, pin, duty):
+        pass
+
+    def poll(self, pin):
+        return None
+
+    def next_edge(self, pin, edge):
+        return None
+
+    def close(self):
+        pass
+
+
+class SimLoadCell(SimDevice):
+    """HX711 + load cell. weight_fn(t) gives grams at clock time t."""
+
+    def __init__(self, dout, pd_sck, weight_fn, reference_unit=22, zero_counts=8000,
+                 rate=80, noise=0.0):
+        self.dout = dout
+        self.pd_sck = pd_sck
+        self.weight_fn = weight_fn
+        self.reference_unit = reference_unit
+        self.zero_counts = zero_counts
+        self.period = 1.0 / rate
+        self.noise = noise
+        self.next_ready = 0.0
+        self._bits = None
+        self._pulses = 0
+        self.conversions = 0
+
+    def _start_conversion(self):
+        import random
+        grams = self.weight_fn(self.gpio.clock.time())
+        if self.noise:
+            grams += random.gauss(0, self.noise)
+        counts = int(round(grams * self.reference_unit)) + self.zero_counts
+        self._bits = counts & 0xFFFFFF
+        self._pulses = 0
+        self.conversions += 1
+
+    def poll(self, pin):
+        if pin != self.dout or self._bits is not None:
+            return None
+        return LOW if self.gpio.clock.time() >= self.next_ready else HIGH
+
+    def next_edge(self, pin, edge):
+        if pin != self.dout or edge not in (FALLING, BOTH):
+            return None
+        return max(self.next_ready, self.gpio.clock.time())
+
+    def on_output(self, pin, value):
+        if pin != self.pd_sck or value != HIGH:
+            return
+        if self._bits is None:
+            if self.gpio.clock.time() < self.next_ready:
+                return
+            self._start_conversion()
+        if self._pulses < 24:
+            bit = (self._bits >> (23 - self._pulses)) & 1
+            self.gpio.levels[self.dout] = bit
+        else:
+            # 25th pulse: gain 128 channel A, DOUT goes high until the next conversion
+            self._bits = None
+            self.gpio.levels[self.dout] = HIGH
+            self.next_ready = self.gpio.clock.time() + self.period
+        self._pulses += 1
+
+
+class SimUltrasonic(SimDevice):
+    """HC-SR04. distance_fn(t) gives cm at clock time t, or None for a missed echo."""
+
+    ECHO_DELAY = 0.0005  # trigger to echo rise
+
+    def __init__(self, trig, echo, distance_fn):
+        self.trig = trig
+        self.echo = echo
+        self.distance_fn = distance_fn
+        self._trig_level = LOW
+        self.pings = 0
+
+    def on_output(self, pin, value):
+        if pin != self.trig:
+            return
+        falling = self._trig_level == HIGH and value == LOW
+        self._trig_level = value
+        if falling:
+            self.pings += 1
+            distance = self.distance_fn(self.gpio.clock.time())
+            if distance is not None:
+                threading.Thread(target=self._echo, args=(distance,), daemon=True).start()
+
+    def _echo(self, distance):
+        clock = self.gpio.clock
+        rise = clock.time() + self.ECHO_DELAY
+        fall = rise + distance / 17150
+        clock.sleep(self.ECHO_DELAY)
+        self.gpio.set_input(self.echo, HIGH, at=rise)
+        clock.sleep(fall - clock.time())
+        self.gpio.set_input(self.echo, LOW, at=fall)
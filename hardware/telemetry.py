@@ -0,0 +1,248 @@
+# telemetry.py
+# Fixed-size sensor history in memory-mapped ring files (one file per series).
+#
+#   ring = telemetry.open_series('weight')              # writer (feeder daemon)
+#   ring.append(time.time(), 23.4)
+#   ring = telemetry.open_series('weight', readonly=True)   # reader (server, other process)
+#   t, v = ring.range(start, end)
+#   buckets = ring.downsample(start, end, points=300)   # t, mean, min, max, count per bucket
+#
+# File layout: 64 byte header | t[capacity] float64 | v[capacity] float32. Samples are
+# written at count % capacity and `count` is bumped afterwards, so readers in other
+# processes see a consistent prefix through the shared mapping. Timestamps increase
+# with count, which keeps every range query a pair of binary searches on the
+# contiguous t column: only the pages of the requested range are touched. Writes keep
+# that true: a timestamp older than the newest one stored (the wall clock stepped back,
+# e.g. an NTP correction) is clamped to it and counted in stats()['clamped'].
+import os
+import threading
+
+import numpy as np
+
+TELEMETRY_DIR = os.environ.get('FEEDER_TELEMETRY_DIR', '/home/pi/auto_feeder/telemetry')
+
+MAGIC = b'FTEL'
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'), ('version', '<u4'), ('capacity', '<u8'), ('count', '<u8'),
+    ('unit', 'S8'), ('name', 'S24'), ('reserved', 'S8'),
+])
+assert HEADER_DTYPE.itemsize == HEADER_SIZE
+
+# name -> (unit, capacity). weight is written at 10 Hz (~29 h), distance while a feeding runs.
+SERIES = {
+    'weight': ('g', 1 << 20),
+    'distance': ('cm', 1 << 18),
+}
+
+
+class TelemetryRing:
+    """One timestamped float series in a memory-mapped ring file (single writer, many readers)."""
+
+    def __init__(self, path, capacity=None, unit='', name=None, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE
+        if not exists:
+            if readonly:
+                raise FileNotFoundError(path)
+            if not capacity:
+                raise ValueError('capacity is required to create a telemetry file')
+            self._create(path, capacity, unit, name or os.path.splitext(os.path.basename(path))[0])
+
+        mode = 'r' if readonly else 'r+'
+        self._header = np.memmap(path, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+        header = self._header[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError(f'{path}: not a telemetry file (version {VERSION})')
+        self.capacity = int(header['capacity'])
+        if capacity and capacity != self.capacity:
+            raise ValueError(f'{path}: capacity is {self.capacity}, not {capacity} (delete the file to resize)')
+        self.unit = header['unit'].decode()
+        self.name = header['name'].decode()
+        self._t = np.memmap(path, dtype='<f8', mode=mode, offset=HEADER_SIZE, shape=(self.capacity,))
+        self._v = np.memmap(path, dtype='<f4', mode=mode, offset=HEADER_SIZE + 8 * self.capacity,
+                            shape=(self.capacity,))
+        self._lock = threading.Lock()
+        self.clamped = 0
+
+    @staticmethod
+    def _create(path, capacity, unit, name):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['capacity'] = capacity
+        header['unit'] = unit.encode()[:8]
+        header['name'] = name.encode()[:24]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header.tobytes())
+            f.truncate(HEADER_SIZE + 12 * capacity)  # sparse until written
+        os.replace(tmp_path, path)
+
+    @property
+    def count(self):
+        """Samples ever written (the newest capacity of them are kept)."""
+        return int(self._header['count'][0])
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _last_t(self, count):
+        return float(self._t[(count - 1) % self.capacity]) if count else float('-inf')
+
+    def append(self, t, value):
+        with self._lock:
+            count = self.count
+            last = self._last_t(count)
+            if t < last:
+                t = last
+                self.clamped += 1
+            i = count % self.capacity
+            self._t[i] = t
+            self._v[i] = value
+            self._header['count'] = count + 1
+
+    def extend(self, times, values):
+        times = np.asarray(times, dtype='<f8')
+        values = np.asarray(values, dtype='<f4')
+        with self._lock:
+            count = self.count
+            n = len(times)
+            if n:
+                ordered = np.maximum.accumulate(np.concatenate([[self._last_t(count)], times]))[1:]
+                self.clamped += int(np.count_nonzero(ordered != times))
+                times = ordered
+            if n > self.capacity:
+                count, times, values = count + n - self.capacity, times[-self.capacity:], values[-self.capacity:]
+                n = self.capacity
+            i = count % self.capacity
+            first = min(n, self.capacity - i)
+            self._t[i:i + first] = times[:first]
+            self._v[i:i + first] = values[:first]
+            self._t[:n - first] = times[first:]
+            self._v[:n - first] = values[first:]
+            self._header['count'] = count + n
+
+    def flush(self):
+        if not self.readonly:
+            self._t.flush()
+            self._v.flush()
+            self._header.flush()
+
+    def close(self):
+        self.flush()
+        self._t = self._v = self._header = None
+
+    # (oldest, newest + 1) logical positions that are still in the file
+    def _window(self):
+        count = self.count
+        return max(0, count - self.capacity), count
+
+    def _segments(self, lo, hi):
+        """Physical (start, stop) slices covering logical positions [lo, hi), oldest first."""
+        if hi <= lo:
+            return []
+        a, b = lo % self.capacity, hi % self.capacity or self.capacity
+        if a < b:
+            return [(a, b)]
+        return [(a, self.capacity), (0, b)]
+
+    def _search(self, lo, hi, t, side):
+        """Logical position of the first sample at/after t (left) or after t (right) in [lo, hi)."""
+        offset = lo
+        for a, b in self._segments(lo, hi):
+            column = self._t[a:b]
+            pos = int(np.searchsorted(column, t, side=side))
+            if pos < b - a:
+                return offset + pos
+            offset += b - a
+        return hi
+
+    def range(self, start=None, end=None, max_samples=None):
+        """Copies of (t, v) for start <= t <= end, oldest first. max_samples keeps the newest ones."""
+        lo, hi = self._window()
+        first = lo if start is None else self._search(lo, hi, start, 'left')
+        last = hi if end is None else self._search(first, hi, end, 'right')
+        if max_samples is not None and last - first > max_samples:
+            first = last - max_samples
+        t = np.concatenate([np.array(self._t[a:b]) for a, b in self._segments(first, last)] or [np.empty(0)])
+        v = np.concatenate([np.array(self._v[a:b]) for a, b in self._segments(first, last)]
+                           or [np.empty(0, dtype='<f4')])
+        # the writer may have wrapped over the oldest part while we copied
+        overwritten = self.count - self.capacity - first
+        if overwritten > 0:
+            t, v = t[overwritten:], v[overwritten:]
+        return t, v
+
+    def latest(self):
+        lo, hi = self._window()
+        if hi == lo:
+            return None
+        i = (hi - 1) % self.capacity
+        return float(self._t[i]), float(self._v[i])
+
+    def downsample(self, start=None, end=None, points=300):
+        """Bucket [start, end] into `points` equal time slices; empty slices are left out.
+
+        Returns dict of arrays t (mean time), mean, min, max, count. Series shorter than
+        `points` come back as they are (min = max = mean).
+        """
+        t, v = self.range(start, end)
+        if len(t) <= points:
+            ones = np.ones(len(t), dtype=np.int64)
+            return {'t': t, 'mean': v.astype(np.float64), 'min': v, 'max': v, 'count': ones}
+        t0 = t[0] if start is None else start
+        t1 = t[-1] if end is None else end
+        edges = np.linspace(t0, t1, points + 1)
+        starts = np.unique(np.searchsorted(t, edges[:-1], side='left'))
+        starts = starts[starts < len(t)]
+        counts = np.diff(np.append(starts, len(t)))
+        return {
+            't': np.add.reduceat(t, starts) / counts,
+            'mean': np.add.reduceat(v.astype(np.float64), starts) / counts,
+            'min': np.minimum.reduceat(v, starts),
+            'max': np.maximum.reduceat(v, starts),
+            'count': counts,
+        }
+
+    def stats(self):
+        lo, hi = self._window()
+        first = float(self._t[lo % self.capacity]) if hi > lo else None
+        latest = self.latest()
+        return {
+            'name': self.name,
+            'unit': self.unit,
+            'samples': hi - lo,
+            'written': self.count,
+            'capacity': self.capacity,
+            'clamped': self.clamped,
+            'first_t': first,
+            'last_t': latest[0] if latest else None,
+            'last_value': round(latest[1], 3) if latest else None,
+            'file_bytes': HEADER_SIZE + 12 * self.capacity,
+        }
+
+
+def series_path(name, directory=None):
+    return os.path.join(directory or TELEMETRY_DIR, f'{name}.ring')
+
+
+def open_series(name, directory=None, readonly=False, capacity=None, fresh=False):
+    """Open (and for writers create) one of SERIES; readers get FileNotFoundError until it exists.
+
+    fresh=True starts the writer with an empty file (simulation runs, whose clock restarts at 0).
+    """
+    unit, default_capacity = SERIES.get(name, ('', None))
+    if fresh and not readonly and os.path.exists(series_path(name, directory)):
+        os.remove(series_path(name, directory))
+    return TelemetryRing(series_path(name, directory), capacity=None if readonly else capacity or default_capacity,
+                         unit=unit, name=name, readonly=readonly)
+
+
+def downsample_json(buckets, digits=2):
+    """downsample() result as [[t, mean, min, max], ...] rows for JSON responses."""
+    return [[round(float(t), 3), round(float(mean), digits), round(float(lo), digits), round(float(hi), digits)]
+            for t, mean, lo, hi in zip(buckets['t'], buckets['mean'], buckets['min'], buckets['max'])]
@@ -0,0 +1,95 @@
+# test_hx711.py
+# HX711Sampler on a simulated load cell (SimGPIO): sampling, thresholds, and that a
+# failing listener / callback / telemetry ring / read never ends the sampler thread.
+#
+#   python3 -m pytest -q hardware/tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sim_gpio import SimGPIO, SimLoadCell
+from hx711 import HX711, HX711Sampler
+
+DOUT, PD_SCK = 5, 6
+REFERENCE_UNIT = 22
+ZERO_COUNTS = 8000
+
+
+def make_sampler(grams=25.0, **kwargs):
+    gpio = SimGPIO()
+    gpio.attach(SimLoadCell(DOUT, PD_SCK, lambda t: grams, reference_unit=REFERENCE_UNIT,
+                            zero_counts=ZERO_COUNTS, rate=80))
+    hx = HX711(DOUT, PD_SCK, gpio=gpio)
+    hx.offset = ZERO_COUNTS ^ 0x800000  # read() flips the sign bit
+    hx.set_reference_unit(REFERENCE_UNIT)
+    return HX711Sampler(hx, rate=0, **kwargs)
+
+
+def broken(*args):
+    raise RuntimeError('boom')
+
+
+class BrokenRing:
+    def append(self, t, value):
+        raise OSError('disk full')
+
+
+def test_sampler_reads_weight():
+    sampler = make_sampler(grams=25.0).start()
+    try:
+        assert sampler.wait_for_samples(5)
+        assert abs(sampler.get_weight() - 25.0) < 0.1
+        assert sampler.stats()['errors'] == 0
+    finally:
+        sampler.stop()
+
+
+def test_threshold_fires_once():
+    sampler = make_sampler(grams=25.0)
+    fired = []
+    sampler.on_threshold(20.0, fired.append)
+    sampler.start()
+    try:
+        assert sampler.wait_for_samples(5)
+        assert len(fired) == 1 and fired[0] >= 20.0
+    finally:
+        sampler.stop()
+
+
+def test_sampler_survives_failing_callbacks():
+    sampler = make_sampler(grams=25.0, telemetry=BrokenRing())
+    sampler.tared = True
+    sampler.add_listener(broken)
+    sampler.on_threshold(20.0, broken, once=False)
+    seen = []
+    sampler.add_listener(lambda t, grams: seen.append(grams))  # later listeners still run
+    sampler.start()
+    try:
+        assert sampler.wait_for_samples(10)
+        assert sampler._thread.is_alive()
+        assert sampler.errors >= 10
+        assert len(seen) >= 10
+        assert abs(sampler.get_weight() - 25.0) < 0.1
+    finally:
+        sampler.stop()
+
+
+def test_sampler_survives_read_errors():
+    sampler = make_sampler(grams=25.0)
+    read = sampler.hx.read
+    calls = {'n': 0}
+
+    def flaky_read(timeout=1.0):
+        calls['n'] += 1
+        if calls['n'] <= 3:
+            raise OSError('GPIO busy')
+        return read(timeout)
+
+    sampler.hx.read = flaky_read
+    sampler.start()
+    try:
+        assert sampler.wait_for_samples(5)
+        assert sampler.errors == 3
+    finally:
+        sampler.stop()
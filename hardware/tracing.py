@@ -0,0 +1,186 @@
+# tracing.py
+# Opt-in span recorder writing Chrome trace format (chrome://tracing, https://ui.perfetto.dev).
+#
+#   trace = tracing.start_trace('feed', dog='초코')      # None unless enabled
+#   with tracing.span('detect_person'): ...
+#   @tracing.traced('dispense')
+#   def dispense(...): ...
+#   tracing.stop_trace('traces/feed.json')
+#
+# The module-level helpers record into the one active trace (the feeder runs one feeding
+# at a time), from any thread. When no trace is active they cost a global lookup.
+# Timestamps are time.perf_counter() in microseconds; on Linux that clock is shared by
+# all processes, so traces from the server and the daemon can be merged as they are.
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('FEEDER_TRACE') == '1'
+TRACE_KEEP = int(os.environ.get('FEEDER_TRACE_KEEP', '20'))
+
+
+def _now_us():
+    return time.perf_counter() * 1e6
+
+
+class Trace:
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+        self.pid = os.getpid()
+        self.events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+        self.started = _now_us()
+        self.ended = None
+
+    def _tid(self):
+        thread = threading.current_thread()
+        tid = thread.ident
+        if tid not in self._threads:
+            self._threads[tid] = thread.name
+        return tid
+
+    def complete(self, name, start_us, dur_us, cat='feed', **args):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': round(start_us, 1), 'dur': round(max(0.0, dur_us), 1),
+                 'pid': self.pid, 'tid': self._tid()}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+
+    def record(self, name, seconds, cat='feed', **args):
+        """Span that just ended and lasted `seconds` (for timings measured elsewhere)."""
+        end = _now_us()
+        self.complete(name, end - seconds * 1e6, seconds * 1e6, cat, **args)
+
+    def instant(self, name, cat='feed', **args):
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': round(_now_us(), 1),
+                 'pid': self.pid, 'tid': self._tid()}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name, cat='feed', **args):
+        start = _now_us()
+        try:
+            yield
+        finally:
+            self.complete(name, start, _now_us() - start, cat, **args)
+
+    def finish(self):
+        if self.ended is None:
+            self.ended = _now_us()
+            self.complete(self.name, self.started, self.ended - self.started, 'root', **self.args)
+
+    def to_json(self, process_name=None):
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        meta = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in threads.items()]
+        if process_name:
+            meta.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                         'args': {'name': process_name}})
+        return {'traceEvents': meta + events, 'displayTimeUnit': 'ms',
+                'metadata': dict(self.args, name=self.name)}
+
+    def save(self, path, process_name=None, extra_events=None):
+        data = self.to_json(process_name)
+        if extra_events:
+            data['traceEvents'].extend(extra_events)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+
+# === the active trace (one feeding at a time) ===
+_active = None
+
+
+def start_trace(name, enabled=None, **args):
+    global _active
+    if not (ENABLED if enabled is None else enabled):
+        return None
+    _active = Trace(name, **args)
+    return _active
+
+
+def stop_trace(path=None, process_name=None):
+    global _active
+    trace, _active = _active, None
+    if trace is None:
+        return None
+    trace.finish()
+    if path:
+        trace.save(path, process_name=process_name)
+    return trace
+
+
+def active():
+    return _active
+
+
+@contextmanager
+def span(name, cat='feed', **args):
+    trace = _active
+    if trace is None:
+        yield
+        return
+    with trace.span(name, cat, **args):
+        yield
+
+
+def record(name, seconds, cat='feed', **args):
+    trace = _active
+    if trace is not None:
+        trace.record(name, seconds, cat, **args)
+
+
+def instant(name, cat='feed', **args):
+    trace = _active
+    if trace is not None:
+        trace.instant(name, cat, **args)
+
+
+def traced(name=None, cat='feed'):
+    """Decorator: record each call as a span in the active trace."""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            trace = _active
+            if trace is None:
+                return fn(*a, **kw)
+            with trace.span(span_name, cat):
+                return fn(*a, **kw)
+        return wrapper
+    return decorate
+
+
+def prune(directory, keep=TRACE_KEEP, suffix='.json'):
+    """Delete all but the newest `keep` trace files in directory."""
+    try:
+        names = sorted((f for f in os.listdir(directory) if f.endswith(suffix)),
+                       key=lambda f: os.path.getmtime(os.path.join(directory, f)))
+    except OSError:
+        return
+    for old in names[:-keep] if keep > 0 else names:
+        try:
+            os.remove(os.path.join(directory, old))
+        except OSError:
+            pass
+
+
+def load_events(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('traceEvents', [])
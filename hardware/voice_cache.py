@@ -0,0 +1,193 @@
+# voice_cache.py
+# Owner voice clips: decoded + loudness-normalised once into a PCM cache, played from
+# memory through an audio output that stays open between feedings.
+#
+#   decode_voice('voices/hello.m4a', 'voices/cache/hello.m4a.wav')   at upload time (server)
+#   player = VoicePlayer('voices'); player.play('hello.m4a')          returns immediately
+import os
+import wave
+import threading
+import subprocess
+from collections import OrderedDict
+
+SAMPLE_RATE = 22050
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # s16le
+MAX_SECONDS = 30
+LOUDNORM = 'loudnorm=I=-16:TP=-1.5:LRA=11'
+PERIOD_SECONDS = 0.125  # aplay's ALSA period; it only plays whole periods
+CACHE_DIRNAME = 'cache'
+
+
+# Keyed on the full file name: hello.mp3 and hello.m4a are different clips
+def cache_path_for(voice_dir, voice_file):
+    return os.path.join(voice_dir, CACHE_DIRNAME, os.path.basename(voice_file) + '.wav')
+
+
+def decode_voice(src, dst, max_seconds=MAX_SECONDS):
+    """Decode any ffmpeg-readable clip to normalised mono s16 WAV at dst (atomic).
+
+    Raises ValueError for files ffmpeg cannot decode or clips longer than max_seconds,
+    RuntimeError when ffmpeg is not installed.
+    """
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp_path = dst + '.tmp.wav'
+    cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-i', src,
+           '-t', str(max_seconds + 1), '-af', LOUDNORM,
+           '-ac', str(CHANNELS), '-ar', str(SAMPLE_RATE), '-sample_fmt', 's16', tmp_path]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise RuntimeError('ffmpeg is not installed')
+    if proc.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise ValueError(f"cannot decode {os.path.basename(src)}: {proc.stderr.strip()[-200:]}")
+
+    with wave.open(tmp_path, 'rb') as w:
+        duration = w.getnframes() / float(w.getframerate())
+    if duration > max_seconds:
+        os.remove(tmp_path)
+        raise ValueError(f"clip is longer than {max_seconds}s")
+    if duration == 0:
+        os.remove(tmp_path)
+        raise ValueError('clip has no audio')
+    os.replace(tmp_path, dst)
+    return {'path': dst, 'duration': round(duration, 2), 'sample_rate': SAMPLE_RATE}
+
+
+class AplayOutput:
+    """One long-running `aplay` reading raw PCM from a pipe: no per-clip process start.
+
+    aplay holds back a trailing partial period until more data arrives, so each clip is
+    padded with silence to a period boundary plus one period; the prompt's end plays now
+    instead of at the start of the next clip.
+    """
+
+    def __init__(self, device=None):
+        self.device = device
+        self.proc = None
+        self.period_bytes = int(SAMPLE_RATE * PERIOD_SECONDS) * CHANNELS * SAMPLE_WIDTH
+        self._lock = threading.Lock()
+
+    def _ensure(self):
+        if self.proc is None or self.proc.poll() is not None:
+            cmd = ['aplay', '-q', '-t', 'raw', '-f', 'S16_LE', '-r', str(SAMPLE_RATE), '-c', str(CHANNELS),
+                   f'--period-time={int(PERIOD_SECONDS * 1e6)}']
+            if self.device:
+                cmd += ['-D', self.device]
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return self.proc
+
+    def write(self, pcm):
+        pcm += bytes(self.period_bytes + (-len(pcm)) % self.period_bytes)
+        with self._lock:
+            for attempt in range(2):
+                proc = self._ensure()
+                try:
+                    proc.stdin.write(pcm)
+                    proc.stdin.flush()
+                    return
+                except BrokenPipeError:
+                    # aplay died (device reset, USB audio replugged): restart it, write once more
+                    self.proc = None
+                    if attempt:
+                        print("⚠️ aplay closed its input twice, voice clip dropped")
+
+    def close(self):
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+            self.proc.terminate()
+            self.proc = None
+
+
+class NullOutput:
+    """Discards audio (simulation, machines without a sound card)."""
+
+    def write(self, pcm):
+        pass
+
+    def close(self):
+        pass
+
+
+class VoicePlayer:
+    """Plays cached voice clips in the background; decodes on first use if the cache is missing."""
+
+    def __init__(self, voice_dir, output=None, max_cache_bytes=16 * 1024 * 1024):
+        self.voice_dir = voice_dir
+        self.output = output or AplayOutput()
+        self.max_cache_bytes = max_cache_bytes
+        self._clips = OrderedDict()  # voice_file -> pcm bytes (LRU)
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._queue_lock = threading.Lock()  # one clip at a time on the output
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, voice_file):
+        with self._lock:
+            pcm = self._clips.get(voice_file)
+            if pcm is not None:
+                self._clips.move_to_end(voice_file)
+                self.hits += 1
+                return pcm
+        self.misses += 1
+
+        src = os.path.join(self.voice_dir, voice_file)
+        wav_path = cache_path_for(self.voice_dir, voice_file)
+        stale = (os.path.exists(src) and os.path.exists(wav_path)
+                 and os.path.getmtime(src) > os.path.getmtime(wav_path))
+        if not os.path.exists(wav_path) or stale:
+            if not os.path.exists(src):
+                raise FileNotFoundError(src)
+            decode_voice(src, wav_path)
+        with wave.open(wav_path, 'rb') as w:
+            pcm = w.readframes(w.getnframes())
+
+        with self._lock:
+            self._clips[voice_file] = pcm
+            self._cached_bytes += len(pcm)
+            while self._cached_bytes > self.max_cache_bytes and len(self._clips) > 1:
+                _, old = self._clips.popitem(last=False)
+                self._cached_bytes -= len(old)
+        return pcm
+
+    def preload(self, voice_file):
+        try:
+            self._load(voice_file)
+            return True
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"⚠️ Voice preload failed ({voice_file}): {e}")
+            return False
+
+    def play(self, voice_file):
+        """Start playback and return a threading.Event set when the clip has been written out."""
+        done = threading.Event()
+        try:
+            pcm = self._load(voice_file)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"⚠️ Voice file not playable: {voice_file} ({e})")
+            done.set()
+            return done
+
+        def run():
+            try:
+                with self._queue_lock:
+                    self.output.write(pcm)
+            finally:
+                done.set()
+
+        threading.Thread(target=run, daemon=True, name='voice').start()
+        return done
+
+    def stats(self):
+        with self._lock:
+            return {'clips': len(self._clips), 'bytes': self._cached_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self.output.close()
@@ -3,37 +3,196 @@ import time
 import cv2
 import os
 
-# Detect person for at least 10 seconds using YOLO
-def detect_person(model, picam2, output_dir):
+import metrics
+import tracing
+from detector_backends import as_detector
+
+# COCO class ids
+PERSON_CLASS = 0
+DOG_CLASS = 16
+TARGET_CLASSES = (DOG_CLASS,)
+IDENTIFY_CLASSES = (DOG_CLASS,)  # boxes cropped for dog identification (enrolment uses the same)
+
+DETECT_STAGE_SECONDS = metrics.histogram('feeder_detect_stage_seconds',
+                                         'Time per detection loop stage (capture, motion_gate, inference, ...)',
+                                         ['stage'])
+INFERENCES = metrics.counter('feeder_inferences_total', 'Detector inferences run')
+IDENTITY_CHECKS = metrics.counter('feeder_identity_checks_total',
+                                  'Crops identified during detection, by result', ['result'])
+INFERENCES_SKIPPED = metrics.counter('feeder_inferences_skipped_total',
+                                     'Frames that reused the last detection instead of running the model',
+                                     ['reason'])
+
+
+class DetectionConfig:
+    """Pipeline settings for detect_person.
+
+    infer_every  run the model on every Nth frame, reuse the last result in between
+    imgsz        model input size (None = model default, 320 is much cheaper on a Pi)
+    classes      class ids the model should return / that count as a detection
+    person_trigger  a person in view also counts (feedings for dogs that are not enrolled)
+    annotate     draw boxes (only needed when frames are recorded or shown)
+    recorder     optional clip_recorder.ClipRecorder; frames go into its pre-roll ring,
+                 the disk is only written when the caller triggers a clip
+    show         open a preview window (None = only when a display is present)
+    motion_gate  optional motion_gate.MotionGate; static frames reuse the last result
+    identifier   optional dog_identity.DogIdentifier; when the expected dog is enrolled,
+                 only dog boxes identified as that dog count towards the dwell
+    """
+
+    def __init__(self, infer_every=1, imgsz=None, classes=TARGET_CLASSES, annotate=False,
+                 recorder=None, show=None, dwell_seconds=10, motion_gate=None, identifier=None,
+                 person_trigger=False):
+        self.infer_every = max(1, infer_every)
+        self.imgsz = imgsz
+        self.classes = tuple(classes)
+        if person_trigger and PERSON_CLASS not in self.classes:
+            self.classes += (PERSON_CLASS,)
+        self.annotate = annotate
+        self.recorder = recorder
+        self.show = bool(os.environ.get('DISPLAY')) if show is None else show
+        self.dwell_seconds = dwell_seconds
+        self.motion_gate = motion_gate
+        self.identifier = identifier
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        DETECT_STAGE_SECONDS.labels(stage).observe(seconds)
+        tracing.record(stage, seconds, cat='detect')
+
+    def report(self):
+        return {
+            stage: {
+                'count': self.counts[stage],
+                'total_ms': round(total * 1000, 1),
+                'mean_ms': round(total * 1000 / self.counts[stage], 2),
+            }
+            for stage, total in self.totals.items()
+        }
+
+
+# Detect person for at least config.dwell_seconds using YOLO.
+# detector is a detector_backends.Detector (a bare ultralytics YOLO also works).
+# stats (optional dict) is filled with frame counts and per-stage timings.
+# dog: the dog this feeding is for; with config.identifier and that dog enrolled, other dogs don't count.
+def detect_person(detector, picam2, config=None, timeout=None, stats=None, clock=time, dog=None):
+    config = config or DetectionConfig()
+    detector = as_detector(detector, imgsz=config.imgsz or 640)
+    timer = StageTimer()
+    recorder = config.recorder
+    started = clock.time()
     frame_count = 0
+    inferences = 0
     detect_start = None
-    detection_duration = 0
+    detected = False
+    last_classes = []
+    last_result = None
+    gate = config.motion_gate
+    if gate is not None:
+        gate.reset()
+    identifier = config.identifier
+    check_identity = identifier is not None and dog is not None and identifier.knows(dog)
+    identity = None  # last identify() result, reused like last_classes between inferences
+    identity_stats = {'expected': dog, 'checks': 0, 'mismatches': 0, 'others': {}}
 
-    while True:
-        frame = picam2.capture_array()
-        results = model(frame)
-        annotated_frame = results[0].plot()
-        classes = results[0].boxes.cls.tolist()
+    try:
+        while timeout is None or clock.time() - started < timeout:
+            t0 = time.perf_counter()
+            frame = picam2.capture_array()
+            captured_at = clock.time()
+            t1 = time.perf_counter()
+            timer.add('capture', t1 - t0)
+
+            if frame_count % config.infer_every == 0:
+                run = True
+                if gate is not None:
+                    run = gate.should_infer(frame, captured_at)
+                    timer.add('motion_gate', time.perf_counter() - t1)
+                if run:
+                    t_infer = time.perf_counter()
+                    last_result = detector.detect(frame, classes=config.classes)
+                    last_classes = last_result.class_list()
+                    inferences += 1
+                    timer.add('inference', time.perf_counter() - t_infer)
+                    INFERENCES.inc()
+                    if check_identity:
+                        identity = _identify(identifier, frame, last_result, dog, timer, identity_stats)
+                else:
+                    INFERENCES_SKIPPED.labels('motion').inc()
+            else:
+                INFERENCES_SKIPPED.labels('stride').inc()
 
-        if 0 in classes:  # class 0 = person
-            if detect_start is None:
-                detect_start = time.time()
+            # Dwell is measured on capture timestamps, independent of plotting / disk I/O
+            if check_identity:
+                # only the expected dog counts; a person in view does not open an enrolled dog's bowl
+                present = identity is not None and identity['dog'] == dog
             else:
-                detection_duration = time.time() - detect_start
+                present = any(int(c) in config.classes for c in last_classes)
+            if present:
+                if detect_start is None:
+                    detect_start = captured_at
+                elif captured_at - detect_start >= config.dwell_seconds:
+                    detected = True
+                    break
+            else:
+                detect_start = None
+
+            if config.annotate or config.show or recorder is not None:
+                t2 = time.perf_counter()
+                output_frame = last_result.plot(frame) if config.annotate and last_result is not None else frame
+                timer.add('plot', time.perf_counter() - t2)
+
+                if recorder is not None:
+                    t3 = time.perf_counter()
+                    recorder.add(output_frame, captured_at)
+                    timer.add('record', time.perf_counter() - t3)
+
+                if config.show:
+                    cv2.imshow("YOLOv8 Detection", output_frame)
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        break
 
-            if detection_duration >= 10:
-                return True
-        else:
-            detect_start = None
-            detection_duration = 0
+            frame_count += 1
+    finally:
+        if stats is not None:
+            stats.update({
+                'frames': frame_count,
+                'inferences': inferences,
+                'seconds': round(clock.time() - started, 3),
+                'stages': timer.report(),
+            })
+            if gate is not None:
+                stats['motion_gate'] = gate.stats()
+            if check_identity:
+                if identity is not None:
+                    identity_stats.update(matched=identity['dog'], best=identity['best'], score=identity['score'])
+                stats['identity'] = identity_stats
+            if recorder is not None:
+                stats['clips'] = recorder.stats()
 
-        output_path = os.path.join(output_dir, f"frame_{frame_count:04d}.jpg")
-        cv2.imwrite(output_path, annotated_frame)
-        print(f"[INFO] Saved: {output_path}")
-        frame_count += 1
+    return detected
 
-        cv2.imshow("YOLOv8 Detection", annotated_frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
 
-    return False
+def _identify(identifier, frame, result, dog, timer, identity_stats):
+    crops = [result.crop(frame, i) for i, c in enumerate(result.classes) if int(c) in IDENTIFY_CLASSES]
+    if not crops:
+        return None
+    t0 = time.perf_counter()
+    identity = identifier.identify(crops)
+    timer.add('identify', time.perf_counter() - t0)
+    identity_stats['checks'] += 1
+    if identity['dog'] == dog:
+        IDENTITY_CHECKS.labels('match').inc()
+    else:
+        identity_stats['mismatches'] += 1
+        other = identity['dog'] or 'unknown'
+        identity_stats['others'][other] = identity_stats['others'].get(other, 0) + 1
+        IDENTITY_CHECKS.labels('other' if identity['dog'] else 'unknown').inc()
+    return identity
@@ -0,0 +1,164 @@
+# camera_manager.py
+import threading
+import time
+
+
+# 📌 카메라 수명 관리 - 처음 사용할 때 백그라운드 스레드에서 초기화
+# - cv2 / picamera2 import 도 초기화 스레드에서 (서버 부팅을 막지 않음)
+# - 상태: idle → initializing → ready | unavailable (실패 시 error 에 이유)
+class CameraManager:
+    def __init__(self, width=640, height=480, settle_seconds=0.0):
+        self.width = width
+        self.height = height
+        self.settle_seconds = settle_seconds  # 재초기화 전 장치가 풀릴 때까지 기다리는 시간
+        self.state = 'idle'
+        self.backend = None  # 'picamera2' | 'opencv'
+        self.picamera2_available = None  # 초기화 전에는 모름
+        self.error = None
+        self.attempts = 0
+        self.init_seconds = None
+        self.ready_at = None
+        self.picam2 = None
+        self.camera = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def available(self):
+        return self.state == 'ready'
+
+    # 초기화가 안 되어 있으면 백그라운드로 시작 (바로 반환)
+    def ensure_started(self):
+        with self._lock:
+            if self.state != 'idle':
+                return
+            self._start_locked()
+
+    def _start_locked(self, settle=0.0):
+        self.state = 'initializing'
+        self.error = None
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._init, args=(settle,), daemon=True, name='camera-init')
+        self._thread.start()
+
+    # 카메라 재초기화 - 기존 장치 해제 후 백그라운드에서 다시 초기화 (바로 반환)
+    def reinit(self):
+        with self._lock:
+            if self.state == 'initializing':
+                return False
+            self._release_locked()
+            self._start_locked(settle=self.settle_seconds)
+            return True
+
+    def wait_ready(self, timeout=None):
+        self._ready.wait(timeout)
+        return self.available
+
+    def _init(self, settle):
+        if settle:
+            time.sleep(settle)
+        started = time.perf_counter()
+        self.attempts += 1
+        picam2, camera, backend, error = None, None, None, None
+        try:
+            try:
+                from picamera2 import Picamera2
+                self.picamera2_available = True
+            except ImportError:
+                self.picamera2_available = False
+
+            if self.picamera2_available:
+                print("📷 Picamera2로 카메라 초기화 중...")
+                picam2 = Picamera2()
+                picam2.preview_configuration.main.size = (self.width, self.height)
+                picam2.preview_configuration.main.format = "RGB888"
+                picam2.configure("preview")
+                picam2.start()
+                frame = picam2.capture_array()
+                backend = 'picamera2'
+                if frame is None or frame.size == 0:
+                    error = 'Picamera2에서 프레임을 읽을 수 없음'
+            else:
+                import cv2
+                print("📷 OpenCV로 카메라 초기화 중...")
+                camera = cv2.VideoCapture(0)
+                backend = 'opencv'
+                if not camera.isOpened():
+                    error = 'OpenCV 카메라를 열 수 없음'
+                else:
+                    camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                    ret, _ = camera.read()
+                    if not ret:
+                        error = 'OpenCV 카메라에서 프레임을 읽을 수 없음'
+        except Exception as e:
+            error = f'카메라 초기화 실패: {e}'
+
+        with self._lock:
+            self.picam2, self.camera, self.backend = picam2, camera, backend
+            self.init_seconds = round(time.perf_counter() - started, 3)
+            if error is None:
+                self.state = 'ready'
+                self.ready_at = time.time()
+                print(f"✅ 카메라 초기화 성공 ({backend}, {self.init_seconds}s)")
+            else:
+                self.state = 'unavailable'
+                self.error = error
+                print(f"❌ {error}")
+        self._ready.set()
+
+    # 프레임 한 장 (RGB/BGR 원본) - 준비 전이면 None
+    def read(self):
+        self.ensure_started()
+        with self._lock:
+            if self.state != 'ready':
+                return None
+            if self.picam2 is not None:
+                frame = self.picam2.capture_array()
+                if frame is None or frame.size == 0:
+                    return self._mark_failed('Picamera2 프레임 캡처 실패')
+                return frame
+            if self.camera is not None:
+                success, frame = self.camera.read()
+                if not success or frame is None:
+                    return self._mark_failed('OpenCV 프레임 읽기 실패')
+                return frame
+            return None
+
+    def _mark_failed(self, error):
+        self.state = 'unavailable'
+        self.error = error
+        print(f"⚠️ {error}")
+        return None
+
+    def _release_locked(self):
+        try:
+            if self.picam2 is not None:
+                self.picam2.stop()
+                print("📹 Picamera2 리소스 해제")
+            if self.camera is not None:
+                self.camera.release()
+                print("📹 OpenCV 카메라 리소스 해제")
+        except Exception as e:
+            print(f"⚠️ 카메라 해제 오류: {e}")
+        self.picam2 = None
+        self.camera = None
+
+    def release(self):
+        with self._lock:
+            self._release_locked()
+            if self.state != 'initializing':
+                self.state = 'idle'
+
+    def status(self):
+        return {
+            'state': self.state,
+            'available': self.available,
+            'backend': self.backend,
+            'picamera2_available': self.picamera2_available,
+            'error': self.error,
+            'attempts': self.attempts,
+            'init_seconds': self.init_seconds,
+            'ready_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.ready_at)) if self.ready_at else None,
+        }
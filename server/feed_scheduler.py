@@ -0,0 +1,204 @@
+# feed_scheduler.py
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import metrics
+
+# 실행 중인 작업의 예정/시작 시각 (작업 스레드별) - current_run() 으로 조회
+_current = threading.local()
+
+LAG_SECONDS = metrics.histogram('feeder_scheduler_lag_seconds', 'Scheduled job start minus due time',
+                                buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+
+
+# 📌 'HH:MM' 기준 다음 실행 시각 (after 이후) 을 epoch 초로 계산
+# weekdays: 실행할 요일 (0=월 ... 6=일), None 이면 매일
+def next_daily_due(time_str, after=None, weekdays=None):
+    after = after if after is not None else time.time()
+    hour, minute = (int(x) for x in time_str.split(':'))
+    base = datetime.fromtimestamp(after)
+    due = base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if due.timestamp() <= after:
+        due += timedelta(days=1)
+    if weekdays:
+        while due.weekday() not in weekdays:
+            due += timedelta(days=1)
+    return due.timestamp()
+
+
+# 📌 지금 스레드에서 실행 중인 스케줄 작업의 {'due', 'started'} (epoch 초), 없으면 None
+def current_run():
+    return getattr(_current, 'run', None)
+
+
+class ScheduledJob:
+    def __init__(self, job_id, time_str, fn, name, weekdays=None):
+        self.id = job_id
+        self.time_str = time_str
+        self.weekdays = frozenset(weekdays) if weekdays else None
+        self.fn = fn
+        self.name = name
+        self.next_due = None
+        self.runs = 0
+        self.last_lag = None
+        self.running = False
+
+
+# 📌 데드라인 기반 스케줄러
+# - 다음 실행 시각까지 잠들고, 스케줄 추가/삭제 시 바로 깨어남
+# - 실행 시각이 된 작업은 스레드 풀로 넘겨서 스케줄러 루프는 막히지 않음
+#   (스레드 풀은 start() 마다 새로 만들고 stop() 에서 닫음 - 멈춘 뒤 다시 start() 가능)
+# - 작업별 지연(실제 시작 - 예정 시각)을 기록
+class FeedScheduler:
+    def __init__(self, max_workers=4, lag_history=200):
+        self._cond = threading.Condition()
+        self._heap = []  # (due, seq, job_id)
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._max_workers = max_workers
+        self._executor = None
+        self._lags = deque(maxlen=lag_history)
+        self._thread = None
+        self._stopped = False
+
+    def _push(self, job, due):
+        job.next_due = due
+        heapq.heappush(self._heap, (due, next(self._seq), job.id))
+
+    # 매일 (또는 weekdays 요일마다) time_str 에 fn 실행 - job_id 반환
+    def add_daily(self, time_str, fn, name=None, weekdays=None):
+        with self._cond:
+            job = ScheduledJob(next(self._ids), time_str, fn, name or time_str, weekdays)
+            self._jobs[job.id] = job
+            self._push(job, next_daily_due(time_str, weekdays=job.weekdays))
+            self._cond.notify()
+        return job.id
+
+    # due (epoch 초) 에 fn 을 한 번만 실행 - job_id 반환
+    def add_once(self, due, fn, name=None):
+        with self._cond:
+            job = ScheduledJob(next(self._ids), None, fn, name or 'once')
+            self._jobs[job.id] = job
+            self._push(job, due)
+            self._cond.notify()
+        return job.id
+
+    def cancel(self, job_id):
+        with self._cond:
+            # 힙에 남은 항목은 꺼낼 때 무시됨
+            removed = self._jobs.pop(job_id, None) is not None
+            self._cond.notify()
+        return removed
+
+    def next_run(self, job_id):
+        job = self._jobs.get(job_id)
+        return job.next_due if job else None
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopped = False
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='feed-job')
+                self._thread = threading.Thread(target=self._run, args=(self._executor,),
+                                                daemon=True, name='feed-scheduler')
+                self._thread.start()
+
+    # 멈춘 동안 추가된 작업은 남아 있다가 다음 start() 때 실행 (지난 시각이면 바로)
+    def stop(self, wait=False):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+        if thread is not None:
+            thread.join()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run(self, executor):
+        print("🚀 스케줄러 시작")
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    # 취소되었거나 이미 다시 잡힌 항목 정리
+                    while self._heap:
+                        due, _, job_id = self._heap[0]
+                        job = self._jobs.get(job_id)
+                        if job is not None and job.next_due == due:
+                            break
+                        heapq.heappop(self._heap)
+
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(timeout=delay)
+
+                if self._stopped:
+                    break
+
+                due, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs[job_id]
+                if job.time_str is None:
+                    # add_once 작업은 실행 후 제거
+                    del self._jobs[job_id]
+                else:
+                    # 다음 실행 예약 (다음 날 또는 다음 해당 요일)
+                    self._push(job, next_daily_due(job.time_str, after=due + 1, weekdays=job.weekdays))
+
+            executor.submit(self._execute, job, due)
+
+    def _execute(self, job, due):
+        started = time.time()
+        lag = started - due
+        LAG_SECONDS.observe(max(0.0, lag))
+        with self._cond:
+            job.last_lag = lag
+            job.runs += 1
+            job.running = True
+            self._lags.append({
+                'job': job.name,
+                'due': datetime.fromtimestamp(due).strftime('%Y-%m-%d %H:%M:%S'),
+                'lag_ms': round(lag * 1000, 1),
+            })
+        _current.run = {'due': due, 'started': started}
+        try:
+            job.fn()
+        except Exception as e:
+            print(f"💥 스케줄 작업 오류 ({job.name}): {e}")
+        finally:
+            _current.run = None
+            job.running = False
+
+    # 📌 스케줄링 지연 통계
+    def stats(self):
+        with self._cond:
+            lags = sorted(item['lag_ms'] for item in self._lags)
+            jobs = [{
+                'name': job.name,
+                'time': job.time_str,
+                'weekdays': sorted(job.weekdays) if job.weekdays else None,
+                'next_due': datetime.fromtimestamp(job.next_due).strftime('%Y-%m-%d %H:%M:%S'),
+                'runs': job.runs,
+                'running': job.running,
+                'last_lag_ms': round(job.last_lag * 1000, 1) if job.last_lag is not None else None,
+            } for job in self._jobs.values()]
+            recent = list(self._lags)[-20:]
+
+        summary = {'count': len(lags)}
+        if lags:
+            summary.update({
+                'mean_ms': round(sum(lags) / len(lags), 1),
+                'p50_ms': lags[len(lags) // 2],
+                'p95_ms': lags[min(len(lags) - 1, int(len(lags) * 0.95))],
+                'max_ms': lags[-1],
+            })
+        return {'jobs': jobs, 'lag': summary, 'recent': recent}
@@ -0,0 +1,164 @@
+# feeder_client.py
+import base64
+import json
+import os
+import socket
+import subprocess
+import threading
+
+FEEDER_SOCKET = os.environ.get('FEEDER_SOCKET', '/tmp/auto_feeder.sock')
+FEEDER_MAIN = os.environ.get('FEEDER_MAIN', 'main.py')
+FEED_TIMEOUT = 120
+INTAKE_TIMEOUT = 3600  # 섭취 판단 (두 번째 줄) 을 기다리는 최대 시간 (초)
+
+# 데몬이 없을 때 main.py 는 한 번에 하나만 (카메라, GPIO, HX711 을 각자 열기 때문)
+_subprocess_lock = threading.Lock()
+
+
+# 📌 상주 급식 데몬(feeder_daemon.py)에 요청 한 줄 보내고 응답 한 줄 받기
+# on_follow_up: 응답에 "follows": N 이 있으면 이어지는 N 줄을 백그라운드 스레드에서 받아서 한 줄씩 호출
+def send_request(req, timeout, on_follow_up=None, follow_up_timeout=INTAKE_TIMEOUT):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(FEEDER_SOCKET)
+        sock.sendall((json.dumps(req, ensure_ascii=False) + '\n').encode('utf-8'))
+        f = sock.makefile('r', encoding='utf-8')
+        line = f.readline()
+        if not line:
+            raise ConnectionError('급식 데몬이 응답 없이 연결을 닫음')
+        response = json.loads(line)
+    except BaseException:
+        sock.close()
+        raise
+
+    if on_follow_up is not None and response.get('follows'):
+        threading.Thread(target=_read_follow_up,
+                         args=(sock, f, int(response['follows']), follow_up_timeout, on_follow_up),
+                         daemon=True, name='feeder-follow-up').start()
+    else:
+        f.close()
+        sock.close()
+    return response
+
+
+def _read_follow_up(sock, f, count, timeout, callback):
+    try:
+        sock.settimeout(timeout)
+        for _ in range(count):
+            line = f.readline()
+            if not line:
+                print("⚠️ 급식 데몬이 후속 응답 없이 연결을 닫음")
+                break
+            callback(json.loads(line))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 후속 응답 수신 실패: {e}")
+    except Exception as e:
+        print(f"💥 후속 응답 처리 오류: {e}")
+    finally:
+        f.close()
+        sock.close()
+
+
+def ping(timeout=2.0):
+    return send_request({'op': 'ping'}, timeout)
+
+
+# 📌 데몬 쪽 메트릭 (Prometheus 텍스트) - 데몬이 없으면 None
+def fetch_metrics(timeout=0.5):
+    try:
+        response = send_request({'op': 'metrics'}, timeout)
+    except (OSError, ValueError):
+        return None
+    return response.get('text') if response.get('ok') else None
+
+
+# 📌 강아지 등록 / 목록 / 삭제 - 식별 인덱스는 데몬이 들고 있으므로 데몬이 꼭 있어야 함
+# images: JPEG/PNG 바이트 목록 (데몬이 사진에서 가장 큰 검출 영역을 잘라서 등록)
+def enroll_dog(dog, images, timeout=60.0):
+    req = {'op': 'enroll', 'dog': dog,
+           'images': [base64.b64encode(image).decode('ascii') for image in images]}
+    return send_request(req, timeout)
+
+
+def list_dogs(timeout=2.0):
+    return send_request({'op': 'dogs'}, timeout)
+
+
+def forget_dog(dog, timeout=5.0):
+    return send_request({'op': 'forget', 'dog': dog}, timeout)
+
+
+# 📌 데몬이 없을 때: 예전처럼 main.py를 한 번 실행 - 같은 시각 급식은 순서대로
+def run_subprocess(dog, voice, amount, timeout, trace=False):
+    if not _subprocess_lock.acquire(blocking=False):
+        print(f"⏳ 다른 급식(main.py) 이 끝나기를 기다림 ({dog})")
+        _subprocess_lock.acquire()
+    try:
+        return _run_main(dog, voice, amount, timeout, trace)
+    finally:
+        _subprocess_lock.release()
+
+
+def _run_main(dog, voice, amount, timeout, trace):
+    cmd = [
+        'python3', FEEDER_MAIN,
+        '--dog', dog,
+        '--voice', voice,
+        '--amount', str(amount)
+    ]
+    if trace:
+        cmd.append('--trace')
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'status': 'timeout', 'error': f'{timeout}초 안에 급식이 끝나지 않음'}
+
+    # main.py 는 마지막 줄에 결과 JSON 을 출력함
+    lines = result.stdout.strip().splitlines()
+    if lines:
+        try:
+            return json.loads(lines[-1])
+        except ValueError:
+            pass
+    if result.returncode == 0:
+        return {'status': 'completed'}
+    return {'status': 'error', 'error': result.stderr.strip()[-500:]}
+
+
+# 📌 급식 요청 - 데몬 우선, 실패 시 subprocess
+# trace=True 면 급식기 쪽에서 Chrome trace 를 남기고 result['trace'] 에 파일 경로를 돌려줌
+# on_intake(intake): 데몬이 급식 후 그릇을 지켜보고 섭취 여부를 판단하면 호출 (subprocess 는 판단 안 함)
+# on_clip(clip): 급식 클립 저장이 끝나면 {'status': 'written' | 'failed' | 'dropped', 'name', ...} 로 호출
+#   (subprocess 는 main.py 가 클립을 기다렸다가 결과에 clip / clip_status 를 바로 넣음)
+def request_feeding(dog, voice, amount, timeout=FEED_TIMEOUT, trace=False, on_intake=None, on_clip=None):
+    req = {'op': 'feed', 'dog': dog, 'voice': voice, 'amount': amount, 'timeout': timeout}
+    if trace:
+        req['trace'] = True
+    callbacks = {'intake': on_intake, 'clip': on_clip}
+    for op, callback in callbacks.items():
+        if callback is not None:
+            req[op] = True
+
+    def on_follow_up(message):
+        callback = callbacks.get(message.get('op'))
+        if callback is not None:
+            callback(message)
+
+    try:
+        # 데몬 쪽에서 대기열에 있을 수 있으므로 여유를 둠
+        result = send_request(req, timeout * 2 + 30,
+                              on_follow_up=on_follow_up if on_intake or on_clip else None)
+        result['via'] = 'daemon'
+        return result
+    except (FileNotFoundError, ConnectionRefusedError):
+        print("⚠️ 급식 데몬 없음 - main.py 직접 실행")
+    except socket.timeout:
+        # 데몬이 급식 중일 수 있으므로 main.py 를 또 돌리지 않고 실패로 기록
+        return {'status': 'timeout', 'via': 'daemon', 'error': f'{timeout * 2 + 30}초 동안 급식 데몬 응답 없음'}
+    except (OSError, ValueError) as e:
+        # 연결 끊김, 깨진 응답 줄 등 - 이력에 남도록 결과로 돌려줌
+        return {'status': 'error', 'via': 'daemon', 'error': f'급식 데몬 통신 실패: {e}'}
+    result = run_subprocess(dog, voice, amount, timeout, trace=trace)
+    result['via'] = 'subprocess'
+    return result
@@ -1,133 +1,102 @@
-from flask import Flask, request, jsonify
-import schedule
 import time
-import threading
-import subprocess
+SERVER_IMPORT_STARTED = time.perf_counter()  # 부팅 시간 측정 기준
+
+from flask import Flask, request, jsonify
 import os
-import json
+import sys
+import uuid
 from datetime import datetime
 
-import cv2
-from flask import Response
+from flask import Response, send_from_directory
 import atexit
+import threading
 
-# 라즈베리파이 카메라 지원
-try:
-    from picamera2 import Picamera2
-    PICAMERA_AVAILABLE = True
-    print("✅ Picamera2 사용 가능")
-except ImportError:
-    PICAMERA_AVAILABLE = False
-    print("⚠️ Picamera2 없음 - OpenCV 사용")
+# hardware/ 폴더의 공용 모듈 (음성 캐시, 메트릭 등) - 다른 위치면 FEEDER_HARDWARE_DIR 로 지정
+HARDWARE_DIR = os.path.abspath(os.environ.get(
+    'FEEDER_HARDWARE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hardware')))
+sys.path.append(HARDWARE_DIR)
+import metrics
+import tracing
+import telemetry
+from voice_cache import decode_voice, cache_path_for
+
+from frame_broadcaster import FrameBroadcaster
+from feeder_client import request_feeding, fetch_metrics, enroll_dog, list_dogs, forget_dog
+from history_store import HistoryStore
+from feed_scheduler import FeedScheduler, current_run
+from schedule_registry import ScheduleRegistry
+from camera_manager import CameraManager
+from trace_store import TraceStore
 
 app = Flask(__name__)
-jobs = []  # 여러 개 스케줄 저장용
+scheduler = FeedScheduler(max_workers=4)  # 같은 시각 급식도 동시에 시작
 SCHEDULE_FILE = 'saved_schedules.json'
-HISTORY_FILE = 'feeding_history.json'  # 급식 이력 저장
-
-# 카메라 초기화 및 에러 처리 개선
-camera = None
-picam2 = None
-camera_available = False
+HISTORY_FILE = 'feeding_history.json'  # 예전 급식 이력 (최초 1회 DB로 가져옴)
+HISTORY_DB = 'feeding_history.db'  # 급식 이력 저장
+history_store = HistoryStore(HISTORY_DB, legacy_json=HISTORY_FILE)
 
-def init_camera():
-    global camera, picam2, camera_available, PICAMERA_AVAILABLE
-    try:
-        if PICAMERA_AVAILABLE:
-            # 라즈베리파이 카메라 사용
-            print("📷 Picamera2로 카메라 초기화 중...")
-            picam2 = Picamera2()
-            picam2.preview_configuration.main.size = (640, 480)
-            picam2.preview_configuration.main.format = "RGB888"
-            picam2.configure("preview")
-            picam2.start()
-            
-            # 테스트 프레임 캡처
-            frame = picam2.capture_array()
-            if frame is not None and frame.size > 0:
-                camera_available = True
-                print("✅ Picamera2 초기화 성공")
-            else:
-                camera_available = False
-                print("❌ Picamera2에서 프레임을 읽을 수 없음")
-        else:
-            # 백업: OpenCV 웹캠 사용
-            print("📷 OpenCV로 카메라 초기화 중...")
-            camera = cv2.VideoCapture(0)
-            if camera.isOpened():
-                camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                # 테스트 프레임 읽기
-                ret, frame = camera.read()
-                if ret:
-                    camera_available = True
-                    print("✅ OpenCV 카메라 초기화 성공")
-                else:
-                    camera_available = False
-                    print("❌ OpenCV 카메라에서 프레임을 읽을 수 없음")
-            else:
-                camera_available = False
-                print("❌ OpenCV 카메라를 열 수 없음")
-                
-    except Exception as e:
-        camera_available = False
-        print(f"❌ 카메라 초기화 실패: {e}")
+# 카메라 - 처음 프레임을 요청할 때 백그라운드에서 초기화 (cv2 / picamera2 import 포함)
+camera_manager = CameraManager(640, 480, settle_seconds=2.0)
 
-# 서버 시작시 카메라 초기화
-init_camera()
-
-# 카메라 해제 함수
 def release_camera():
-    global camera, picam2
-    try:
-        if picam2 is not None:
-            picam2.stop()
-            print("📹 Picamera2 리소스 해제")
-        if camera is not None:
-            camera.release()
-            print("📹 OpenCV 카메라 리소스 해제")
-    except Exception as e:
-        print(f"⚠️ 카메라 해제 오류: {e}")
+    camera_manager.release()
 
 atexit.register(release_camera)
 
 # 📌 급식 이력 저장 함수
-def save_feeding_history(dog, time_str, voice, amount, status='completed'):
-    history_data = []
-    if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history_data = json.load(f)
-        except:
-            history_data = []
-    
-    # 새 이력 추가
+def save_feeding_history(dog, time_str, voice, amount, status='completed', result=None):
     new_record = {
         'dog': dog,
         'time': time_str,
         'voice': voice,
         'amount': amount,
-        'status': status,  # 'scheduled' 또는 'completed'
+        'status': status,  # 'scheduled', 'completed', 'no_dog', 'no_weight', 'timeout', 'error'
         'datetime': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
-    history_data.append(new_record)
-    print(f"📝 급식 이력 저장: {new_record}")
-    
-    # 최근 100개만 유지
-    if len(history_data) > 100:
-        history_data = history_data[-100:]
-    
-    # 파일에 저장
+    if result:
+        # 급식 데몬이 돌려준 실제 결과 (최종 무게, 소요 시간 등)
+        for key in ('weight', 'duration', 'detected_after', 'error', 'trace', 'clip', 'clip_status'):
+            if result.get(key) is not None:
+                new_record[key] = result[key]
+
     try:
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history_data, f, ensure_ascii=False, indent=2)
-        print(f"✅ 급식 이력 파일 저장 완료 (총 {len(history_data)}개)")
+        new_record['id'] = history_store.append(new_record)
+        print(f"📝 급식 이력 저장: {new_record}")
     except Exception as e:
         print(f"❌ 급식 이력 저장 실패: {e}")
+    return new_record
+
+# 📌 섭취 판단 결과를 급식 이력에 기록
+# intake: 'eaten' (다 먹음) / 'partial' (남김) / 'not_eaten' (안 먹음) / 'unknown' (그릇을 치움 등)
+def save_intake_result(record_id, intake):
+    fields = {
+        'intake': intake.get('outcome', 'unknown'),
+        'eaten': intake.get('eaten_g'),
+        'leftover': intake.get('leftover_g'),
+    }
+    try:
+        if history_store.update(record_id, fields) is None:
+            print(f"⚠️ 섭취 판단을 기록할 이력이 없음 (id {record_id})")
+        else:
+            print(f"🍽️ 섭취 판단 기록 (id {record_id}): {fields}")
+    except Exception as e:
+        print(f"❌ 섭취 판단 기록 실패: {e}")
+
+# 📌 클립 저장 결과를 급식 이력에 기록 - 파일이 실제로 저장된 경우에만 'clip' (파일 이름) 을 남김
+# clip_status: 'pending' (저장 중) / 'written' / 'failed' / 'dropped' (인코더 대기열이 가득 참)
+def save_clip_result(record_id, clip):
+    fields = {'clip_status': clip.get('status', 'failed')}
+    if fields['clip_status'] == 'written':
+        fields['clip'] = clip.get('name')
+    try:
+        if history_store.update(record_id, fields) is None:
+            print(f"⚠️ 클립 결과를 기록할 이력이 없음 (id {record_id})")
+    except Exception as e:
+        print(f"❌ 클립 결과 기록 실패: {e}")
 
 # 📌 테스트용 급식 이력 생성 함수
 def create_sample_history():
-    if not os.path.exists(HISTORY_FILE):
+    if history_store.count() == 0:
         sample_data = [
             {
                 'dog': '초코',
@@ -156,194 +125,254 @@ def create_sample_history():
         ]
         
         try:
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(sample_data, f, ensure_ascii=False, indent=2)
+            for record in sample_data:
+                history_store.append(record)
             print(f"✅ 샘플 급식 이력 생성 완료 ({len(sample_data)}개)")
         except Exception as e:
             print(f"❌ 샘플 데이터 생성 실패: {e}")
 
-# 📌 카메라 프레임 생성 함수 (Picamera2 지원)
-def generate_frames():
-    global camera, picam2, camera_available, PICAMERA_AVAILABLE
-    
-    frame_count = 0
-    
-    while True:
-        if not camera_available:
-            # 카메라가 없을 때 더미 이미지 반환
-            import numpy as np
-            dummy_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            
-            # 현재 시간 텍스트 추가
-            current_time = datetime.now().strftime('%H:%M:%S')
-            cv2.putText(dummy_frame, 'Camera Not Available', (150, 200), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            cv2.putText(dummy_frame, f'Time: {current_time}', (180, 250), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
-            cv2.putText(dummy_frame, 'Check Camera Connection', (120, 300), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (150, 150, 150), 2)
-            
-            ret, buffer = cv2.imencode('.jpg', dummy_frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(1)  # 1초 간격으로 더미 프레임 전송
-            
-        else:
-            try:
-                if PICAMERA_AVAILABLE and picam2 is not None:
-                    # Picamera2 사용
-                    frame = picam2.capture_array()
-                    if frame is not None and frame.size > 0:
-                        # RGB to BGR 변환 (OpenCV 형식)
-                        frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                        
-                        # 프레임 번호 추가 (선택사항)
-                        cv2.putText(frame_bgr, f'Frame: {frame_count}', (10, 30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        
-                        ret, buffer = cv2.imencode('.jpg', frame_bgr)
-                        if ret:
-                            frame_bytes = buffer.tobytes()
-                            yield (b'--frame\r\n'
-                                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                        frame_count += 1
-                        time.sleep(0.033)  # ~30 FPS
-                    else:
-                        print("⚠️ Picamera2 프레임 캡처 실패")
-                        camera_available = False
-                        
-                elif camera is not None:
-                    # OpenCV 사용
-                    success, frame = camera.read()
-                    if success and frame is not None:
-                        # 프레임 번호 추가 (선택사항)
-                        cv2.putText(frame, f'Frame: {frame_count}', (10, 30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        
-                        ret, buffer = cv2.imencode('.jpg', frame)
-                        if ret:
-                            frame_bytes = buffer.tobytes()
-                            yield (b'--frame\r\n'
-                                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                        frame_count += 1
-                        time.sleep(0.033)  # ~30 FPS
-                    else:
-                        print("⚠️ OpenCV 프레임 읽기 실패")
-                        camera_available = False
-                else:
-                    print("❌ 사용 가능한 카메라가 없음")
-                    camera_available = False
-                    
-            except Exception as e:
-                print(f"❌ 프레임 생성 오류: {e}")
-                camera_available = False
-                time.sleep(1)
+# 📌 카메라가 없을 때 보낼 더미 프레임
+def make_unavailable_frame():
+    import numpy as np
+    import cv2
+    dummy_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    # 현재 시간 텍스트 추가
+    current_time = datetime.now().strftime('%H:%M:%S')
+    if camera_manager.state == 'initializing':
+        cv2.putText(dummy_frame, 'Camera Starting...', (170, 200),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    else:
+        cv2.putText(dummy_frame, 'Camera Not Available', (150, 200), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    cv2.putText(dummy_frame, f'Time: {current_time}', (180, 250), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
+    cv2.putText(dummy_frame, 'Check Camera Connection', (120, 300), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.8, (150, 150, 150), 2)
+    return dummy_frame
+
+# 📌 카메라에서 프레임 한 장 캡처 (Picamera2 지원) - 브로드캐스터 스레드에서만 호출
+capture_count = 0
+CAPTURE_SECONDS = metrics.histogram('feeder_camera_capture_seconds', 'Camera frame read time (server)')
+
+def capture_frame():
+    global capture_count
+
+    try:
+        with CAPTURE_SECONDS.time():
+            frame = camera_manager.read()
+    except Exception as e:
+        print(f"❌ 프레임 생성 오류: {e}")
+        return None
+    if frame is None:
+        return None
+
+    import cv2
+    if camera_manager.backend == 'picamera2':
+        # RGB to BGR 변환 (OpenCV 형식)
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+    # 프레임 번호 추가 (선택사항)
+    cv2.putText(frame, f'Frame: {capture_count}', (10, 30), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    capture_count += 1
+    return frame
+
+# 모든 /video_feed 클라이언트가 공유하는 캡처 스레드 (~30 FPS)
+broadcaster = FrameBroadcaster(capture_frame, fallback_fn=make_unavailable_frame, fps=30)
+
+# /snapshot.jpg 가 캐시된 프레임을 재사용하는 최대 시간 (초)
+SNAPSHOT_MAX_AGE = float(os.environ.get('SNAPSHOT_MAX_AGE', '2.0'))
+
+# 📌 카메라 프레임 생성 함수 - 공유 슬롯에서 최신 프레임만 읽음
+def generate_frames(width=None, quality=None, fps=None, client=None):
+    return broadcaster.stream(width=width, quality=quality, fps=fps, client=client)
+
+# 📌 /video_feed 파라미터 범위 제한 (flask, serve.py 공용)
+def clamp_stream_params(width=None, quality=None, fps=None):
+    if width is not None:
+        width = max(80, min(width, 1920))
+    if quality is not None:
+        quality = max(10, min(quality, 95))
+    if fps is not None:
+        fps = max(1.0, min(fps, 30.0))
+    return width, quality, fps
 
 # 📌 스케줄 실행 스레드
 def run_scheduler():
-    print("🚀 스케줄러 시작")
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    scheduler.start()
+
+# FEEDER_TRACE=1 이면 급식마다 Chrome trace 기록 (최근 FEEDER_TRACE_KEEP 개, /traces 로 조회)
+TRACE_DIR = 'traces'
+trace_store = TraceStore(TRACE_DIR) if tracing.ENABLED else None
+
+# 급식 데몬이 기록하는 무게/거리 링 파일 (읽기 전용으로 열어 둠) - FEEDER_TELEMETRY_DIR
+telemetry_rings = {}
+telemetry_lock = threading.Lock()
+
+def get_telemetry(name):
+    with telemetry_lock:
+        ring = telemetry_rings.get(name)
+        if ring is None:
+            try:
+                ring = telemetry_rings[name] = telemetry.open_series(name, readonly=True)
+            except (OSError, ValueError):
+                return None  # 데몬이 아직 만들지 않음
+        return ring
+
+# 급식 데몬이 남기는 이벤트 클립 (검출 전후 몇 초, mp4) - hardware/clip_recorder.py 의 CLIP_DIR 과 같은 값
+# (clip_recorder 는 cv2 를 불러오므로 부팅 시간을 위해 경로만 직접 읽음)
+CLIP_DIR = os.environ.get('FEEDER_CLIP_DIR', '/home/pi/auto_feeder/clips')
+
+FEEDINGS = metrics.counter('feeder_feedings_total', 'Scheduled feedings by outcome', ['status', 'via'])
+FEEDING_SECONDS = metrics.histogram('feeder_feeding_seconds', 'Scheduled feeding round trip (request to result)')
+
+# 📌 스케줄 시각에 실행할 급식 작업
+def make_feed_task(entry):
+    dog, time_str, voice, amount = entry['dog'], entry['time'], entry['voice'], entry['amount']
 
-# 📌 스케줄 등록 내부 함수
-def set_schedule_internal(dog, time_str, voice, amount):
     def run_main():
         print(f"🍽️ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {dog} 급식 시작")
         try:
-            result = subprocess.run([
-                'python3', 'main.py',
-                '--dog', dog,
-                '--voice', voice,
-                '--amount', str(amount)
-            ],capture_output=True, text=True, timeout=120)
-            if result.returncode == 0:
-                print(f"✅ {dog} 급식 완료")
-                # 급식 성공 시 이력 저장 (완료 상태로)
-                save_feeding_history(dog, time_str, voice, amount, status='completed')
+            trace = tracing.Trace('scheduled_feeding', dog=dog, time=time_str, amount=amount,
+                                  datetime=datetime.now().strftime('%Y-%m-%d %H:%M:%S')) if trace_store else None
+            run = current_run()
+            if trace is not None and run is not None:
+                # 예정 시각 → 실제 시작까지의 스케줄러 지연
+                lag = max(0.0, run['started'] - run['due'])
+                trace.complete('scheduler.lag', trace.started - lag * 1e6, lag * 1e6, cat='scheduler')
+
+            # 급식 후 클립 저장 결과 (몇 초 뒤) 와 섭취 판단 (몇 분 뒤) 은 나중에 도착
+            # - 이력이 저장된 다음에 그 레코드를 갱신
+            saved = threading.Event()
+            record = {}
+
+            def after_saved(save):
+                def callback(message):
+                    if not saved.wait(60) or record.get('id') is None:
+                        return
+                    save(record['id'], message)
+                return callback
+
+            on_intake = after_saved(save_intake_result)
+            on_clip = after_saved(save_clip_result)
+
+            started = time.perf_counter()
+            if trace is not None:
+                with trace.span('request_feeding', cat='ipc'):
+                    result = request_feeding(dog, voice, amount, trace=True, on_intake=on_intake, on_clip=on_clip)
+            else:
+                result = request_feeding(dog, voice, amount, on_intake=on_intake, on_clip=on_clip)
+            status = result.get('status', 'error')
+            FEEDING_SECONDS.observe(time.perf_counter() - started)
+            FEEDINGS.labels(status, result.get('via', 'unknown')).inc()
+            if trace is not None:
+                trace.args.update(status=status, via=result.get('via'))
+                trace_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+                trace_store.add(trace_id, trace, feeder_trace_path=result.get('trace'))
+                result['trace'] = trace_id
+            if status == 'completed':
+                print(f"✅ {dog} 급식 완료 ({result.get('via')})")
             else:
-                print(f"❌ 급식 실패: {result.stderr}")
+                print(f"❌ 급식 실패: {result}")
+            # 실제 급식 결과로 이력 저장
+            record.update(save_feeding_history(dog, time_str, voice, amount, status=status, result=result))
+            saved.set()
         except Exception as e:
             print(f"💥 실행 오류: {e}")
+    return run_main
 
-    job = schedule.every().day.at(time_str).do(run_main)
-    jobs.append({
-        'dog': dog,
-        'time': time_str,
-        'voice': voice,
-        'amount': amount,
-        'job': job
-    })
+# (강아지, 시간) 키 스케줄 저장소 - 변경은 1초 단위로 모아서 저장
+schedules = ScheduleRegistry(SCHEDULE_FILE, scheduler, make_feed_task, flush_delay=1.0)
+
+# 📌 스케줄 등록 내부 함수 - 같은 (강아지, 시간) 은 덮어씀
+def set_schedule_internal(dog, time_str, voice, amount, days=None):
+    return schedules.upsert({'dog': dog, 'time': time_str, 'voice': voice, 'amount': amount, 'days': days})
 
 # 📌 저장된 스케줄을 불러오기
 def load_schedules():
-    if os.path.exists(SCHEDULE_FILE):
-        try:
-            with open(SCHEDULE_FILE, 'r', encoding='utf-8') as f:
-                saved = json.load(f)
-                for item in saved:
-                    set_schedule_internal(item['dog'], item['time'], item['voice'], item['amount'])
-            print(f"✅ {len(saved)}개 스케줄 복원 완료")
-        except Exception as e:
-            print(f"❌ 스케줄 복원 실패: {e}")
-
-# 📌 현재 스케줄을 저장
-def save_schedules():
-    save_data = [
-        {k: v for k, v in item.items() if k != 'job'}
-        for item in jobs
-    ]
-    with open(SCHEDULE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(save_data, f, ensure_ascii=False, indent=2)
-
-# 📌 스케줄 등록 API
+    try:
+        count = schedules.load()
+        print(f"✅ {count}개 스케줄 복원 완료")
+    except Exception as e:
+        print(f"❌ 스케줄 복원 실패: {e}")
+
+# 📌 스케줄 등록 API (같은 강아지/시간이면 수정)
+# days: 생략 또는 'daily' 면 매일, 'weekdays' / 'weekends' / ['mon', 'wed', 'fri']
 @app.route('/set-schedule', methods=['POST'])
 def set_schedule():
     try:
         data = request.get_json()
-        dog = data['dog']
-        time_str = data['time']
-        voice = data['voice']
-        amount = data['amount']
+        entry, created = schedules.upsert(data)
 
-        set_schedule_internal(dog, time_str, voice, amount)
-        save_schedules()
-        
         # 스케줄 추가와 동시에 급식 이력에도 저장 (예정 상태로)
-        save_feeding_history(dog, time_str, voice, amount, status='scheduled')
+        save_feeding_history(entry['dog'], entry['time'], entry['voice'], entry['amount'], status='scheduled')
 
-        return jsonify({'status': '스케줄 등록 완료'}), 200
+        return jsonify({'status': '스케줄 등록 완료' if created else '스케줄 수정 완료',
+                        'schedule': entry}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# 📌 스케줄 목록 조회
+# 📌 스케줄 목록 조회 (?dog= 또는 ?time= 으로 필터)
 @app.route('/schedules', methods=['GET'])
 def get_schedules():
-    return jsonify([
-        {k: v for k, v in item.items() if k != 'job'}
-        for item in jobs
-    ])
+    dog = request.args.get('dog')
+    time_str = request.args.get('time')
+    if dog and time_str:
+        entry = schedules.get(dog, time_str)
+        return jsonify([entry] if entry else [])
+    if dog:
+        return jsonify(schedules.for_dog(dog))
+    if time_str:
+        return jsonify(schedules.at_time(time_str))
+    return jsonify(schedules.all())
+
+# 📌 한 강아지의 스케줄 전체 교체 (body: 스케줄 목록, 빈 목록이면 전체 삭제)
+@app.route('/schedules/<dog>', methods=['PUT'])
+def replace_dog_schedules(dog):
+    try:
+        items = request.get_json()
+        if not isinstance(items, list):
+            return jsonify({'error': '스케줄 목록(JSON 배열)이 필요합니다'}), 400
+        entries = schedules.replace_dog(dog, items)
+        return jsonify({'status': '교체 완료', 'dog': dog, 'count': len(entries)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 📌 스케줄 내보내기 (백업 / 다른 기기로 옮기기)
+@app.route('/schedules/export', methods=['GET'])
+def export_schedules():
+    response = jsonify(schedules.export())
+    response.headers['Content-Disposition'] = 'attachment; filename=schedules.json'
+    return response
+
+# 📌 스케줄 가져오기 - body: 목록 또는 {"schedules": [...], "replace": true}
+@app.route('/schedules/import', methods=['POST'])
+def import_schedules():
+    try:
+        data = request.get_json()
+        replace = False
+        if isinstance(data, dict):
+            replace = bool(data.get('replace', False))
+            data = data.get('schedules')
+        if not isinstance(data, list):
+            return jsonify({'error': '스케줄 목록(JSON 배열)이 필요합니다'}), 400
+        entries = schedules.import_entries(data, replace=replace)
+        return jsonify({'status': '가져오기 완료', 'count': len(entries), 'total': len(schedules)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 # 📌 스케줄 삭제
 @app.route('/delete-schedule', methods=['POST'])
 def delete_schedule():
     try:
         data = request.get_json()
-        dog = data['dog']
-        time_str = data['time']
-
-        # 조건에 맞는 항목 찾기
-        target = None
-        for job in jobs:
-            if job['dog'] == dog and job['time'] == time_str:
-                target = job
-                break
-
-        if target:
-            schedule.cancel_job(target['job'])
-            jobs.remove(target)
-            save_schedules()
+        if schedules.remove(data['dog'], data['time']):
             return jsonify({'status': '삭제 완료'}), 200
         else:
             return jsonify({'error': '해당 스케줄 없음'}), 404
@@ -351,43 +380,176 @@ def delete_schedule():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# 📌 음성 파일 업로드
+# 📌 음성 파일 업로드 - 업로드 시 한 번 디코딩 + 음량 정규화해서 PCM 캐시에 저장
+VOICE_EXTENSIONS = ('.mp3', '.m4a', '.aac', '.wav', '.ogg', '.opus', '.flac', '.amr', '.3gp')
+
 @app.route('/upload-voice', methods=['POST'])
 def upload_voice():
     try:
         file = request.files['file']
+        filename = os.path.basename(file.filename or '')
+        if not filename or filename.startswith('.') or not filename.lower().endswith(VOICE_EXTENSIONS):
+            return jsonify({'error': f'지원하지 않는 파일: {file.filename}'}), 400
+
         save_dir = os.path.join(os.getcwd(), "voices")
         os.makedirs(save_dir, exist_ok=True)
-        save_path = os.path.join(save_dir, file.filename)
+        save_path = os.path.join(save_dir, filename)
 
         print(f"🔹 저장할 파일 경로: {save_path}")  
 
         file.save(save_path)
-        return jsonify({'status': 'saved', 'filename': file.filename}), 200
+        try:
+            info = decode_voice(save_path, cache_path_for(save_dir, filename))
+        except ValueError as e:
+            os.remove(save_path)
+            return jsonify({'error': f'음성 파일을 읽을 수 없습니다: {e}'}), 400
+        except RuntimeError as e:
+            # ffmpeg 가 없으면 원본만 저장 (급식 시 처음 재생할 때 디코딩)
+            print(f"⚠️ 음성 캐시 생성 건너뜀: {e}")
+            return jsonify({'status': 'saved', 'filename': filename, 'cached': False}), 200
+        return jsonify({'status': 'saved', 'filename': filename, 'cached': True,
+                        'duration': info['duration']}), 200
     except Exception as e:
         print(f"❌ 업로드 실패: {e}")  
         return jsonify({'error': str(e)}), 500
 
 # 📌 카메라 스트리밍 엔드포인트 (개선된 버전)
+# ?width=320&quality=60&fps=10 - 약한 Wi-Fi 클라이언트용 저해상도/저화질/저프레임 스트림
 @app.route('/video_feed')
 def video_feed():
-    return Response(generate_frames(),
+    width = request.args.get('width', type=int)
+    quality = request.args.get('quality', type=int)
+    fps = request.args.get('fps', type=float)
+    width, quality, fps = clamp_stream_params(width, quality, fps)
+    return Response(generate_frames(width, quality, fps, client=request.remote_addr),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+# 📌 스냅샷 엔드포인트 - 앱 썸네일용 정지 이미지 (ETag / Last-Modified 로 304 응답)
+@app.route('/snapshot.jpg')
+def snapshot():
+    max_age = request.args.get('max_age', SNAPSHOT_MAX_AGE, type=float)
+    seq, jpeg, timestamp = broadcaster.snapshot(max_age=max(0.0, max_age))
+    if jpeg is None:
+        return jsonify({'error': '프레임을 가져올 수 없습니다'}), 503
+
+    response = Response(jpeg, mimetype='image/jpeg')
+    response.set_etag(f"{seq}-{int(timestamp * 1000)}")
+    response.last_modified = datetime.fromtimestamp(timestamp)
+    response.cache_control.max_age = int(max_age)
+    return response.make_conditional(request)
+
+# 📌 Prometheus 메트릭 - 서버 + 급식 데몬 (데몬이 없으면 서버 것만)
+@app.route('/metrics')
+def metrics_endpoint():
+    text = metrics.render()
+    daemon_text = fetch_metrics()
+    if daemon_text:
+        text += daemon_text
+    return Response(text, content_type=metrics.CONTENT_TYPE)
+
+# 📌 최근 급식 trace 목록 / 다운로드 (chrome://tracing, ui.perfetto.dev 에서 열기)
+@app.route('/traces')
+def list_traces():
+    if trace_store is None:
+        return jsonify({'enabled': False, 'traces': []})
+    return jsonify({'enabled': True, 'traces': trace_store.list()})
+
+@app.route('/traces/<trace_id>')
+def get_trace(trace_id):
+    if trace_store is None or trace_id not in trace_store:
+        return jsonify({'error': 'trace 없음'}), 404
+    with open(trace_store.path(trace_id), 'rb') as f:
+        return Response(f.read(), mimetype='application/json')
+
+# 📌 급식 이벤트 클립 - 급식 이력의 'clip' 값으로 요청 (Range 요청 지원)
+# 'clip' 은 clip_status 가 'written' 일 때만 있음. 저장 공간 한도를 넘으면 데몬이 오래된 클립부터 지우므로 그 뒤엔 404
+@app.route('/clips/<name>')
+def get_clip(name):
+    if not name.endswith('.mp4') or not os.path.isfile(os.path.join(CLIP_DIR, os.path.basename(name))):
+        return jsonify({'error': '클립 없음'}), 404
+    return send_from_directory(CLIP_DIR, name, mimetype='video/mp4', conditional=True, max_age=86400)
+
+# 📌 센서 기록 (무게 g / 거리 cm) - 앱 차트용
+@app.route('/telemetry')
+def list_telemetry():
+    series = {}
+    for name in telemetry.SERIES:
+        ring = get_telemetry(name)
+        series[name] = ring.stats() if ring is not None else None
+    return jsonify(series)
+
+# 쿼리: from/to (epoch 초) 또는 last (마지막 샘플 기준 최근 N초, 기본 3600), points (구간 수, 기본 300)
+# 응답 points: [[t, 평균, 최소, 최대], ...] - 요청 범위만 읽어서 구간별로 줄임
+@app.route('/telemetry/<name>')
+def get_telemetry_series(name):
+    if name not in telemetry.SERIES:
+        return jsonify({'error': f'알 수 없는 센서: {name}'}), 404
+    ring = get_telemetry(name)
+    if ring is None or ring.latest() is None:
+        return jsonify({'error': '기록 없음'}), 404
+
+    points = max(10, min(request.args.get('points', 300, type=int), 2000))
+    end = request.args.get('to', type=float)
+    start = request.args.get('from', type=float)
+    if start is None:
+        last = request.args.get('last', 3600, type=float)
+        start = (end if end is not None else ring.latest()[0]) - last
+    buckets = ring.downsample(start, end, points=points)
+    return jsonify({
+        'name': name,
+        'unit': ring.unit,
+        'from': start,
+        'to': end,
+        'samples': int(buckets['count'].sum()),
+        'points': telemetry.downsample_json(buckets),
+    })
+
+# 📌 강아지 식별 - 등록된 강아지의 급식은 그 강아지가 왔을 때만 열림
+# 데몬에 요청을 넘김 (데몬이 없으면 503)
+def daemon_response(call, *args):
+    try:
+        response = call(*args)
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'급식 데몬에 연결할 수 없습니다: {e}'}), 503
+    return jsonify(response), 200 if response.pop('ok', False) else 400
+
+@app.route('/dogs')
+def get_dogs():
+    return daemon_response(list_dogs)
+
+# multipart 'images' (여러 장 가능) - 사진이 많을수록 (각도/조명) 식별이 안정적
+@app.route('/dogs/<dog>/enroll', methods=['POST'])
+def enroll_dog_photos(dog):
+    images = [file.read() for file in request.files.getlist('images')]
+    images = [image for image in images if image]
+    if not images:
+        return jsonify({'error': '사진(images)이 없습니다'}), 400
+    return daemon_response(enroll_dog, dog, images)
+
+@app.route('/dogs/<dog>', methods=['DELETE'])
+def delete_dog(dog):
+    return daemon_response(forget_dog, dog)
+
+# 📌 스트림별 전송 통계 (실효 fps, bytes/s, 건너뛴 프레임)
+@app.route('/stream-stats')
+def stream_stats():
+    return jsonify({
+        'clients': broadcaster.client_count,
+        'streams': broadcaster.stream_stats(),
+    })
+
 # 📌 카메라 상태 확인 엔드포인트
+# state: idle (아직 사용 안 함) / initializing / ready / unavailable
 @app.route('/camera-status')
 def camera_status():
-    global camera_available, picam2, camera, PICAMERA_AVAILABLE
-    
-    status_info = {
-        'available': camera_available,
-        'picamera2_available': PICAMERA_AVAILABLE,
-        'picam2_active': picam2 is not None,
-        'opencv_camera_active': camera is not None,
-        'message': '카메라 사용 가능' if camera_available else '카메라 사용 불가'
-    }
+    status_info = camera_manager.status()
+    status_info['message'] = {
+        'idle': '카메라 대기 중 (첫 요청 시 초기화)',
+        'initializing': '카메라 초기화 중',
+        'ready': '카메라 사용 가능',
+    }.get(status_info['state'], '카메라 사용 불가')
     
-    if not camera_available:
+    if status_info['state'] == 'unavailable':
         status_info['troubleshooting'] = [
             "1. 카메라 케이블 연결 확인",
             "2. 'sudo raspi-config'에서 카메라 활성화",
@@ -397,22 +559,16 @@ def camera_status():
     
     return jsonify(status_info)
 
-# 📌 카메라 재초기화 엔드포인트
+# 📌 카메라 재초기화 엔드포인트 - 백그라운드에서 진행, 결과는 /camera-status 로 확인
 @app.route('/reinit-camera', methods=['POST'])
 def reinit_camera():
     try:
-        # 기존 카메라 해제
-        release_camera()
-        time.sleep(2)  # 2초 대기
-        
-        # 카메라 재초기화
-        init_camera()
-        
+        started = camera_manager.reinit()
         return jsonify({
             'success': True,
-            'camera_available': camera_available,
-            'message': '카메라 재초기화 성공' if camera_available else '카메라 재초기화 실패'
-        })
+            'state': camera_manager.state,
+            'message': '카메라 재초기화 시작' if started else '이미 초기화 중'
+        }), 202
     except Exception as e:
         return jsonify({
             'success': False,
@@ -423,9 +579,10 @@ def reinit_camera():
 # 📌 카메라 디버그 정보 엔드포인트  
 @app.route('/camera-debug')
 def camera_debug():
+    picam2 = camera_manager.picam2
+    camera = camera_manager.camera
     debug_info = {
-        'camera_available': camera_available,
-        'picamera2_available': PICAMERA_AVAILABLE,
+        'camera': camera_manager.status(),
         'picam2_object': str(type(picam2)),
         'camera_object': str(type(camera)),
         'system_info': {
@@ -435,7 +592,7 @@ def camera_debug():
     }
     
     # Picamera2 상태 확인
-    if PICAMERA_AVAILABLE and picam2 is not None:
+    if picam2 is not None:
         try:
             debug_info['picam2_status'] = 'running'
             debug_info['picam2_config'] = str(picam2.camera_configuration)
@@ -451,21 +608,33 @@ def camera_debug():
     
     return jsonify(debug_info)
 
-# 📌 지난 급식 내역 조회 엔드포인트 (개선된 버전)
+# 📌 지난 급식 내역 조회 엔드포인트
+# 쿼리: dog, status, from/to (YYYY-MM-DD 또는 YYYY-MM-DD HH:MM:SS), limit, cursor
+# 다음 페이지 커서는 X-Next-Cursor 헤더로 전달 (본문은 기존처럼 배열)
 @app.route('/past-schedules', methods=['GET'])
 def get_past_schedules():
     try:
-        print(f"🔍 급식 이력 파일 확인: {HISTORY_FILE}")
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history_data = json.load(f)
-                print(f"📋 불러온 이력 개수: {len(history_data)}")
-                # 최신 순으로 정렬
-                history_data.sort(key=lambda x: x['datetime'], reverse=True)
-                return jsonify(history_data)
-        else:
-            print("📋 급식 이력 파일이 없음 - 빈 배열 반환")
-            return jsonify([])
+        start = request.args.get('from')
+        end = request.args.get('to')
+        if end and len(end) == 10:
+            end += ' 23:59:59'
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+
+        records, next_cursor = history_store.query(
+            dog=request.args.get('dog'),
+            status=request.args.get('status'),
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+        )
+        print(f"📋 불러온 이력 개수: {len(records)}")
+        response = jsonify(records)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"❌ 급식 이력 조회 오류: {e}")
         return jsonify({'error': str(e)}), 500
@@ -486,25 +655,61 @@ def add_test_history():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 📌 스케줄러 지연 통계 (실제 시작 - 예정 시각)
+@app.route('/scheduler-stats')
+def scheduler_stats():
+    return jsonify(scheduler.stats())
+
 # 📌 서버 상태 확인 엔드포인트
 @app.route('/health')
 def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'camera_available': camera_available,
-        'schedules_count': len(jobs)
+        'camera_available': camera_manager.available,
+        'camera_state': camera_manager.state,
+        'schedules_count': len(schedules),
+        'startup': startup_times,
     })
 
-# 📌 서버 시작
-if __name__ == '__main__':
+# 📌 카메라 / 스케줄러 / 급식 이력 초기화 - 프로세스당 한 번만 (개발 서버, serve.py 공용)
+# 카메라는 여기서 열지 않음 - 첫 /video_feed, /snapshot.jpg 요청 때 백그라운드 초기화
+# CAMERA_WARMUP=1 이면 부팅 직후 백그라운드로 미리 초기화
+_init_lock = threading.Lock()
+_initialized = False
+
+def init_app():
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        _initialized = True
+    started = time.perf_counter()
     print("🐶 펫피더 서버 시작 중...")
     create_sample_history()  # 샘플 데이터 생성
     load_schedules()
-    threading.Thread(target=run_scheduler, daemon=True).start()
+    run_scheduler()
+    if os.environ.get('CAMERA_WARMUP') == '1':
+        camera_manager.ensure_started()
+    startup_times['init_s'] = round(time.perf_counter() - started, 3)
+    print(f"⏱️ 서버 준비 완료 (import {startup_times['import_s']}s, init {startup_times['init_s']}s)")
+
+def shutdown_app():
+    schedules.close()
+    scheduler.stop()
+    release_camera()
+
+# 📌 부팅 시간 (모듈 import, init_app) - /health 로 확인
+startup_times = {'import_s': round(time.perf_counter() - SERVER_IMPORT_STARTED, 3), 'init_s': None}
+
+# 📌 서버 시작 (개발용 - 운영은 python3 serve.py)
+if __name__ == '__main__':
+    init_app()
     print("🌐 서버가 http://0.0.0.0:5000 에서 시작됩니다")
     print("📱 Flutter 앱에서 다음 주소들로 접근하세요:")
     print("   - 카메라: http://[라즈베리파이IP]:5000/video_feed")
     print("   - 급식이력: http://[라즈베리파이IP]:5000/past-schedules")
     print("   - 서버상태: http://[라즈베리파이IP]:5000/health")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # 리로더는 프로세스를 두 번 띄워 카메라/스케줄러가 중복 초기화되므로 끔
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1',
+            use_reloader=False, threaded=True)
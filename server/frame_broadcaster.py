@@ -0,0 +1,328 @@
+# frame_broadcaster.py
+import itertools
+import threading
+import time
+from collections import deque
+
+import metrics
+
+DEFAULT_QUALITY = 95  # cv2.imencode 기본값
+
+ENCODE_SECONDS = metrics.histogram('feeder_stream_encode_seconds', 'JPEG encode time per frame variant',
+                                   ['variant'])
+FRAMES_SERVED = metrics.counter('feeder_stream_frames_total', 'MJPEG frames sent to clients')
+FRAMES_SKIPPED = metrics.counter('feeder_stream_frames_skipped_total',
+                                 'Frames a stream skipped because the client was slower than the camera')
+
+
+# 카메라 프레임을 한 번만 캡처/인코딩해서 모든 스트리밍 클라이언트에 공유
+class FrameBroadcaster:
+    def __init__(self, capture_fn, fallback_fn=None, fps=30, fallback_interval=1.0, idle_timeout=2.0):
+        # capture_fn(): BGR 프레임 또는 None (실패)
+        # fallback_fn(): 카메라가 없을 때 보낼 BGR 프레임
+        self.capture_fn = capture_fn
+        self.fallback_fn = fallback_fn
+        self.interval = 1.0 / fps
+        self.fallback_interval = fallback_interval
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._clients = 0
+        self._last_client_left = 0.0
+
+        # 최신 프레임 슬롯 (fallback: 카메라 대신 fallback_fn 이 만든 안내 화면)
+        self.seq = 0
+        self.frame = None
+        self.jpeg = None
+        self.timestamp = 0.0
+        self.fallback = False
+
+        # (width, quality) 별 인코딩 캐시 - 최신 seq 것만 보관
+        self._variants = {}
+        self._variant_locks = {}
+
+        # capture_fn 은 한 번에 한 스레드만 (캡처 스레드와 스냅샷 요청이 카메라를 동시에 읽지 않도록)
+        self._capture_lock = threading.Lock()
+
+        # astream() 대기자 (event loop, asyncio.Event) - 새 프레임마다 깨움
+        self._async_waiters = set()
+
+        # 스트림별 통계
+        self._stream_ids = itertools.count(1)
+        self.streams = {}
+
+    # 클라이언트 등록 - 첫 클라이언트가 들어오면 캡처 스레드 시작
+    def add_client(self):
+        with self._cond:
+            self._clients += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def remove_client(self):
+        with self._cond:
+            self._clients = max(0, self._clients - 1)
+            if self._clients == 0:
+                self._last_client_left = time.time()
+
+    @property
+    def client_count(self):
+        return self._clients
+
+    # 새 프레임이 나올 때까지 대기 후 (seq, jpeg) 반환
+    def wait_for_frame(self, last_seq, timeout=5.0):
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != last_seq, timeout=timeout)
+            return self.seq, self.jpeg
+
+    # 최신 프레임을 요청한 해상도/화질로 인코딩 (같은 설정의 클라이언트끼리 공유)
+    def variant(self, seq, width=None, quality=None):
+        with self._cond:
+            if seq != self.seq or self.frame is None:
+                return None
+            frame = self.frame
+            if (width is None or width >= frame.shape[1]) and quality in (None, DEFAULT_QUALITY):
+                return self.jpeg
+            key = (width, quality)
+            cached = self._variants.get(key)
+            if cached is not None and cached[0] == seq:
+                return cached[1]
+            lock = self._variant_locks.setdefault(key, threading.Lock())
+
+        with lock:
+            cached = self._variants.get(key)
+            if cached is not None and cached[0] == seq:
+                return cached[1]
+            import cv2
+            if width is not None and width < frame.shape[1]:
+                height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality or DEFAULT_QUALITY]
+            with ENCODE_SECONDS.labels('scaled').time():
+                ret, buffer = cv2.imencode('.jpg', frame, params)
+            if not ret:
+                return None
+            jpeg = buffer.tobytes()
+            with self._cond:
+                self._variants[key] = (seq, jpeg)
+            return jpeg
+
+    # 캐시된 최신 프레임 (seq, jpeg, timestamp) - max_age 초보다 오래됐을 때만 새로 캡처
+    # 실제 카메라 프레임이 없으면 (카메라 초기화 중 안내 화면 포함) jpeg 는 None
+    def snapshot(self, max_age=1.0, timeout=2.0):
+        with self._cond:
+            if self._fresh(max_age):
+                return self.seq, self.jpeg, self.timestamp
+            streaming = self._thread is not None and self._thread.is_alive()
+            if streaming:
+                # 캡처 스레드가 돌고 있으면 다음 프레임을 기다림
+                last_seq = self.seq
+                self._cond.wait_for(lambda: self.seq != last_seq, timeout=timeout)
+                return self._latest()
+
+        with self._capture_lock:
+            # 동시에 들어온 요청 (또는 그 사이 시작된 캡처 스레드) 이 이미 캡처했으면 재사용
+            with self._cond:
+                if self._fresh(max_age):
+                    return self.seq, self.jpeg, self.timestamp
+            try:
+                frame = self.capture_fn()
+            except Exception as e:
+                print(f"❌ 스냅샷 캡처 오류: {e}")
+                frame = None
+            if frame is not None:
+                self._publish(frame)
+        with self._cond:
+            return self._latest()
+
+    def _fresh(self, max_age):
+        return self.jpeg is not None and not self.fallback and time.time() - self.timestamp <= max_age
+
+    def _latest(self):
+        return self.seq, None if self.fallback else self.jpeg, self.timestamp
+
+    def stream_stats(self):
+        return [stats.snapshot() for stats in list(self.streams.values())]
+
+    def _should_stop(self):
+        return self._clients == 0 and time.time() - self._last_client_left >= self.idle_timeout
+
+    def _publish(self, frame, fallback=False):
+        import cv2  # 첫 프레임 때 로드 - 서버 import 를 가볍게
+        with ENCODE_SECONDS.labels('default').time():
+            ret, buffer = cv2.imencode('.jpg', frame)
+        if not ret:
+            return
+        with self._cond:
+            self.seq += 1
+            self.frame = frame
+            self.jpeg = buffer.tobytes()
+            self.timestamp = time.time()
+            self.fallback = fallback
+            self._variants.clear()
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # 이벤트 루프가 이미 닫힘
+
+    def _run(self):
+        print("🎥 프레임 브로드캐스터 시작")
+        while True:
+            with self._cond:
+                if self._should_stop():
+                    self._thread = None
+                    break
+
+            started = time.time()
+            delay = self.interval
+            try:
+                with self._capture_lock:
+                    frame = self.capture_fn()
+                fallback = frame is None and self.fallback_fn is not None
+                if fallback:
+                    frame = self.fallback_fn()
+                    delay = self.fallback_interval
+                if frame is not None:
+                    self._publish(frame, fallback=fallback)
+            except Exception as e:
+                print(f"❌ 프레임 캡처 오류: {e}")
+                delay = self.fallback_interval
+
+            remaining = delay - (time.time() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+        print("🎥 프레임 브로드캐스터 중지 (연결된 클라이언트 없음)")
+
+    # 스트리밍 응답용 제너레이터 (multipart/x-mixed-replace)
+    # 느린 클라이언트는 밀린 프레임을 건너뛰고 항상 최신 프레임만 받음
+    def stream(self, width=None, quality=None, fps=None, client=None):
+        interval = 1.0 / fps if fps else 0.0
+        stats = StreamStats(next(self._stream_ids), client, width, quality, fps)
+        self.streams[stats.id] = stats
+        self.add_client()
+        try:
+            last_seq = None
+            next_send = 0.0
+            while True:
+                seq, _ = self.wait_for_frame(last_seq)
+                if seq == last_seq:
+                    continue
+                jpeg = self.variant(seq, width, quality)
+                if jpeg is None:
+                    continue
+                if last_seq is not None:
+                    skipped = max(0, seq - last_seq - 1)
+                    stats.dropped += skipped
+                    if skipped:
+                        FRAMES_SKIPPED.inc(skipped)
+                last_seq = seq
+                # yield 는 클라이언트가 읽을 때까지 블록되므로 대기열이 쌓이지 않음
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+                now = time.time()
+                stats.sent(now, len(jpeg))
+                FRAMES_SERVED.inc()
+                if interval:
+                    next_send = max(next_send + interval, now)
+                    if next_send > now:
+                        time.sleep(next_send - now)
+        finally:
+            self.streams.pop(stats.id, None)
+            self.remove_client()
+
+    # stream() 의 asyncio 버전 - 스트림마다 스레드를 점유하지 않음 (serve.py 의 ASGI /video_feed)
+    async def astream(self, width=None, quality=None, fps=None, client=None):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        interval = 1.0 / fps if fps else 0.0
+        stats = StreamStats(next(self._stream_ids), client, width, quality, fps)
+        self.streams[stats.id] = stats
+        with self._cond:
+            self._async_waiters.add(waiter)
+        self.add_client()
+        try:
+            last_seq = None
+            next_send = 0.0
+            while True:
+                if self.seq == last_seq:
+                    event.clear()
+                    if self.seq == last_seq:
+                        try:
+                            await asyncio.wait_for(event.wait(), timeout=5.0)
+                        except asyncio.TimeoutError:
+                            continue
+                seq = self.seq
+                if width is None and quality is None:
+                    jpeg = self.variant(seq)
+                else:
+                    # 리사이즈/인코딩은 이벤트 루프 밖에서
+                    jpeg = await loop.run_in_executor(None, self.variant, seq, width, quality)
+                if jpeg is None:
+                    continue
+                if last_seq is not None:
+                    skipped = max(0, seq - last_seq - 1)
+                    stats.dropped += skipped
+                    if skipped:
+                        FRAMES_SKIPPED.inc(skipped)
+                last_seq = seq
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+                now = time.time()
+                stats.sent(now, len(jpeg))
+                FRAMES_SERVED.inc()
+                if interval:
+                    next_send = max(next_send + interval, now)
+                    if next_send > now:
+                        await asyncio.sleep(next_send - now)
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+            self.streams.pop(stats.id, None)
+            self.remove_client()
+
+
+# 스트림 하나의 전송 통계 (최근 window 초 기준 fps, bytes/s)
+class StreamStats:
+    def __init__(self, stream_id, client, width, quality, fps, window=5.0):
+        self.id = stream_id
+        self.client = client
+        self.width = width
+        self.quality = quality
+        self.target_fps = fps
+        self.window = window
+        self.started = time.time()
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self._recent = deque()
+
+    def sent(self, now, size):
+        self.frames += 1
+        self.bytes += size
+        self._recent.append((now, size))
+        while self._recent and now - self._recent[0][0] > self.window:
+            self._recent.popleft()
+
+    def snapshot(self):
+        now = time.time()
+        recent = [(t, size) for t, size in list(self._recent) if now - t <= self.window]
+        span = min(self.window, now - self.started) or 1e-6
+        return {
+            'id': self.id,
+            'client': self.client,
+            'width': self.width,
+            'quality': self.quality,
+            'target_fps': self.target_fps,
+            'fps': round(len(recent) / span, 2),
+            'bytes_per_s': round(sum(size for _, size in recent) / span),
+            'frames': self.frames,
+            'dropped': self.dropped,
+            'bytes': self.bytes,
+            'seconds': round(now - self.started, 1),
+        }
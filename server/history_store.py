@@ -0,0 +1,166 @@
+# history_store.py
+import base64
+import binascii
+import json
+import os
+import sqlite3
+import threading
+
+# 컬럼으로 저장하는 필드 - 나머지(무게, 소요 시간 등)는 extra JSON 으로 저장
+COLUMNS = ('dog', 'time', 'voice', 'amount', 'status', 'datetime')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS feeding_history (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    dog      TEXT NOT NULL,
+    time     TEXT,
+    voice    TEXT,
+    amount   INTEGER,
+    status   TEXT,
+    datetime TEXT NOT NULL,
+    extra    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_datetime ON feeding_history (datetime, id);
+CREATE INDEX IF NOT EXISTS idx_history_dog ON feeding_history (dog, datetime, id);
+CREATE INDEX IF NOT EXISTS idx_history_status ON feeding_history (status, datetime, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+def encode_cursor(datetime_str, row_id):
+    return base64.urlsafe_b64encode(f'{datetime_str}|{row_id}'.encode('utf-8')).decode('ascii')
+
+
+# 잘못된 커서(패딩, 인코딩, 형식 오류)는 모두 ValueError 로
+def decode_cursor(cursor):
+    try:
+        datetime_str, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return datetime_str, int(row_id)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f'잘못된 커서: {cursor!r}') from e
+
+
+# 📌 급식 이력 저장소 (SQLite WAL) - 추가는 인덱스 갱신만, 조회는 인덱스로 범위 검색
+class HistoryStore:
+    def __init__(self, db_path, legacy_json=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        if legacy_json:
+            self.import_json(legacy_json)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, record):
+        extra = {k: v for k, v in record.items() if k not in COLUMNS and k != 'id'}
+        cur = self._conn.execute(
+            'INSERT INTO feeding_history (dog, time, voice, amount, status, datetime, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            tuple(record.get(k) for k in COLUMNS) + (json.dumps(extra, ensure_ascii=False) if extra else None,)
+        )
+        return cur.lastrowid
+
+    # 이력 한 건 추가 - 추가된 id 반환
+    def append(self, record):
+        with self._lock:
+            row_id = self._insert(record)
+            self._conn.commit()
+        return row_id
+
+    # 📌 기존 이력에 필드 추가/수정 (급식 후 섭취 판단 등) - 수정된 레코드 반환, 없으면 None
+    def update(self, record_id, fields):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM feeding_history WHERE id = ?', (record_id,)).fetchone()
+            if row is None:
+                return None
+            record = self._row_to_record(row)
+            record.update({k: v for k, v in fields.items() if k != 'id'})
+            extra = {k: v for k, v in record.items() if k not in COLUMNS and k != 'id'}
+            self._conn.execute(
+                'UPDATE feeding_history SET dog = ?, time = ?, voice = ?, amount = ?, status = ?, datetime = ?, '
+                'extra = ? WHERE id = ?',
+                tuple(record.get(k) for k in COLUMNS)
+                + (json.dumps(extra, ensure_ascii=False) if extra else None, record_id)
+            )
+            self._conn.commit()
+        return record
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM feeding_history').fetchone()[0]
+
+    # 📌 예전 feeding_history.json 을 한 번만 가져오기
+    def import_json(self, json_path):
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+            if done or not os.path.exists(json_path):
+                return 0
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except Exception as e:
+                print(f"❌ 기존 급식 이력 읽기 실패: {e}")
+                records = []
+
+            for record in records:
+                self._insert(record)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)",
+                               (os.path.abspath(json_path),))
+            self._conn.commit()
+        print(f"✅ 기존 급식 이력 {len(records)}개 가져오기 완료")
+        return len(records)
+
+    def _row_to_record(self, row):
+        record = {k: row[k] for k in COLUMNS}
+        record['id'] = row['id']
+        if row['extra']:
+            record.update(json.loads(row['extra']))
+        return record
+
+    # 📌 최신 순 조회 - (records, next_cursor) 반환
+    def query(self, dog=None, start=None, end=None, status=None, limit=100, cursor=None):
+        where = []
+        params = []
+        if dog:
+            where.append('dog = ?')
+            params.append(dog)
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        if start:
+            where.append('datetime >= ?')
+            params.append(start)
+        if end:
+            where.append('datetime <= ?')
+            params.append(end)
+        if cursor:
+            cursor_dt, cursor_id = decode_cursor(cursor)
+            where.append('(datetime < ? OR (datetime = ? AND id < ?))')
+            params.extend([cursor_dt, cursor_dt, cursor_id])
+
+        sql = 'SELECT * FROM feeding_history'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY datetime DESC, id DESC LIMIT ?'
+        # 한 개 더 읽어서 다음 페이지가 있는지 확인
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['datetime'], rows[-1]['id'])
+        return [self._row_to_record(row) for row in rows], next_cursor
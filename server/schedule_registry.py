@@ -0,0 +1,217 @@
+# schedule_registry.py
+import json
+import os
+import re
+import threading
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+DAY_GROUPS = {
+    'daily': None,
+    'weekdays': WEEKDAYS[:5],
+    'weekends': WEEKDAYS[5:],
+}
+TIME_PATTERN = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+
+# 📌 요일 규칙 정리: None / 'daily' → None (매일), 'weekdays', ['mon', 'wed'], [0, 2] → ['mon', 'wed']
+def normalize_days(days):
+    if days is None:
+        return None
+    if isinstance(days, str):
+        key = days.strip().lower()
+        if key in DAY_GROUPS:
+            return list(DAY_GROUPS[key]) if DAY_GROUPS[key] else None
+        days = [d for d in re.split(r'[,\s]+', key) if d]
+    result = set()
+    for day in days:
+        if isinstance(day, int) and 0 <= day <= 6:
+            result.add(WEEKDAYS[day])
+        elif isinstance(day, str) and day.strip().lower()[:3] in WEEKDAYS:
+            result.add(day.strip().lower()[:3])
+        else:
+            raise ValueError(f"알 수 없는 요일: {day}")
+    if not result or len(result) == 7:
+        return None
+    return [d for d in WEEKDAYS if d in result]
+
+
+# 📌 스케줄 항목 검증 + 정리 (시간은 'HH:MM' 으로 맞춤)
+def normalize_entry(data, dog=None):
+    try:
+        dog = dog if dog is not None else data['dog']
+        time_str = str(data['time']).strip()
+        voice = data['voice']
+        amount = data['amount']
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"필수 항목 누락: {e}")
+    match = TIME_PATTERN.match(time_str)
+    if not match:
+        raise ValueError(f"잘못된 시간 형식: {time_str} (HH:MM)")
+    if not isinstance(amount, (int, float)) or amount <= 0:
+        raise ValueError(f"잘못된 급식량: {amount}")
+    entry = {
+        'dog': dog,
+        'time': f"{int(match.group(1)):02d}:{match.group(2)}",
+        'voice': voice,
+        'amount': amount,
+    }
+    days = normalize_days(data.get('days'))
+    if days:
+        entry['days'] = days
+    return entry
+
+
+# 📌 (강아지, 시간) 키로 색인된 스케줄 저장소
+# - 강아지별 / 시간별 보조 색인으로 조회, 수정, 삭제가 O(1)
+# - 변경은 모아서 flush_delay 초 뒤 한 번에 저장 (임시 파일에 쓰고 rename)
+class ScheduleRegistry:
+    def __init__(self, path, scheduler, make_task, flush_delay=1.0):
+        # make_task(entry): 스케줄 시각에 실행할 함수를 만들어 줌
+        self.path = path
+        self.scheduler = scheduler
+        self.make_task = make_task
+        self.flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._entries = {}   # (dog, time) -> entry
+        self._job_ids = {}   # (dog, time) -> scheduler job id
+        self._by_dog = {}    # dog -> {time, ...}
+        self._by_time = {}   # time -> {dog, ...}
+        self._flush_timer = None
+        self._dirty = False
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # === 조회 ===
+    def get(self, dog, time_str):
+        return self._entries.get((dog, time_str))
+
+    def for_dog(self, dog):
+        with self._lock:
+            return [self._entries[(dog, t)] for t in sorted(self._by_dog.get(dog, ()))]
+
+    def at_time(self, time_str):
+        with self._lock:
+            return [self._entries[(d, time_str)] for d in sorted(self._by_time.get(time_str, ()))]
+
+    def all(self):
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda e: (e['time'], e['dog']))
+
+    def export(self):
+        return [dict(entry) for entry in self.all()]
+
+    # === 변경 ===
+    def _add(self, entry):
+        key = (entry['dog'], entry['time'])
+        days = entry.get('days')
+        weekdays = [WEEKDAYS.index(d) for d in days] if days else None
+        self._job_ids[key] = self.scheduler.add_daily(entry['time'], self.make_task(entry),
+                                                      name=f"{entry['dog']}@{entry['time']}",
+                                                      weekdays=weekdays)
+        self._entries[key] = entry
+        self._by_dog.setdefault(entry['dog'], set()).add(entry['time'])
+        self._by_time.setdefault(entry['time'], set()).add(entry['dog'])
+
+    def _remove(self, dog, time_str):
+        key = (dog, time_str)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.scheduler.cancel(self._job_ids.pop(key))
+        for index, outer, inner in ((self._by_dog, dog, time_str), (self._by_time, time_str, dog)):
+            index[outer].discard(inner)
+            if not index[outer]:
+                del index[outer]
+        return entry
+
+    # 추가 또는 같은 (강아지, 시간) 항목 교체 - (entry, created) 반환
+    def upsert(self, data):
+        entry = normalize_entry(data)
+        with self._lock:
+            created = self._remove(entry['dog'], entry['time']) is None
+            self._add(entry)
+            self._mark_dirty()
+        return entry, created
+
+    def remove(self, dog, time_str):
+        with self._lock:
+            entry = self._remove(dog, time_str)
+            if entry is not None:
+                self._mark_dirty()
+        return entry
+
+    # 한 강아지의 스케줄 전체를 entries 로 교체 (검증 실패 시 아무것도 바꾸지 않음)
+    def replace_dog(self, dog, items):
+        entries = self._dedupe(normalize_entry(item, dog=dog) for item in items)
+        with self._lock:
+            for time_str in list(self._by_dog.get(dog, ())):
+                self._remove(dog, time_str)
+            for entry in entries:
+                self._add(entry)
+            self._mark_dirty()
+        return entries
+
+    # 여러 항목 가져오기 - replace=True 면 기존 스케줄 전체 삭제 후 등록
+    def import_entries(self, items, replace=False):
+        entries = self._dedupe(normalize_entry(item) for item in items)
+        with self._lock:
+            if replace:
+                for dog, time_str in list(self._entries):
+                    self._remove(dog, time_str)
+            for entry in entries:
+                self._remove(entry['dog'], entry['time'])
+                self._add(entry)
+            self._mark_dirty()
+        return entries
+
+    @staticmethod
+    def _dedupe(entries):
+        # 같은 (강아지, 시간) 이 여러 번 나오면 마지막 항목 사용
+        unique = {}
+        for entry in entries:
+            unique[(entry['dog'], entry['time'])] = entry
+        return list(unique.values())
+
+    # === 저장 ===
+    def load(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        with self._lock:
+            for entry in self._dedupe(normalize_entry(item) for item in saved):
+                self._remove(entry['dog'], entry['time'])
+                self._add(entry)
+        return len(self._entries)
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if self.flush_delay <= 0:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            data = self.export()
+            self._dirty = False
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.flushes += 1
+
+    def close(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+        self.flush()
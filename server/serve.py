@@ -0,0 +1,101 @@
+# serve.py
+# 운영용 서버 진입점 (uvicorn + ASGI)
+#
+#   pip install uvicorn a2wsgi
+#   cd server && python3 serve.py --port 5000
+#
+# - /video_feed 는 asyncio 로 처리 → 스트림 클라이언트가 스레드를 점유하지 않음
+# - 나머지 Flask 라우트는 a2wsgi 스레드 풀에서 실행 (API 요청만 잠깐 스레드를 씀)
+# - 카메라 / 스케줄러 / 급식 이력은 lifespan startup 에서 한 번만 초기화 (워커 프로세스는 1개)
+import asyncio
+import argparse
+from urllib.parse import parse_qs
+
+import uvicorn
+from a2wsgi import WSGIMiddleware
+
+import flask_server_v2 as server
+
+STREAM_CONTENT_TYPE = b'multipart/x-mixed-replace; boundary=frame'
+
+
+def _query_value(query, name, cast):
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return cast(values[0])
+    except ValueError:
+        return None
+
+
+async def video_feed(scope, receive, send):
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    width, quality, fps = server.clamp_stream_params(_query_value(query, 'width', int),
+                                                     _query_value(query, 'quality', int),
+                                                     _query_value(query, 'fps', float))
+    client = scope.get('client')
+    frames = server.broadcaster.astream(width=width, quality=quality, fps=fps,
+                                        client=client[0] if client else None)
+
+    # 클라이언트 연결 끊김 감지 (send 만으로는 알 수 없음)
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', STREAM_CONTENT_TYPE),
+                                (b'cache-control', b'no-cache')]})
+        async for chunk in frames:
+            if disconnected.is_set():
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        watcher.cancel()
+        await frames.aclose()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.get_running_loop().run_in_executor(None, server.init_app)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            server.shutdown_app()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+class FeederASGI:
+    def __init__(self, flask_app, workers=8):
+        self.wsgi = WSGIMiddleware(flask_app, workers=workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == '/video_feed':
+            await video_feed(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+
+app = FeederASGI(server.app)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--api-threads', type=int, default=8, help='thread pool size for Flask routes')
+    args = parser.parse_args()
+    app = FeederASGI(server.app, workers=args.api_threads)
+    # 카메라와 스케줄러는 프로세스 하나에만 있어야 하므로 workers=1 고정
+    uvicorn.run(app, host=args.host, port=args.port, workers=1, lifespan='on')
@@ -0,0 +1,59 @@
+# trace_store.py
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import tracing
+
+
+# 📌 최근 급식 trace 보관소 (Chrome trace JSON, 최근 keep 개만 유지)
+# - 서버 쪽 span (스케줄 지연, 데몬 요청) 과 급식기 쪽 trace.json 을 한 파일로 합침
+class TraceStore:
+    def __init__(self, directory, keep=tracing.TRACE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # trace_id -> 요약 (오래된 것부터)
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        names = sorted((f for f in os.listdir(self.directory) if f.endswith('.json')),
+                       key=lambda f: os.path.getmtime(os.path.join(self.directory, f)))
+        for name in names[-self.keep:]:
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    metadata = json.load(f).get('metadata', {})
+            except (OSError, ValueError):
+                continue
+            self._index[name[:-5]] = metadata
+
+    # trace: 서버 쪽 tracing.Trace, feeder_trace_path: 급식기가 남긴 trace 파일 (없으면 None)
+    def add(self, trace_id, trace, feeder_trace_path=None):
+        extra = []
+        if feeder_trace_path:
+            try:
+                extra = tracing.load_events(feeder_trace_path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 급식기 trace 를 읽을 수 없음: {e}")
+        trace.finish()
+        trace.save(self.path(trace_id), process_name='server', extra_events=extra)
+        with self._lock:
+            self._index[trace_id] = dict(trace.args, name=trace.name)
+            while len(self._index) > self.keep:
+                old_id, _ = self._index.popitem(last=False)
+                try:
+                    os.remove(self.path(old_id))
+                except OSError:
+                    pass
+
+    def path(self, trace_id):
+        return os.path.join(self.directory, os.path.basename(trace_id) + '.json')
+
+    def list(self):
+        with self._lock:
+            return [dict(summary, id=trace_id) for trace_id, summary in reversed(self._index.items())]
+
+    def __contains__(self, trace_id):
+        return trace_id in self._index